@@ -0,0 +1,176 @@
+"""
+Load test of the scenario API (ScenarioAPI.py).
+Opens a number of concurrent keep-alive connections, each of which posts random lever selections, one scenario or a batch
+per request, as fast as the service answers them. Reports the latency of the requests and the scenarios served per second.
+The client only uses the standard library, so that it adds as little load as possible to the box being measured.
+
+Usage: python APILoadTest.py [--connections N] [--requests N] [--batch N] [--url URL] [--seed N]
+Created October 2024
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from CalculatorParameters import Default_Levers
+
+# Values sampled for each kind of lever.
+Lever_Options = {'Lever': [1, 1.5, 2, 2.5, 3, 3.5, 4], 'Speed': list(range(1, 11)), 'Start': list(range(2024, 2031)),
+                 'Leakage': [40, 50, 60, 70, 80, 90, 100]}
+
+def Start_Server(Port = 8600, Timeout = 60):
+    """
+    Starts the scenario API on a local port, and waits until it is ready.
+
+    Args:
+        Port (int, optional): Port on which the service listens. Defaults to 8600.
+        Timeout (float, optional): Time to wait for the service in seconds. Defaults to 60.
+
+    Returns:
+        (Popen, str): The server process and the URL of the service.
+    """
+    Url = 'http://127.0.0.1:{}'.format(Port)
+    Server = subprocess.Popen([sys.executable, 'ScenarioAPI.py', '--port', str(Port)], cwd = os.path.dirname(os.path.abspath(__file__)))
+    Deadline = time.monotonic() + Timeout
+    while time.monotonic() < Deadline:
+        if Server.poll() is not None:
+            raise RuntimeError('Scenario API exited with code {}'.format(Server.returncode))
+        try:
+            with urllib.request.urlopen(Url + '/health', timeout = 1):
+                return Server, Url
+        except OSError:
+            time.sleep(0.2)
+    Server.terminate()
+    raise TimeoutError('Scenario API did not start within {} s'.format(Timeout))
+
+def Random_Scenario(Generator):
+    """
+    Returns:
+        dict: Lever selections with a random value for every lever.
+    """
+    Levers = {}
+    for Name in Default_Levers:
+        Kind = 'Lever' if Name.endswith(('_Lever', '_Change')) else Name.rsplit('_', 1)[-1]
+        Levers[Name] = Generator.choice(Lever_Options[Kind])
+    return Levers
+
+class Connection:
+    """
+    Keep-alive HTTP/1.1 connection to the service, posting JSON requests one after another.
+    """
+    def __init__(self, Url):
+        Parsed = urllib.parse.urlsplit(Url)
+        self.Host, self.Port = Parsed.hostname, Parsed.port or 80
+        self._Reader = self._Writer = None
+
+    async def Connect(self):
+        self._Reader, self._Writer = await asyncio.open_connection(self.Host, self.Port)
+
+    async def Close(self):
+        self._Writer.close()
+        await self._Writer.wait_closed()
+
+    async def Post(self, Path, Request):
+        """
+        Args:
+            Path (str): Path of the request, e.g. '/scenarios'.
+            Request (dict): Body of the request.
+
+        Returns:
+            (int, dict): Status and body of the response.
+        """
+        Body = json.dumps(Request).encode()
+        self._Writer.write('POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+            Path, self.Host, len(Body)).encode() + Body)
+        await self._Writer.drain()
+        Status = int((await self._Reader.readline()).split()[1])
+        Length = 0
+        while True:
+            Line = await self._Reader.readline()
+            if Line in (b'\r\n', b''):
+                break
+            Name, Value = Line.decode().split(':', 1)
+            if Name.lower() == 'content-length':
+                Length = int(Value)
+        return Status, json.loads(await self._Reader.readexactly(Length))
+
+async def _Run_Connections(Url, Connections, Requests, Batch, Seed, Outputs):
+    async def Client(c):
+        Generator = random.Random(Seed * 100003 + c)
+        Bodies = []
+        for i in range(Requests):
+            Scenarios = [Random_Scenario(Generator) for j in range(Batch)]
+            Bodies.append({'levers': Scenarios[0]} if Batch == 1 else {'scenarios': Scenarios})
+            Bodies[-1]['outputs'] = Outputs
+        Link = Connection(Url)
+        await Link.Connect()
+        Latencies = []
+        for Body in Bodies:
+            Started = time.perf_counter()
+            Status, Response = await Link.Post('/scenarios', Body)
+            Latencies.append((time.perf_counter() - Started) * 1000)
+            if Status != 200:
+                raise RuntimeError('Request failed with {}: {}'.format(Status, Response.get('error')))
+        await Link.Close()
+        return Latencies
+
+    Started = time.perf_counter()
+    Latencies = await asyncio.gather(*[Client(c) for c in range(Connections)])
+    return np.concatenate(Latencies), time.perf_counter() - Started
+
+def Run_LoadTest(Url, Connections = 50, Requests = 40, Batch = 1, Seed = 0, Outputs = ('Total', 'Emissions_FTE')):
+    """
+    Runs concurrent connections against a running service.
+
+    Args:
+        Url (str): URL of the service, e.g. 'http://127.0.0.1:8000'.
+        Connections (int, optional): Number of concurrent connections. Defaults to 50.
+        Requests (int, optional): Number of requests made on each connection. Defaults to 40.
+        Batch (int, optional): Number of scenarios in each request. Defaults to 1.
+        Seed (int, optional): Seed of the lever selections, for repeatable tests. Defaults to 0.
+        Outputs (tuple, optional): Outputs requested. Defaults to total emissions and emissions per person.
+
+    Returns:
+        dict: Latency percentiles (ms), and requests and scenarios served per second.
+    """
+    Latencies, Elapsed = asyncio.run(_Run_Connections(Url, Connections, Requests, Batch, Seed, list(Outputs)))
+    return {'Connections': Connections, 'Requests': len(Latencies), 'Batch': Batch,
+            'p50_ms': float(np.percentile(Latencies, 50)), 'p95_ms': float(np.percentile(Latencies, 95)),
+            'p99_ms': float(np.percentile(Latencies, 99)), 'Requests_per_s': len(Latencies) / Elapsed,
+            'Scenarios_per_s': len(Latencies) * Batch / Elapsed}
+
+def Report(Result):
+    return '\n'.join(['{} connections, {} requests of {} scenarios'.format(Result['Connections'], Result['Requests'], Result['Batch']),
+                      'Latency  p50 {:8.1f} ms   p95 {:8.1f} ms   p99 {:8.1f} ms'.format(Result['p50_ms'], Result['p95_ms'], Result['p99_ms']),
+                      'Served   {:.0f} requests per s, {:.0f} scenarios per s'.format(Result['Requests_per_s'], Result['Scenarios_per_s'])])
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Load test the scenario API with concurrent connections.')
+    Parser.add_argument('--connections', type = int, default = 50, help = 'Number of concurrent connections.')
+    Parser.add_argument('--requests', type = int, default = 40, help = 'Number of requests made on each connection.')
+    Parser.add_argument('--batch', type = int, default = 1, help = 'Number of scenarios in each request.')
+    Parser.add_argument('--seed', type = int, default = 0, help = 'Seed of the lever selections.')
+    Parser.add_argument('--url', help = 'URL of a service which is already running. Defaults to starting a local one.')
+    Parser.add_argument('--port', type = int, default = 8600, help = 'Port of the local service.')
+    Args = Parser.parse_args()
+
+    Server = None
+    if Args.url:
+        Url = Args.url
+    else:
+        Server, Url = Start_Server(Args.port)
+    try:
+        print(Report(Run_LoadTest(Url, Args.connections, Args.requests, Args.batch, Args.seed)))
+    finally:
+        if Server is not None:
+            Server.terminate()
+            Server.wait()
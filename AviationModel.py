@@ -0,0 +1,197 @@
+"""
+Calculation modules of the Chemical Engineering aviation calculator.
+Holds the population, emission factor and travel modules used by the Streamlit app, without importing Streamlit or Plotly,
+so that scenarios can be calculated from scripts, batch jobs and tests.
+
+Usage: python AviationModel.py <lever file (.json, .yaml)> <output (.json file or directory of .csv files)>
+Created October 2024
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+import DataLoading
+import GeneralisedFunctions as gf
+import Profiling
+import ResultCache
+from CalculatorParameters import (CalculatorTime_Range, Default_Levers, Population_AmbLevels,
+                                  LH_Demand_AmbLevels, LH_Share_AmbLevels, SH_Demand_AmbLevels, SH_Share_AmbLevels,
+                                  Dom_Demand_AmbLevels, Dom_Share_AmbLevels)
+
+# Lever prefix -> (workbook sheet, demand ambitions, class share ambitions)
+Hauls = {
+    'LH': ('LongHaul', LH_Demand_AmbLevels, LH_Share_AmbLevels),
+    'SH': ('ShortHaul', SH_Demand_AmbLevels, SH_Share_AmbLevels),
+    'DOM': ('Domestic', Dom_Demand_AmbLevels, Dom_Share_AmbLevels),
+}
+
+#%% CALCULATION MODULES.
+
+@Profiling.Profiled
+@ResultCache.Memoise()
+def Travel_EmissionFactors():
+    return DataLoading.Load_EmissionFactor_Table()
+
+@Profiling.Profiled
+@ResultCache.Memoise(Persistent = True)
+def Generalised_TravelModule(HaulType, Demand_AmbLevels, Share_AmbLevels, DemandLever, DemandSpeed, DemandStart,
+              ClassLever, ClassSpeed, ClassStart, EmF, LeakageFactor):
+    if HaulType == 'LongHaul':
+        shorthandHaul = 'lH'
+    else:
+        shorthandHaul = 'sH'
+
+    Data = DataLoading.Load_Workbook()[HaulType]
+    Categories = [c for c in Data.columns if c != 'Year']
+    Activity = Data[Categories].to_numpy(dtype = float) / (LeakageFactor/100)
+    EmFactors = gf.EmissionFactor_Table(EmF)
+
+    # ---------- Determine activity and emissions of all classes together
+    ActivityByMode, AllEmissions = gf.Aviation_Kernel(Data['Year'].to_numpy(), Activity, Categories, shorthandHaul,
+                                                      Demand_AmbLevels, Share_AmbLevels,
+                                                      (DemandLever, DemandSpeed, DemandStart), (ClassLever, ClassSpeed, ClassStart),
+                                                      EmFactors, CalculatorTime_Range, BaseYear = 2022, EmissionYears = EmFactors.Years)
+
+    return {'Demand': gf.ModuleOutput(CalculatorTime_Range, Categories, ActivityByMode),
+            'Emissions': gf.ModuleOutput(EmFactors.Years, Categories, AllEmissions)}
+
+
+@Profiling.Profiled
+@ResultCache.Memoise(Persistent = True)
+def Population_Module(Population_AmbLevels, PopulationLever, PopulationSpeed, PopulationStart):
+    Data = DataLoading.Load_Sheet('Population')
+    Data, BaU_ROC = gf.CleanData(Data)
+
+    Categories = list(Data.columns)
+
+    ProjectedChanges = pd.DataFrame({'Year':CalculatorTime_Range})
+
+    for Category in Categories:
+        BaUData = gf.BaU_Pathways(Data, Category,  BaU_ROC = BaU_ROC[Category])
+        gf.Projections(BaUData, Category, Population_AmbLevels, PopulationLever, PopulationSpeed, PopulationStart, ProjectedChanges, BaseYear = 2022,)
+
+        ProjectedChanges = ProjectedChanges.round(0)
+
+    ProjectedChanges.set_index('Year', inplace = True)
+
+    return gf.ModuleOutput.from_frame(gf.Mask_NonFinite(ProjectedChanges))
+
+@Profiling.Profiled
+@ResultCache.Memoise(Persistent = True)
+def Sum_TravelEmissions(LH_Emissions, SH_Emissions, DOM_Emissions, Mode = 'Emissions'):
+    if Mode == 'Emissions':
+        Factor = 1000   # Emissions were calculated in kmCO2e, but presented in tCO2e
+    else:
+        Factor = 1      # do not convert Psg KM
+
+    LHAviationEmissions = gf.OutputToDF(LH_Emissions)
+    LH_Total = LHAviationEmissions.sum(axis = 1) / Factor
+    LH_Total.rename('Long haul travel', inplace=True)
+
+    SHAviationEmissions = gf.OutputToDF(SH_Emissions)
+    SH_Total = SHAviationEmissions.sum(axis = 1) / Factor
+    SH_Total.rename('Short haul travel', inplace=True)
+
+    DomAviationEmissions = gf.OutputToDF(DOM_Emissions)
+    Dom_Total = DomAviationEmissions.sum(axis = 1) / Factor
+    Dom_Total.rename('Short haul travel', inplace=True)
+
+    Totals = pd.DataFrame({'Long Haul': LH_Total, 'Short Haul': SH_Total, 'Domestic':Dom_Total })
+    Totals['Total'] = LH_Total + SH_Total + Dom_Total
+
+    return gf.ModuleOutput.from_frame(Totals)
+
+#%% SCENARIOS
+def Check_Levers(Levers):
+    """
+    Args:
+        Levers (dict): Lever selections keyed by lever name.
+
+    Raises:
+        ValueError: If any lever is not one of Default_Levers.
+    """
+    Unknown = set(Levers) - set(Default_Levers)
+    if Unknown:
+        raise ValueError('Unknown levers: {}'.format(', '.join(sorted(Unknown))))
+
+def Run_Scenario(Levers = None):
+    """
+    Calculates every module output of the app for one lever selection.
+
+    Args:
+        Levers (dict, optional): Lever selections keyed by lever name (as in Default_Levers).
+                                 Levers which are not given are kept at their default values.
+
+    Returns:
+        dict: Module outputs keyed by name: 'Population', 'EmF', '<Haul>_Demand' and '<Haul>_Emissions' of each haul,
+              'Total_Emissions' (tCO2e) and 'Total_Demand' (Psg km).
+    """
+    Levers = dict(Default_Levers, **(Levers or {}))
+    Check_Levers(Levers)
+
+    Results = {'Population': Population_Module(Population_AmbLevels, Levers['Population_Change'], Levers['Population_Speed'],
+                                               Levers['Population_Start']),
+               'EmF': Travel_EmissionFactors()}
+    for Haul, (HaulType, Demand_AmbLevels, Share_AmbLevels) in Hauls.items():
+        Data = Generalised_TravelModule(HaulType, Demand_AmbLevels, Share_AmbLevels,
+                                        *[Levers[Haul + '_' + n] for n in ['Demand_Lever', 'Demand_Speed', 'Demand_Start',
+                                                                           'Class_Lever', 'Class_Speed', 'Class_Start']],
+                                        Results['EmF'], Levers[Haul + '_Leakage'])
+        Results[Haul + '_Demand'], Results[Haul + '_Emissions'] = Data['Demand'], Data['Emissions']
+
+    Results['Total_Emissions'] = Sum_TravelEmissions(Results['LH_Emissions'], Results['SH_Emissions'], Results['DOM_Emissions'])
+    Results['Total_Demand'] = Sum_TravelEmissions(Results['LH_Demand'], Results['SH_Demand'], Results['DOM_Demand'], Mode = 'Demand')
+    return Results
+
+def Load_Levers(Path):
+    """
+    Reads lever selections from a JSON or YAML file, holding a mapping of lever names to values.
+    Reading YAML requires the PyYAML package.
+
+    Args:
+        Path (str): Path to the lever file, ending with '.json', '.yaml' or '.yml'.
+
+    Returns:
+        dict: Lever selections keyed by lever name.
+    """
+    with open(Path) as f:
+        if Path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('Reading YAML lever files requires PyYAML (pip install pyyaml)') from None
+            Levers = yaml.safe_load(f)
+        else:
+            Levers = json.load(f)
+    Check_Levers(Levers or {})
+    return Levers or {}
+
+def Write_Results(Results, Output):
+    """
+    Saves module outputs, either as a single JSON file or as one CSV file per output.
+
+    Args:
+        Results (dict): Module outputs keyed by name, as from Run_Scenario.
+        Output (str): Path of a '.json' file, in which each output is in the 'split' orientation read by gf.JSONtoDF,
+                      or otherwise a directory in which '<name>.csv' files are written.
+    """
+    if Output.lower().endswith('.json'):
+        with open(Output, 'w') as f:
+            json.dump({Name: json.loads(Result.to_json()) for Name, Result in Results.items()}, f)
+    else:
+        os.makedirs(Output, exist_ok = True)
+        for Name, Result in Results.items():
+            Result.to_frame().rename_axis('Year').to_csv(os.path.join(Output, Name + '.csv'))
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Calculate the aviation emissions of a scenario.')
+    Parser.add_argument('Levers', help = 'JSON or YAML file of lever selections, keyed by lever name. Missing levers take default values.')
+    Parser.add_argument('Output', help = 'JSON file, or directory of CSV files, in which results are saved.')
+    Args = Parser.parse_args()
+
+    Write_Results(Run_Scenario(Load_Levers(Args.Levers)), Args.Output)
+    print('Results written to {}'.format(Args.Output), file = sys.stderr)
@@ -0,0 +1,251 @@
+"""
+Benchmark suite for the Chemical Engineering aviation calculator.
+Times each calculation module and figure builder, and the full app pipeline, on fixed offline inputs from the bundled
+data files. Reports latency percentiles and peak memory, and a checksum of each result so that performance work can be
+shown not to change the numbers. Baselines are saved as JSON, and later runs compared against them.
+
+Usage: python Benchmarks.py [--repeats N] [--only NAME ...] [--save PATH] [--compare PATH] [--tolerance 0.25]
+Created October 2024
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+import AviationModel as Model
+import DataLoading
+import Figures as fg
+import GeneralisedFunctions as gf
+import ResultCache
+import ResultStore
+from CalculatorParameters import (CalculatorTime_Range, Default_Levers, LH_Demand_AmbLevels, LH_Share_AmbLevels, SH_Demand_AmbLevels,
+                                  SH_Share_AmbLevels, Dom_Demand_AmbLevels, Dom_Share_AmbLevels, Population_AmbLevels)
+
+def Check_Offline():
+    """
+    Ensures that benchmarks run on the bundled data files, rather than on data fetched over the network.
+    """
+    for FileName in [DataLoading.Workbook_File, DataLoading.EmissionFactors_File]:
+        if not os.path.exists(DataLoading.Resolve_Source(FileName)):
+            raise FileNotFoundError('Benchmarks require the bundled data file {}'.format(FileName))
+
+def Run_Pipeline():
+    """
+    Recalculates every module output and figure shown by the app, for the default lever selections.
+    """
+    Results = Model.Run_Scenario()
+    Figures = [fg.CreateFigure_Categorical(Results['Population'], 'Population', '', 'Persons', [-1, 1500], ChartType = 'Area'),
+               *fg.Figure_Total_Overview(Results['Total_Emissions']),
+               fg.CreateFigure_Categorical(Results['LH_Emissions'], 'Long haul aviation emissions', '', 'Emissions (kgCO2e)', [-1, 8.1e5]),
+               fg.CreateFigure_Categorical(Results['SH_Emissions'], 'Short haul aviation emissions', '', 'Emissions (kgCO2e)', [-1, 6e3]),
+               fg.CreateFigure_Categorical(Results['DOM_Emissions'], 'Domestic aviation emissions', '', 'Emissions (kgCO2e)', [-1, 6e3]),
+               fg.Figure_FTE_Emissions(Results['Total_Emissions'], Results['Population']),
+               fg.CreateFigure_Categorical(Results['Total_Demand'], 'Total Demand', '', 'Psg KM', [-1, 4.3e6])]
+    return Results['Total_Emissions'], Results['Total_Demand'], Figures
+
+def Build_Cases():
+    """
+    Sets up the fixed inputs of each benchmark.
+
+    Returns:
+        dict: Benchmark name -> (function to be timed, number of repeats relative to the default).
+    """
+    Check_Offline()
+    ResultStore.Use_Store(None)         # Modules are timed recalculating their results, rather than reading them back.
+    Raw = DataLoading.Load_Sheet('LongHaul')
+    Clean, BaU_ROC = gf.CleanData(Raw.copy())
+    Data_Shares = gf.Shares(Clean)
+    BaU_Demand = gf.BaU_Pathways(Data_Shares, 'Total')
+    Years = pd.DataFrame({'Year': CalculatorTime_Range})
+
+    EmF = Model.Travel_EmissionFactors()
+    Population = Model.Population_Module(Population_AmbLevels, *[Default_Levers['Population_' + n] for n in ['Change', 'Speed', 'Start']])
+    LH = Model.Generalised_TravelModule('LongHaul', LH_Demand_AmbLevels, LH_Share_AmbLevels, 1, 2, 2024, 1, 2, 2024, EmF, 70)
+    SH = Model.Generalised_TravelModule('ShortHaul', SH_Demand_AmbLevels, SH_Share_AmbLevels, 1, 2, 2024, 1, 2, 2024, EmF, 60)
+    DOM = Model.Generalised_TravelModule('Domestic', Dom_Demand_AmbLevels, Dom_Share_AmbLevels, 1, 2, 2024, 1, 2, 2024, EmF, 40)
+    Total_Emissions = Model.Sum_TravelEmissions(LH['Emissions'], SH['Emissions'], DOM['Emissions'])
+
+    # Staff population indexed over the default time range of Module_DemandShares.
+    Staff = Population.to_frame()[['ACAD', 'RSCH', 'SPPT']].reindex(range(2018, 2051)).bfill()
+    Staff.columns = gf.PopulationCategories('Staff')
+    Staff = gf.ModuleOutput.from_frame(Staff.reset_index(drop = True))
+
+    def Uncached(Module):
+        return inspect.unwrap(Module)
+
+    def Cold_Pipeline():
+        ResultCache.Clear_All()
+        DataLoading.Clear_Cache()
+        return Run_Pipeline()
+
+    Store = ResultStore.ResultStore(os.path.join(tempfile.mkdtemp(), 'results.sqlite'))
+    def Restarted_Pipeline():
+        ResultStore.Use_Store(Store)    # Filled by the first call.
+        try:
+            return Cold_Pipeline()
+        finally:
+            ResultStore.Use_Store(None)
+
+    return {
+        'CleanData': (lambda: gf.CleanData(Raw.copy()), 1),
+        'BaU_Pathways': (lambda: gf.BaU_Pathways(Data_Shares, 'Total'), 1),
+        'Projections': (lambda: gf.Projections(BaU_Demand, 'Total', LH_Demand_AmbLevels, 2.5, 5, 2026, Years.copy(), BaseYear = 2022), 1),
+        'Shares': (lambda: gf.Shares(Clean), 1),
+        'Module_DemandShares': (lambda: gf.Module_DemandShares(Raw.copy(), Staff, EmF, LH_Demand_AmbLevels, LH_Share_AmbLevels,
+                                                               'Staff', Travel_Type = 'Aviation'), 1),
+        'Travel_EmissionFactors': (lambda: Uncached(Model.Travel_EmissionFactors)(), 1),
+        'Generalised_TravelModule': (lambda: Uncached(Model.Generalised_TravelModule)('LongHaul', LH_Demand_AmbLevels, LH_Share_AmbLevels,
+                                                                                    2.5, 5, 2026, 3, 7, 2030, EmF, 70), 1),
+        'Population_Module': (lambda: Uncached(Model.Population_Module)(Population_AmbLevels, 2.5, 7, 2030), 1),
+        'Sum_TravelEmissions': (lambda: Uncached(Model.Sum_TravelEmissions)(LH['Emissions'], SH['Emissions'], DOM['Emissions']), 1),
+        'CreateFigure_Categorical': (lambda: Uncached(fg.CreateFigure_Categorical)(LH['Emissions'], 'Long haul aviation emissions', '',
+                                                                                    'Emissions (kgCO2e)', [-1, 8.1e5]), 0.5),
+        'Figure_Total_Overview': (lambda: Uncached(fg.Figure_Total_Overview)(Total_Emissions), 0.5),
+        'Figure_FTE_Emissions': (lambda: Uncached(fg.Figure_FTE_Emissions)(Total_Emissions, Population), 0.5),
+        'Pipeline (cold caches)': (Cold_Pipeline, 0.2),
+        'Pipeline (result store)': (Restarted_Pipeline, 0.2),
+        'Pipeline (warm caches)': (lambda: Run_Pipeline(), 0.5),
+    }
+
+def Checksum(Result):
+    """
+    Hashes the numbers in a benchmark result, to 10 significant figures.
+
+    Args:
+        Result (obj): Module outputs, dataframes, arrays or figures, or containers of these.
+
+    Returns:
+        str: Short hash of the numbers.
+    """
+    Arrays = []
+    def Collect(Value):
+        if isinstance(Value, gf.ModuleOutput):
+            Arrays.append(Value.Values)
+        elif isinstance(Value, (pd.DataFrame, pd.Series)):
+            Arrays.append(Value.to_numpy(dtype = float))
+        elif isinstance(Value, np.ndarray):
+            Arrays.append(Value)
+        elif isinstance(Value, Mapping):
+            for k in Value:
+                Collect(Value[k])
+        elif isinstance(Value, (list, tuple)):
+            for v in Value:
+                Collect(v)
+        elif hasattr(Value, 'data') and hasattr(Value, 'layout'):      # Plotly figure
+            for Trace in Value.data:
+                if getattr(Trace, 'y', None) is not None:
+                    Arrays.append(np.asarray(Trace.y, dtype = float))
+
+    Collect(Result)
+    Digest = hashlib.sha1()
+    for Array in Arrays:
+        Digest.update(' '.join('{:.10g}'.format(x) for x in np.ravel(Array)).encode())
+    return Digest.hexdigest()[:12]
+
+def Run_Benchmark(Function, Repeats = 30, MaxSeconds = 5):
+    """
+    Times a function, and measures the peak memory allocated by a single call.
+
+    Args:
+        Function (function): Function to be benchmarked.
+        Repeats (int, optional): Number of timed calls. Defaults to 30.
+        MaxSeconds (float, optional): Time after which no further calls are made. Defaults to 5.
+
+    Returns:
+        dict: Latency percentiles and mean (ms), peak memory (KiB), number of calls and result checksum.
+    """
+    Result = Function()         # Warm up
+    Times = []
+    Started = time.perf_counter()
+    for i in range(max(int(Repeats), 1)):
+        t = time.perf_counter()
+        Function()
+        Times.append((time.perf_counter() - t) * 1000)
+        if time.perf_counter() - Started > MaxSeconds:
+            break
+
+    tracemalloc.start()
+    Function()
+    Current, Peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'p50_ms': float(np.percentile(Times, 50)), 'p90_ms': float(np.percentile(Times, 90)),
+            'p99_ms': float(np.percentile(Times, 99)), 'mean_ms': float(np.mean(Times)),
+            'peak_kib': Peak / 1024, 'calls': len(Times), 'checksum': Checksum(Result)}
+
+def Compare(Results, Baseline, Tolerance = 0.25):
+    """
+    Flags benchmarks which are slower than the baseline by more than the tolerance, or whose numbers have changed.
+
+    Args:
+        Results (dict): Benchmark results, keyed by name.
+        Baseline (dict): Baseline benchmark results, keyed by name.
+        Tolerance (float, optional): Accepted fractional increase of the median latency. Defaults to 0.25.
+
+    Returns:
+        list: Descriptions of each regression found.
+    """
+    Regressions = []
+    for Name, Result in Results.items():
+        if Name not in Baseline:
+            continue
+        Base = Baseline[Name]
+        if Result['p50_ms'] > Base['p50_ms'] * (1 + Tolerance):
+            Regressions.append('{}: median {:.3f} ms, baseline {:.3f} ms'.format(Name, Result['p50_ms'], Base['p50_ms']))
+        if Result['checksum'] != Base['checksum']:
+            Regressions.append('{}: results changed (checksum {}, baseline {})'.format(Name, Result['checksum'], Base['checksum']))
+    return Regressions
+
+def Report(Results, Baseline = None):
+    Lines = ['{:<28}{:>10}{:>10}{:>10}{:>12}{:>8}{:>10}  {}'.format('Benchmark', 'p50 ms', 'p90 ms', 'p99 ms', 'peak KiB', 'calls',
+                                                                    'vs base', 'checksum')]
+    for Name, r in Results.items():
+        Change = ''
+        if Baseline and Name in Baseline:
+            Change = '{:+.0%}'.format(r['p50_ms'] / Baseline[Name]['p50_ms'] - 1)
+        Lines.append('{:<28}{:>10.3f}{:>10.3f}{:>10.3f}{:>12.1f}{:>8}{:>10}  {}'.format(Name, r['p50_ms'], r['p90_ms'], r['p99_ms'],
+                                                                                     r['peak_kib'], r['calls'], Change, r['checksum']))
+    return '\n'.join(Lines)
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Benchmark the calculation modules, figures and app pipeline.')
+    Parser.add_argument('--repeats', type = int, default = 30, help = 'Number of timed calls of each module.')
+    Parser.add_argument('--only', nargs = '+', help = 'Names of the benchmarks to run.')
+    Parser.add_argument('--save', help = 'Path to which the results are saved as a baseline.')
+    Parser.add_argument('--compare', help = 'Path to a saved baseline to compare against.')
+    Parser.add_argument('--tolerance', type = float, default = 0.25, help = 'Accepted fractional slowdown against the baseline.')
+    Args = Parser.parse_args()
+
+    Cases = Build_Cases()
+    Results = {}
+    for Name, (Function, Weight) in Cases.items():
+        if Args.only and Name not in Args.only:
+            continue
+        Results[Name] = Run_Benchmark(Function, Repeats = Args.repeats * Weight)
+
+    Baseline = None
+    if Args.compare:
+        with open(Args.compare) as f:
+            Baseline = json.load(f)['Results']
+    print(Report(Results, Baseline))
+
+    if Args.save:
+        with open(Args.save, 'w') as f:
+            json.dump({'Python': sys.version.split()[0], 'numpy': np.__version__, 'pandas': pd.__version__,
+                       'Results': Results}, f, indent = 1)
+
+    if Baseline:
+        Regressions = Compare(Results, Baseline, Args.tolerance)
+        for Regression in Regressions:
+            print('REGRESSION ' + Regression, file = sys.stderr)
+        sys.exit(1 if Regressions else 0)
@@ -0,0 +1,60 @@
+"""
+Parameter settings for the Chemical Engineering aviation calculator.
+Defines the ambition levels of each lever, the calculator time range and the default lever selections, 
+shared by the Streamlit app and the batch calculation modules.
+Created October 2024
+"""
+
+CalculatorTime_Range = list(range(2019, 2051))
+
+#%% Ambition levels - parameter setting 
+# Changes to long haul aviation activity
+LH_Demand_AmbLevels = {1: 1.1, 2: 0.9, 3: 0.7, 4: 0.6}
+
+LH_Share_AmbLevels = {
+    'First Class' :             {1: 0.003, 2: 0.001, 3: 0, 4: 0},
+    'Business Class':           {1: 0.07, 2: 0.03, 3: 0.02, 4: 0.0},
+    'Premium Economy Class':    {1: 0.18, 2: 0.219, 3: 0.2, 4: 0}, 
+    'Economy Class':            {1: 0.745, 2: 0.75, 3: 0.78, 4: 1},
+    'Unknown':                  {1: 0.002, 2: 0.00, 3: 0.0, 4: 0.0},
+}
+
+# Changes to short haul aviation activity
+SH_Demand_AmbLevels = {1: 1.1, 2: 0.9, 3: 0.7, 4: 0.6}
+
+SH_Share_AmbLevels = {
+    'First Class' :             {1: 0.003, 2: 0.001, 3: 0, 4: 0},
+    'Business Class':           {1: 0.07, 2: 0.03, 3: 0.02, 4: 0.0},
+    'Premium Economy Class':    {1: 0.18, 2: 0.219, 3: 0.2, 4: 0}, 
+    'Economy Class':            {1: 0.745, 2: 0.75, 3: 0.78, 4: 1},
+    'Unknown':                  {1: 0.002, 2: 0.00, 3: 0.0, 4: 0.0},
+}
+
+# Changes to domestic aviation activity
+Dom_Demand_AmbLevels = {1: 0.9, 2: 0.7, 3: 0.5, 4: 0}
+
+Dom_Share_AmbLevels = {
+    'First Class' :             {1: 0.003, 2: 0.00, 3: 0, 4: 0},
+    'Business Class':           {1: 0.07, 2: 0.03, 3: 0.02, 4: 0.00},
+    'Premium Economy Class':    {1: 0.18, 2: 0.219, 3: 0.2, 4: 0.0}, 
+    'Economy Class':            {1: 0.745, 2: 0.75, 3: 0.78, 4: 1.0},
+    'Unknown':                  {1: 0.002, 2: 0.001, 3: 0.000, 4: 0.0},
+}
+
+# Changes to population
+Population_AmbLevels = {1: 1.2, 2: 1.15, 3: 1.1, 4: 1.0}
+
+#%% Default lever selections, as shown on the control panel. 
+Default_Levers = {
+    'LH_Leakage': 70, 'LH_Demand_Lever': 1, 'LH_Demand_Speed': 2, 'LH_Demand_Start': 2024, 
+    'LH_Class_Lever': 1, 'LH_Class_Speed': 2, 'LH_Class_Start': 2024,
+    'SH_Leakage': 60, 'SH_Demand_Lever': 1, 'SH_Demand_Speed': 2, 'SH_Demand_Start': 2024, 
+    'SH_Class_Lever': 1, 'SH_Class_Speed': 2, 'SH_Class_Start': 2024,
+    'DOM_Leakage': 40, 'DOM_Demand_Lever': 1, 'DOM_Demand_Speed': 2, 'DOM_Demand_Start': 2024, 
+    'DOM_Class_Lever': 1, 'DOM_Class_Speed': 2, 'DOM_Class_Start': 2024,
+    'Population_Change': 3, 'Population_Speed': 2, 'Population_Start': 2024,
+}
+
+# Range of values of each kind of lever, as on the control panel. Speeds and start years are whole numbers of years.
+Lever_Bounds = {'Lever': (1, 4), 'Speed': (1, 40), 'Start': (2024, 2050), 'Leakage': (1, 100)}
+Integer_Levers = ['Speed', 'Start']
@@ -0,0 +1,337 @@
+"""
+Data loading layer for the NZ calculator.
+Reads the calculator inputs once per process, preferring the copies bundled with the repository.
+With CE_DATA_SOURCE=remote, inputs are instead fetched from the remote repository (see RemoteData), falling back to the bundled copies.
+Parsed inputs are also kept as a binary snapshot of memory-mapped arrays, rebuilt whenever the source files change.
+Snapshots can be built ahead of time with `python DataLoading.py`.
+Created October 2024
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import GeneralisedFunctions as gf
+
+Data_Directory = os.path.dirname(os.path.abspath(__file__))
+Remote_URL = 'https://raw.githubusercontent.com/sohqy/CE_Aviation/refs/heads/main/'
+
+Workbook_File = 'CE_Data_Public.xlsx'
+EmissionFactors_File = 'TravelEmissionFactors_2019Start.csv'
+Workbook_Sheets = ['LongHaul', 'ShortHaul', 'Domestic', 'Population']
+
+Snapshot_Directory = os.path.join(Data_Directory, '.snapshot')
+Snapshot_Version = 1
+
+Data_Source = os.environ.get('CE_DATA_SOURCE', 'local')     # 'local': bundled copies first, 'remote': remote repository first
+Download_Directory = os.path.join(Data_Directory, '.remote')
+Revalidate_Seconds = 300        # Time for which remote copies are used before checking for changes.
+
+_Logger = logging.getLogger(__name__)
+
+_Cache = {}                 # Source -> (stat key, file hash, parsed data)
+_Cache_Lock = threading.Lock()
+_Remote = {}                # File name -> (time fetched, path to local copy or None)
+_Remote_Fetching = None     # Set once the fetch in progress has finished, or None if there is none.
+_Remote_Lock = threading.Lock()
+
+def _Remote_Copy(FileName):
+    """
+    Path to an up-to-date copy of a remote data file. All data files are fetched together, concurrently. The lock is not
+    held during the download: callers needing a file while it is being fetched wait for that fetch rather than starting another.
+    """
+    global _Remote_Fetching
+    while True:
+        with _Remote_Lock:
+            Fetched = _Remote.get(FileName)
+            if Fetched is not None and time.monotonic() - Fetched[0] <= Revalidate_Seconds:
+                return Fetched[1]
+            Fetching = _Remote_Fetching
+            if Fetching is None:
+                Fetching = _Remote_Fetching = threading.Event()
+                break
+        Fetching.wait()
+
+    try:
+        import RemoteData
+        Paths = RemoteData.Fetch_All({f: Remote_URL + f for f in [Workbook_File, EmissionFactors_File]}, Download_Directory)
+        Now = time.monotonic()
+        with _Remote_Lock:
+            _Remote.update({f: (Now, Path) for f, Path in Paths.items()})
+    finally:
+        with _Remote_Lock:
+            _Remote_Fetching = None
+        Fetching.set()
+    return Paths[FileName]
+
+def Resolve_Source(FileName):
+    """
+    Finds where a data file should be read from. Bundled copies are preferred over the remote repository,
+    unless Data_Source is 'remote', in which case bundled copies are only used when the file cannot be fetched.
+
+    Args:
+        FileName (str): Name of the data file.
+
+    Returns:
+        str: Local path to the bundled file, or to the downloaded copy of the remote file.
+    """
+    LocalPath = os.path.join(Data_Directory, FileName)
+    if Data_Source != 'remote' and os.path.exists(LocalPath):
+        return LocalPath
+    RemotePath = _Remote_Copy(FileName)
+    if RemotePath is not None:
+        return RemotePath
+    if os.path.exists(LocalPath):
+        return LocalPath
+    raise FileNotFoundError('{} could not be fetched from {}, and is not bundled'.format(FileName, Remote_URL))
+
+def File_Hash(Path):
+    """
+    Calculates the SHA-256 hash of a file's contents.
+
+    Args:
+        Path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    Digest = hashlib.sha256()
+    with open(Path, 'rb') as f:
+        for Block in iter(lambda: f.read(1 << 20), b''):
+            Digest.update(Block)
+    return Digest.hexdigest()
+
+def _Cached(Source, Reader):
+    """
+    Returns the parsed contents of the given source, only calling the reader when the source has changed.
+    Local files are checked by modification time and size first, and by contents hash when those differ.
+    Remote sources are read once per process.
+
+    Args:
+        Source (str): Local path or URL of the data.
+        Reader (function): Function parsing the source.
+
+    Returns:
+        obj: Parsed data.
+    """
+    IsLocal = os.path.exists(Source)
+    if IsLocal:
+        Stat = os.stat(Source)
+        StatKey = (Stat.st_mtime_ns, Stat.st_size)
+    else:
+        StatKey = None
+
+    with _Cache_Lock:
+        Entry = _Cache.get(Source)
+        if Entry is not None and Entry[0] == StatKey:
+            return Entry[2]
+        Hash = File_Hash(Source) if IsLocal else Source
+        if Entry is not None and Entry[1] == Hash:          # Touched but unchanged.
+            _Cache[Source] = (StatKey, Hash, Entry[2])
+            return Entry[2]
+        Data = Reader(Source)
+        _Cache[Source] = (StatKey, Hash, Data)
+        return Data
+
+def _Stat_Key(Path):
+    Stat = os.stat(Path)
+    return [Stat.st_mtime_ns, Stat.st_size]
+
+def _Snapshot_Path(Source, *Parts):
+    # Keyed by the full path, so that sources of the same name in different directories keep their own snapshots.
+    Key = '{}.{}'.format(os.path.basename(Source), hashlib.sha256(os.path.abspath(Source).encode()).hexdigest()[:16])
+    return os.path.join(Snapshot_Directory, Key, *Parts)
+
+def Write_Snapshot(Source, Tables):
+    """
+    Saves parsed tables as a binary snapshot of the given source file. Each table is stored as numpy arrays, 
+    alongside a manifest recording the column names and the fingerprint of the source it was built from. 
+    Failures (e.g. a read-only deployment, or a table that is not numeric) are logged and otherwise ignored, as the
+    snapshot is only an accelerator.
+
+    Args:
+        Source (str): Path to the source file the tables were parsed from.
+        Tables (dict): Dataframes to be saved, keyed by table name. Contents must be numeric, with '-' treated as missing.
+    """
+    if not os.path.exists(Source):
+        return
+    Manifest = {'Version': Snapshot_Version, 'Stat': _Stat_Key(Source), 'Hash': File_Hash(Source), 'Tables': {}}
+    try:
+        Arrays = {Name: (Table.replace({'-': np.nan}).to_numpy(dtype = float), Table.index.to_numpy(dtype = np.int64))
+                  for Name, Table in Tables.items()}
+        os.makedirs(_Snapshot_Path(Source), exist_ok = True)
+        for Name, Table in Tables.items():
+            Values, Index = Arrays[Name]
+            for Part, Array in [('values', Values), ('index', Index)]:
+                FileName = '{}.{}.npy'.format(Name, Part)
+                TempPath = _Snapshot_Path(Source, '{}.{}.tmp.npy'.format(FileName, uuid.uuid4().hex))
+                np.save(TempPath, Array)
+                os.replace(TempPath, _Snapshot_Path(Source, FileName))
+            Manifest['Tables'][Name] = [str(c) for c in Table.columns]
+
+        TempPath = _Snapshot_Path(Source, 'manifest.{}.tmp'.format(uuid.uuid4().hex))
+        with open(TempPath, 'w') as f:
+            json.dump(Manifest, f)
+        os.replace(TempPath, _Snapshot_Path(Source, 'manifest.json'))       # Written last, so partial snapshots are never read.
+    except (OSError, ValueError) as Error:
+        _Logger.warning('Could not write the snapshot of %s: %s', Source, Error)
+
+def Read_Snapshot(Source):
+    """
+    Memory-maps the snapshot of the given source file, if one exists and is up to date. 
+
+    Args:
+        Source (str): Path to the source file.
+
+    Returns:
+        dict or None: Dataframes keyed by table name, or None if the snapshot is missing or stale. 
+    """
+    try:
+        with open(_Snapshot_Path(Source, 'manifest.json')) as f:
+            Manifest = json.load(f)
+        if Manifest['Version'] != Snapshot_Version:
+            return None
+        if Manifest['Stat'] != _Stat_Key(Source) and Manifest['Hash'] != File_Hash(Source):
+            return None
+
+        Tables = {}
+        for Name, Columns in Manifest['Tables'].items():
+            Values = np.load(_Snapshot_Path(Source, Name + '.values.npy'), mmap_mode = 'r')
+            Index = np.load(_Snapshot_Path(Source, Name + '.index.npy'), mmap_mode = 'r')
+            Table = pd.DataFrame(Values, index = Index, columns = Columns)
+            if 'Year' in Table.columns:
+                Table['Year'] = Table['Year'].astype(int)
+            Tables[Name] = Table
+        return Tables
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _Read_Workbook(Source):
+    Tables = Read_Snapshot(Source)
+    if Tables is None:
+        Tables = pd.read_excel(Source, sheet_name = list(Workbook_Sheets))
+        Write_Snapshot(Source, Tables)
+    return Tables
+
+def _Read_EmissionFactors(Source):
+    Tables = Read_Snapshot(Source)
+    if Tables is None:
+        Raw = pd.read_csv(Source, encoding = 'utf-8-sig')
+        Tables = {'Raw': Raw, 'GHG': gf.GHG_EmissionFactors(Raw.copy())}
+        Write_Snapshot(Source, Tables)
+    Tables['Table'] = gf.ModuleOutput.from_frame(Tables['GHG'])
+    return Tables
+
+def Build_Snapshot():
+    """
+    Rebuilds the snapshots of all bundled input files from source.
+    """
+    for FileName, Reader in [(Workbook_File, _Read_Workbook), (EmissionFactors_File, _Read_EmissionFactors)]:
+        Source = Resolve_Source(FileName)
+        if os.path.exists(_Snapshot_Path(Source, 'manifest.json')):
+            os.remove(_Snapshot_Path(Source, 'manifest.json'))
+        _Cache.pop(Source, None)
+        _Cached(Source, Reader)
+
+def Read_Workbook(Path, Sheets = Workbook_Sheets):
+    """
+    Reads the calculator sheets of any workbook laid out as the bundled one (e.g. of another department), 
+    kept in memory and as a snapshot in the same way as the bundled workbook.
+
+    Args:
+        Path (str): Path to the workbook.
+        Sheets (list, optional): Names of the sheets required. Defaults to Workbook_Sheets.
+
+    Returns:
+        dict: Dataframes of the raw sheet data, keyed by sheet name. These are shared and must not be modified.
+    """
+    Tables = _Cached(Path, _Read_Workbook)
+    return {Sheet: Tables[Sheet] for Sheet in Sheets}
+
+def Load_Workbook(Sheets = Workbook_Sheets):
+    """
+    Reads every calculator sheet of the workbook in a single pass.
+
+    Args:
+        Sheets (list, optional): Names of the sheets required. Defaults to Workbook_Sheets.
+
+    Returns:
+        dict: Dataframes of the raw sheet data, keyed by sheet name. These are shared and must not be modified.
+    """
+    return Read_Workbook(Resolve_Source(Workbook_File), Sheets)
+
+def Load_Sheet(SheetName):
+    """
+    Returns a single sheet of the calculator workbook.
+
+    Args:
+        SheetName (str): Name of the sheet, e.g. 'LongHaul' or 'Population'.
+
+    Returns:
+        dataframe: Copy of the raw sheet data, safe to be modified by the caller.
+    """
+    return Load_Workbook()[SheetName].copy()
+
+def Load_EmissionFactors():
+    """
+    Returns the raw travel emission factors.
+
+    Returns:
+        dataframe: Copy of the raw emission factor data, safe to be modified by the caller.
+    """
+    Source = Resolve_Source(EmissionFactors_File)
+    return _Cached(Source, _Read_EmissionFactors)['Raw'].copy()
+
+def Load_GHG_EmissionFactors():
+    """
+    Returns the travel emission factors extended to 2050 and combined across greenhouse gases.
+
+    Returns:
+        dataframe: Copy of the combined emission factors, with the year as its index.
+    """
+    Source = Resolve_Source(EmissionFactors_File)
+    return _Cached(Source, _Read_EmissionFactors)['GHG'].copy()
+
+def Load_EmissionFactor_Table():
+    """
+    Returns the combined travel emission factors as a dense (year x mode-fuel) array indexed by name, built once per data version.
+
+    Returns:
+        ModuleOutput: Shared, read-only emission factors, looked up with ModuleOutput.Lookup.
+    """
+    Source = Resolve_Source(EmissionFactors_File)
+    return _Cached(Source, _Read_EmissionFactors)['Table']
+
+def Data_Version():
+    """
+    Identifies the version of the input data currently in use, for use in cache keys.
+
+    Returns:
+        str: Combined hash of the workbook and emission factor sources.
+    """
+    Sources = [(Resolve_Source(Workbook_File), _Read_Workbook), (Resolve_Source(EmissionFactors_File), _Read_EmissionFactors)]
+    for Source, Reader in Sources:
+        _Cached(Source, Reader)
+    with _Cache_Lock:
+        return '-'.join(_Cache[Source][1][:16] for Source, Reader in Sources)
+
+def Clear_Cache():
+    """
+    Drops all parsed data, forcing the next load to read from source and remote files to be revalidated.
+    """
+    with _Cache_Lock:
+        _Cache.clear()
+    with _Remote_Lock:
+        _Remote.clear()
+
+if __name__ == '__main__':
+    Build_Snapshot()
+    print('Snapshots written to {}'.format(Snapshot_Directory), file = sys.stderr)
@@ -0,0 +1,236 @@
+"""
+Multi-department batch calculations for the NZ calculator.
+Reads a directory of departmental workbooks, each laid out as CE_Data_Public.xlsx, and stacks every sheet into a
+(department x year x category) array. All departments are projected together for one lever selection, by the kernels of
+the single-workbook calculations with the departments along their leading axis, sharing the emission factor table, and
+rolled up into institution-level totals.
+
+Usage: python Departments.py <directory of workbooks> <output directory> [--levers <lever file>] [--workers N]
+Created October 2024
+"""
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import DataLoading
+import GeneralisedFunctions as gf
+from CalculatorParameters import CalculatorTime_Range, Default_Levers, Population_AmbLevels
+from ScenarioSweep import Hauls, BaseYear, _Check_Levers
+
+Haul_Names = {'LH': 'Long Haul', 'SH': 'Short Haul', 'DOM': 'Domestic'}
+BaU_Years = np.arange(2018, 2051)
+
+@dataclass
+class DepartmentResult:
+    """
+    Results of every department, for one lever selection.
+
+    Attributes:
+        Departments (list): Name of each department.
+        Years (array): Years of the projected demand and population.
+        EmissionYears (array): Years of the calculated emissions.
+        Categories (dict): Travel classes of each haul, keyed by haul (e.g. 'LH').
+        Demand (dict): Demand of each haul in Psg km, with shape (departments, years, classes).
+        Emissions (dict): Emissions of each haul in kgCO2e, with shape (departments, emission years, classes).
+        Population_Categories (list): Population categories.
+        Population (array): Population of each category, with shape (departments, years, categories).
+    """
+    Departments: list
+    Years: np.ndarray
+    EmissionYears: np.ndarray
+    Categories: dict
+    Demand: dict
+    Emissions: dict
+    Population_Categories: list
+    Population: np.ndarray
+
+    def Totals(self):
+        """
+        Returns:
+            dataframe: Emissions of each haul and their 'Total' in tCO2e, the 'Population' and the 'Emissions_FTE' in
+                       tCO2e/person, indexed by department and year.
+        """
+        Totals = np.stack([np.nansum(self.Emissions[Haul], axis = -1) / 1000 for Haul in Hauls], axis = -1)     # Presented in tCO2e
+        Population = np.full(Totals.shape[:2], np.nan)
+        Population[:, np.isin(self.EmissionYears, self.Years)] = np.nansum(self.Population, axis = -1)
+        Index = pd.MultiIndex.from_product([self.Departments, self.EmissionYears], names = ['Department', 'Year'])
+        Table = pd.DataFrame(Totals.reshape(-1, len(Hauls)), index = Index, columns = [Haul_Names[h] for h in Hauls])
+        Table['Total'] = Totals.sum(axis = -1).ravel()
+        Table['Population'] = Population.ravel()
+        Table['Emissions_FTE'] = Table['Total'] / Table['Population']
+        return Table
+
+    def Institution(self):
+        """
+        Returns:
+            dataframe: Emissions of each haul and their 'Total' in tCO2e, the 'Population' and the 'Emissions_FTE' in
+                       tCO2e/person, summed over all departments, with the year as the index.
+        """
+        Totals = self.Totals()
+        Institution = Totals.drop(columns = 'Emissions_FTE').groupby(level = 'Year').sum(min_count = 1)
+        Institution['Emissions_FTE'] = Institution['Total'] / Institution['Population']
+        return Institution
+
+def Find_Workbooks(Directory, Pattern = '*.xlsx'):
+    """
+    Args:
+        Directory (str): Directory of the departmental workbooks.
+        Pattern (str, optional): Pattern of the workbook file names. Defaults to '*.xlsx'.
+
+    Returns:
+        dict: Path of each workbook, keyed by department name (the file name without extension), in name order.
+    """
+    Paths = sorted(glob.glob(os.path.join(Directory, Pattern)))
+    return {os.path.splitext(os.path.basename(Path))[0]: Path for Path in Paths if not os.path.basename(Path).startswith('~$')}
+
+def _Snapshot(Path):
+    DataLoading.Read_Workbook(Path)
+
+def Load_Departments(Workbooks, Workers = None):
+    """
+    Reads the workbook of every department. Workbooks without an up-to-date snapshot are parsed first, on a process pool
+    if there are several workers, after which all workbooks are read from their snapshots.
+
+    Args:
+        Workbooks (dict): Path of each workbook, keyed by department name.
+        Workers (int, optional): Number of processes parsing workbooks. Defaults to parsing in this process.
+
+    Returns:
+        dict: Sheets of each department's workbook, keyed by department name.
+    """
+    if Workers and Workers > 1:
+        Stale = [Path for Path in Workbooks.values() if DataLoading.Read_Snapshot(Path) is None]
+        if Stale:
+            with ProcessPoolExecutor(max_workers = Workers) as Executor:
+                list(Executor.map(_Snapshot, Stale))
+    return {Department: DataLoading.Read_Workbook(Path) for Department, Path in Workbooks.items()}
+
+def Stack_Sheet(Tables, Sheet):
+    """
+    Stacks one sheet of every department, aligned on the union of their years.
+
+    Args:
+        Tables (dict): Sheets of each department's workbook, keyed by department name.
+        Sheet (str): Name of the sheet.
+
+    Returns:
+        (array, list, array, array): Years, categories, values with shape (departments, years, categories), missing where
+        a department has no data for a year, and the BaU rate of change of each category with shape (departments, categories).
+
+    Raises:
+        ValueError: If the departments' sheets do not have the same categories.
+    """
+    Frames, BaU_ROC = zip(*[gf.CleanData(Table[Sheet].copy()) for Table in Tables.values()])
+    Categories = list(Frames[0].columns)
+    for Department, Frame in zip(Tables, Frames):
+        if list(Frame.columns) != Categories:
+            raise ValueError('{} sheet of {} has categories {}, not {}'.format(Sheet, Department, list(Frame.columns), Categories))
+    Years = np.unique(np.concatenate([Frame.index.to_numpy(dtype = int) for Frame in Frames]))
+    Values = np.full((len(Frames), len(Years), len(Categories)), np.nan)
+    for d, Frame in enumerate(Frames):
+        Values[d, gf.Year_Positions(Years, Frame.index.to_numpy(dtype = int))] = Frame.to_numpy(dtype = float)
+    return Years, Categories, Values, np.array([ROC[Categories].to_numpy(dtype = float) for ROC in BaU_ROC])
+
+def Prepare_Departments(Tables):
+    """
+    Stacks the data of every department, and looks up the emission factors shared by all of them.
+
+    Args:
+        Tables (dict): Sheets of each department's workbook, keyed by department name, as from Load_Departments.
+
+    Returns:
+        dict: Stacked inputs, to be passed to Evaluate_Departments.
+    """
+    if not Tables:
+        raise ValueError('No departmental workbooks were given')
+    EmFactors = DataLoading.Load_EmissionFactor_Table()
+    Inputs = {'Departments': list(Tables), 'Years': np.array(CalculatorTime_Range), 'EmissionYears': EmFactors.Years, 'Hauls': {}}
+    for Haul, (Sheet, Shorthand, Demand_AmbLevels, Share_AmbLevels) in Hauls.items():
+        Years, Categories, Values, BaU_ROC = Stack_Sheet(Tables, Sheet)
+        Inputs['Hauls'][Haul] = {'Years': Years, 'Categories': Categories, 'Activity': Values,
+                                 'EmF': gf.Aviation_EmissionFactors(Categories, Shorthand, EmFactors, EmFactors.Years)}
+
+    Years, Categories, Values, BaU_ROC = Stack_Sheet(Tables, 'Population')
+    Inputs['Population'] = {'Years': Years, 'Categories': Categories, 'Data': Values, 'BaU_ROC': BaU_ROC}
+    return Inputs
+
+def Evaluate_Departments(Inputs, Levers = None):
+    """
+    Calculates the demand, emissions and population of every department at once.
+
+    Args:
+        Inputs (dict): Stacked inputs from Prepare_Departments.
+        Levers (dict, optional): Lever selections keyed by lever name, applied to every department.
+                                 Levers which are not given are kept at their default values.
+
+    Returns:
+        DepartmentResult: Results of every department.
+    """
+    Levers = dict(Default_Levers, **(Levers or {}))
+    _Check_Levers(Levers)
+    Years, EmissionYears = Inputs['Years'], Inputs['EmissionYears']
+
+    Categories, Demand, Emissions = {}, {}, {}
+    for Haul, (Sheet, Shorthand, Demand_AmbLevels, Share_AmbLevels) in Hauls.items():
+        HaulInputs = Inputs['Hauls'][Haul]
+        Activity = HaulInputs['Activity'] / (Levers[Haul + '_Leakage']/100)
+        Total = np.nansum(Activity, axis = -1)
+        Total[np.isnan(Activity).all(axis = -1)] = np.nan       # Years without data, which are extrapolated.
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            HistShares = Activity / Total[..., None]
+        DemandLevers = [Levers[Haul + '_Demand_' + n] for n in ['Lever', 'Speed', 'Start']]
+        ClassLevers = [Levers[Haul + '_Class_' + n] for n in ['Lever', 'Speed', 'Start']]
+
+        Categories[Haul] = HaulInputs['Categories']
+        HaulDemand, Shares = gf.Travel_Kernel(HaulInputs['Years'], Total, HistShares, Demand_AmbLevels, Share_AmbLevels,
+                                              Categories[Haul], DemandLevers, ClassLevers, Years, BaseYear = BaseYear)
+        Demand[Haul] = HaulDemand[..., None] * Shares
+        Aligned = np.full((len(Activity), len(EmissionYears), len(Categories[Haul])), np.nan)
+        Aligned[:, np.isin(EmissionYears, Years)] = Demand[Haul][:, gf.Year_Positions(Years, EmissionYears[np.isin(EmissionYears, Years)])]
+        Emissions[Haul] = HaulInputs['EmF'] * Aligned
+
+    Population = Inputs['Population']
+    PopulationLevers = [Levers['Population_' + n] for n in ['Change', 'Speed', 'Start']]
+    BaU = np.swapaxes(gf.BaU_Array(Population['Years'], Population['Data'], Population['BaU_ROC'], BaU_Years), -1, -2)
+    Projected = np.swapaxes(gf.Projections_Array(BaU, BaU_Years, Population_AmbLevels, PopulationLevers, Years, BaseYear = BaseYear), -1, -2)
+
+    return DepartmentResult(Inputs['Departments'], Years, EmissionYears, Categories, Demand, Emissions,
+                            Population['Categories'], gf.Mask_NonFinite(np.round(Projected, 0)))     # As in Population_Module
+
+def Run_Departments(Directory, Levers = None, Workers = None):
+    """
+    Calculates every department with a workbook in the given directory.
+
+    Args:
+        Directory (str): Directory of the departmental workbooks.
+        Levers (dict, optional): Lever selections keyed by lever name, applied to every department. Defaults to the default levers.
+        Workers (int, optional): Number of processes parsing workbooks without a snapshot. Defaults to parsing in this process.
+
+    Returns:
+        DepartmentResult: Results of every department.
+    """
+    Tables = Load_Departments(Find_Workbooks(Directory), Workers = Workers)
+    return Evaluate_Departments(Prepare_Departments(Tables), Levers)
+
+if __name__ == '__main__':
+    import AviationModel
+
+    Parser = argparse.ArgumentParser(description = 'Calculate the aviation emissions of every department, and of the whole institution.')
+    Parser.add_argument('Directory', help = 'Directory of departmental workbooks, laid out as CE_Data_Public.xlsx.')
+    Parser.add_argument('Output', help = 'Directory in which Departments.csv and Institution.csv are saved.')
+    Parser.add_argument('--levers', help = 'JSON or YAML file of lever selections, applied to every department.')
+    Parser.add_argument('--workers', type = int, default = None, help = 'Number of processes parsing workbooks.')
+    Args = Parser.parse_args()
+
+    Result = Run_Departments(Args.Directory, AviationModel.Load_Levers(Args.levers) if Args.levers else None, Args.workers)
+    os.makedirs(Args.Output, exist_ok = True)
+    Result.Totals().to_csv(os.path.join(Args.Output, 'Departments.csv'))
+    Result.Institution().to_csv(os.path.join(Args.Output, 'Institution.csv'))
+    print('Results of {} departments written to {}'.format(len(Result.Departments), Args.Output), file = sys.stderr)
@@ -0,0 +1,150 @@
+"""
+Figure generators of the Chemical Engineering aviation calculator.
+Plotly is only imported when a figure is first built, so that importing this module (e.g. alongside AviationModel) stays fast.
+The layout, template and traces of each built figure are kept as a skeleton, so that figures with the same structure are made
+by only replacing the y values of the skeleton's traces, without building them through Plotly Express again.
+Numeric trace values are kept as arrays, which Plotly serialises as base64 typed arrays.
+Figures of the app are memoised as the calculation modules are, so every session of the app showing the same results
+shares the same figure objects, which must therefore not be modified after they are returned.
+Created October 2024
+"""
+
+import numpy as np
+import pandas as pd
+
+import GeneralisedFunctions as gf
+import Profiling
+import ResultCache
+
+_Skeletons = ResultCache.Register('Figure_Skeletons', ResultCache.ModuleCache(MaxSize = 32))
+
+def _Template():
+    import plotly.io as pio
+    return pio.templates.default
+
+def _From_Skeleton(Key, Traces):
+    """
+    Args:
+        Key (tuple): Everything setting the figure apart other than the y values of its traces, e.g. titles, ranges, categories and years.
+        Traces (dict): y values of each trace, keyed by trace name.
+
+    Returns:
+        Figure: Copy of the skeleton saved under the key with the given y values, or None if there is no skeleton.
+    """
+    import plotly.graph_objects as go
+    Found, Skeleton = _Skeletons.Get(Key + (_Template(),))
+    if not Found:
+        return None
+    Data = [dict(Trace, y = np.asarray(Traces[Trace['name']], dtype = float)) for Trace in Skeleton['data']]
+    return go.Figure({'data': Data, 'layout': Skeleton['layout']})
+
+def _Save_Skeleton(Key, fig):
+    Skeleton = fig.to_dict()
+    Skeleton['layout']['template'] = fig.layout.template        # Copied as an object, which is faster than from its dictionary.
+    _Skeletons.Put(Key + (_Template(),), Skeleton)
+    return fig
+
+@Profiling.Profiled
+@ResultCache.Memoise(MaxSize = 32, Context = _Template)
+def CreateFigure_Categorical(CategoriesData, FigTitle, xLabel, yLabel, yRange, xRange = [2019, 2030], ChartType = 'Line'):
+    import plotly.express as px
+    Data = gf.OutputToDF(CategoriesData)
+    Categories = list(Data.columns)
+    Key = ('Categorical', FigTitle, xLabel, yLabel, tuple(yRange), tuple(xRange), ChartType, tuple(Categories), tuple(Data.index))
+    fig = _From_Skeleton(Key, {str(c): Data[c] for c in Categories})
+    if fig is not None:
+        return fig
+
+    if ChartType == 'Area':
+        fig = px.area(Data, y = Categories, 
+                    title = FigTitle,
+                    labels = {'value':yLabel, 'index': xLabel}, range_y=yRange, range_x=xRange)
+    else:
+        fig = px.line(Data, y = Categories, 
+                title = FigTitle,
+                labels = {'value':yLabel, 'index': xLabel}, range_y=yRange, range_x=xRange) 
+    return _Save_Skeleton(Key, fig)
+
+
+@Profiling.Profiled
+@ResultCache.Memoise(MaxSize = 32, Context = _Template)
+def Figure_Total_Overview(TotalEmissions):
+    import plotly.express as px
+    Total_AviationEmissions = gf.OutputToDF(TotalEmissions)
+    All_Emissions = Total_AviationEmissions['Total']
+    Categorical_Totals = Total_AviationEmissions[['Long Haul', 'Short Haul', 'Domestic']]
+
+    Cumulative_Emissions = All_Emissions.cumsum()
+    Baseline_Emission = All_Emissions.loc[2022]
+
+    Key = ('Overview', tuple(All_Emissions.index))
+    fig = _From_Skeleton(Key, {Name: Total_AviationEmissions[Name] for Name in ['Long Haul', 'Short Haul', 'Domestic', 'Total']})
+    fig_Cumulative = _From_Skeleton(Key + ('Cumulative',), {'Total': Cumulative_Emissions})
+    if fig is not None and fig_Cumulative is not None:
+        fig.update_shapes(y0 = Baseline_Emission, y1 = Baseline_Emission, selector = 0)     # Baseline line and its label.
+        fig.update_annotations(y = Baseline_Emission, selector = 0)
+        return fig, fig_Cumulative
+
+    fig_Cumulative = px.area(Cumulative_Emissions, 
+                  labels = {'value':'Cumulative Emissions (tCO2e)'}, range_y=[-1,3.5e4], range_x=[2019, 2030])
+    
+    fig = px.area(Categorical_Totals, range_y=[-1, 1300], labels = {'value':'Emissions (tCO2e)', 'index':''}, range_x=[2019, 2030])
+    fig.add_traces(px.line(All_Emissions, markers=True, color_discrete_sequence= ['black']).data)
+    fig.add_hline(y=Baseline_Emission, line_width=2, line_dash="dash", 
+        line_color="#ff8c00",  annotation_text="2022/23 Emissions (Baseline)", annotation_font_color="#ff8c00" )
+    # fig.add_hline(y = 0.75 * Baseline_Emission, line_width = 2, line_color = '#008080', annotation_font_color="#008080",  
+    #               annotation_text="2026 Emissions target (25% reduction)", line_dash = 'dot')
+    fig.add_vline(x=2023, line_width=2, line_dash="dash", line_color="#0000cd")
+    return _Save_Skeleton(Key, fig), _Save_Skeleton(Key + ('Cumulative',), fig_Cumulative)
+
+@Profiling.Profiled
+@ResultCache.Memoise(MaxSize = 32, Context = _Template)
+def Figure_FTE_Emissions(TotalEmissions, Population):
+    import plotly.express as px
+    Total_AviationEmissions = gf.OutputToDF(TotalEmissions)
+    All_Emissions = Total_AviationEmissions['Total']
+
+    # Sum over all CE population. Should this be just over staff/PG? 
+    Population = gf.OutputToDF(Population)
+    Population_Total = Population.sum(axis = 1) 
+    Emissions_FTE = All_Emissions/Population_Total
+
+    # Key targets and values.
+    Key_EmissionsFTE_Values = pd.DataFrame({'Baseline (2022)': Emissions_FTE.loc[2022], 'Target': Emissions_FTE.loc[2022] * 0.75, 'Current Selection (2026)': Emissions_FTE.loc[2026]}, index = [0])
+    fig = _From_Skeleton(('FTE',), {'0': Key_EmissionsFTE_Values.loc[0]})
+    if fig is not None:
+        return fig
+
+    fig = px.bar(Key_EmissionsFTE_Values.T, labels = {'value':'Emissions per person (tCO2e/person)', 'index':''},
+                  range_y=[-0.1,1], text_auto='.3f')
+    fig.update(layout_showlegend=False)
+    return _Save_Skeleton(('FTE',), fig)
+
+@Profiling.Profiled
+def Figure_Uncertainty(Bands, FigTitle, yLabel, yRange = None, xRange = [2019, 2030]):
+    import plotly.graph_objects as go
+    Columns = list(Bands.columns)       # Percentiles in increasing order, paired from the outside in.
+    fig = go.Figure()
+    for i in range(len(Columns) // 2):
+        Lower, Upper = Columns[i], Columns[-1 - i]
+        fig.add_trace(go.Scatter(x = Bands.index, y = Bands[Lower], mode = 'lines', line_width = 0, showlegend = False, 
+                                 hoverinfo = 'skip', line_color = '#0000cd'))
+        fig.add_trace(go.Scatter(x = Bands.index, y = Bands[Upper], mode = 'lines', line_width = 0, fill = 'tonexty', 
+                                 name = '{} - {}'.format(Lower, Upper), line_color = '#0000cd', opacity = 0.2 + 0.2 * i))
+    if len(Columns) % 2:
+        fig.add_trace(go.Scatter(x = Bands.index, y = Bands[Columns[len(Columns) // 2]], mode = 'lines', 
+                                 name = Columns[len(Columns) // 2], line_color = 'black'))
+    fig.update_layout(title = FigTitle, yaxis_title = yLabel, xaxis_range = xRange, yaxis_range = yRange)
+    return fig
+
+@Profiling.Profiled
+def Figure_Tornado(Tornado, FigTitle, xLabel, Inputs = 10):
+    import plotly.graph_objects as go
+    Data = Tornado.head(Inputs).iloc[::-1]       # Largest swing at the top.
+    fig = go.Figure()
+    for Side in ['Low', 'High']:
+        fig.add_trace(go.Bar(y = Data.index, x = Data[Side] - Data['Base'], base = Data['Base'], orientation = 'h',
+                             name = '{} value'.format(Side), customdata = Data[[Side + '_Value', Side]],
+                             hovertemplate = '%{y} = %{customdata[0]}: %{customdata[1]:.3f}<extra></extra>'))
+    fig.update_layout(title = FigTitle, xaxis_title = xLabel, barmode = 'overlay')
+    return fig
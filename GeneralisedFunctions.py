@@ -8,6 +8,10 @@ Last updated October 2024
 import numpy as np
 import pandas as pd 
 import io
+import hashlib
+import math
+from dataclasses import dataclass
+from functools import cached_property
 
 def CleanData(Data):
     """
@@ -79,6 +83,227 @@ def BaU_Pathways(Data, Category, BaU_ROC = None, CalculatorTime_Range = list(ran
 
     return BaUData
 
+def Year_Positions(IndexYears, Years):
+    """
+    Finds the positions of the given years in a year index.
+
+    Args:
+        IndexYears (array): Years of the index, in increasing order.
+        Years (array): Years to be found.
+
+    Returns:
+        array: Integer positions of each year in the index.
+    """
+    IndexYears = np.asarray(IndexYears)
+    Years = np.asarray(Years).astype(IndexYears.dtype)
+    Positions = np.clip(np.searchsorted(IndexYears, Years), 0, len(IndexYears) - 1)
+    if not np.all(IndexYears[Positions] == Years):
+        raise KeyError('Years not found: {}'.format(np.setdiff1d(Years, IndexYears)))
+    return Positions
+
+def BaU_Array(HistYears, HistValues, BaU_ROC = None, CalculatorTime_Range = list(range(2018, 2051))):
+    """
+    Array counterpart of BaU_Pathways, extrapolating the historical data of all categories at once. 
+
+    Args:
+        HistYears (array): Years of the historical data.
+        HistValues (array): Historical data with shape (len(HistYears), categories), or (..., len(HistYears), categories) 
+                            for stacked data, e.g. of several departments.
+        BaU_ROC (array, optional): Rate of change of each category. If not available, the last known historical data point is used. Defaults to None.
+        CalculatorTime_Range (list, optional): List corresponding to the time steps used in the calculator. Defaults to list(range(2018, 2051)).
+
+    Returns:
+        array: BaU pathways with shape (len(CalculatorTime_Range), categories), or (..., len(CalculatorTime_Range), categories).
+    """
+    Years = np.asarray(CalculatorTime_Range)
+    HistValues = np.asarray(HistValues, dtype = float)
+    if HistValues.ndim > 2:         # Stacked data, extrapolated with each (..., category) as a column.
+        Shape = HistValues.shape[:-2] + HistValues.shape[-1:]
+        Columns = np.moveaxis(HistValues, -2, 0).reshape(HistValues.shape[-2], -1)
+        BaU_ROC = None if BaU_ROC is None else np.broadcast_to(np.asarray(BaU_ROC, dtype = float), Shape).reshape(-1)
+        BaUData = BaU_Array(HistYears, Columns, BaU_ROC, CalculatorTime_Range)
+        return np.moveaxis(BaUData.reshape((len(Years),) + Shape), 0, -2)
+    BaUData = np.full((len(Years), HistValues.shape[1]), np.nan)
+    Found = np.isin(Years, HistYears)
+    BaUData[Found] = HistValues[Year_Positions(HistYears, Years[Found])]
+
+    # Find final historical data point, and the first year in which it is reached.
+    Known = ~np.isnan(BaUData)
+    FinalPoint = BaUData[len(Years) - 1 - np.argmax(Known[::-1], axis = 0), np.arange(BaUData.shape[1])]
+    FinalYear = Years[np.argmax(BaUData == FinalPoint, axis = 0)]
+
+    # Apply change rates if applicable.
+    if BaU_ROC is not None:
+        Fill = FinalPoint * (1 + np.asarray(BaU_ROC, dtype = float)) ** (Years[:, None] - FinalYear)
+    else:
+        Fill = np.broadcast_to(FinalPoint, BaUData.shape)
+    return np.where(Known, BaUData, Fill)
+
+_Compiled_AmbitionLevels = {}
+
+def Compile_AmbitionLevels(Ambition_Definitions, Categories = None):
+    """
+    Translates ambition level definitions into a dense array, so that they can be evaluated for many categories and 
+    levels at once. Compiled definitions are kept, so each definition is only compiled once.
+
+    Args:
+        Ambition_Definitions (dict): Definition of each level of ambition, either for a single category ({Level: Value}), 
+                                     or for several categories ({Category: {Level: Value}}).
+        Categories (list, optional): Order of the categories in the compiled array. Defaults to the order of the definitions.
+
+    Returns:
+        array: Values of levels 1 to 4, with shape (4,) for a single category or (len(Categories), 4).
+    """
+    Key = (repr(Ambition_Definitions), None if Categories is None else tuple(Categories))
+    if Key not in _Compiled_AmbitionLevels:
+        if 1 in Ambition_Definitions:
+            Table = np.array([Ambition_Definitions[k] for k in range(1, 5)], dtype = float)
+        else:
+            if Categories is None:
+                Categories = list(Ambition_Definitions.keys())
+            Table = np.array([[Ambition_Definitions[c][k] for k in range(1, 5)] for c in Categories], dtype = float)
+        Table.flags.writeable = False
+        _Compiled_AmbitionLevels[Key] = Table
+    return _Compiled_AmbitionLevels[Key]
+
+def Ambition_Values(Ambition_Definitions, Level, BaseYear_Value = 1, AmbitionsMode = 'Percentage'):
+    """
+    Interpolates the target value between the integer ambition levels, for many categories and selected levels at once.
+
+    Args:
+        Ambition_Definitions (dict or array): Definition of each level of ambition, or its compiled form from Compile_AmbitionLevels.
+        Level (float or array): Selected level(s) of ambition.
+        BaseYear_Value (float or array, optional): Base year value(s) used to translate percentage definitions into absolute terms. Defaults to 1.
+        AmbitionsMode (str, optional): Signifies whether the ambition levels are defined in proportional or absolute terms. Defaults to 'Percentage'.
+
+    Returns:
+        array: Target values corresponding to the selected ambition levels, with shape (*Level.shape, *Categories).
+    """
+    if isinstance(Ambition_Definitions, dict):
+        Ambition_Definitions = Compile_AmbitionLevels(Ambition_Definitions)
+    LevelValues = np.moveaxis(Ambition_Definitions, -1, 0)        # Levels first, then categories.
+    if AmbitionsMode == 'Percentage':
+        LevelValues = LevelValues * BaseYear_Value
+
+    Level = np.asarray(Level, dtype = float)
+    AmbitionLevel_UB, AmbitionLevel_LB = np.ceil(Level), np.floor(Level)
+    AmbitionLevel_UB = np.where(AmbitionLevel_UB == AmbitionLevel_LB, AmbitionLevel_UB + 1, AmbitionLevel_UB)
+    Lower = LevelValues[np.clip(AmbitionLevel_LB, 1, 4).astype(int) - 1]
+    Upper = LevelValues[np.clip(AmbitionLevel_UB, 1, 4).astype(int) - 1]
+
+    Expand = (...,) + (None,) * (LevelValues.ndim - 1)             # Broadcast levels against the categories.
+    Level, AmbitionLevel_UB, AmbitionLevel_LB = Level[Expand], AmbitionLevel_UB[Expand], AmbitionLevel_LB[Expand]
+    Interpolated = (AmbitionLevel_UB - Level) * Lower + (Level - AmbitionLevel_LB) * Upper
+    return np.where(Level == 4, LevelValues[3], Interpolated)
+
+def _Scalar_Power(Base, Exponent):
+    try:
+        return math.pow(Base, Exponent)
+    except (ValueError, OverflowError):
+        return float(np.power(Base, Exponent))
+
+def Scalar_Powers(Base, Exponent):
+    """
+    Elementwise powers calculated as for single values, so that they are identical to those of the year-by-year 
+    calculations. Vectorised array powers can differ from these in the last bits, enough to change rounded results.
+    Each distinct pair of base and exponent is only calculated once.
+
+    Args:
+        Base (array): Bases.
+        Exponent (array): Exponents, with the same shape as Base.
+
+    Returns:
+        array: Base ** Exponent.
+    """
+    Pairs, Inverse = np.unique(np.asarray(Base, dtype = float) + 1j * np.asarray(Exponent, dtype = float), return_inverse = True)
+    Powers = np.frompyfunc(_Scalar_Power, 2, 1)(Pairs.real, Pairs.imag).astype(float)
+    return Powers[Inverse].reshape(np.shape(Base))
+
+def Projection_Pathways(BaU, Years, Ambition_Value, AmbitionSpeed, AmbitionStart, AmbStartValue):
+    """
+    Vectorised core of the projection calculation. Builds whole year-by-year pathways in one array operation, 
+    following the BaU before the action starts, ramping geometrically over the action period and plateauing at the target.  
+
+    Args:
+        BaU (array): Business as usual values at each of the given years, with shape (..., len(Years)).
+        Years (array): Years of the projected pathway. 
+        Ambition_Value (float or array): Target value(s) reached at the end of the action period. 
+        AmbitionSpeed (float or array): The number of years in which action is to be taken. 
+        AmbitionStart (int or array): The year in which action begins. 
+        AmbStartValue (float or array): BaU value in the year before action begins. 
+
+    Returns:
+        array: Projected pathways, with shape (..., len(Years)). Lever arguments are broadcast against the leading dimensions. 
+    """
+    Years = np.asarray(Years, dtype = float)
+    Ambition_Value = np.asarray(Ambition_Value, dtype = float)[..., None]
+    AmbitionSpeed = np.asarray(AmbitionSpeed, dtype = float)[..., None]
+    AmbitionStart = np.asarray(AmbitionStart, dtype = float)[..., None]
+    AmbStartValue = np.asarray(AmbStartValue, dtype = float)[..., None]
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        Ratio, Root = np.broadcast_arrays(Ambition_Value / AmbStartValue, 1 / AmbitionSpeed)
+        Rate = np.where(AmbStartValue == 0, 0, Scalar_Powers(Ratio, Root) - 1)
+
+        # Powers are only needed during the action period.
+        Shape = np.broadcast_shapes(np.shape(BaU), Rate.shape, AmbitionStart.shape, Years.shape)
+        Ramping = np.broadcast_to((Years >= AmbitionStart) & (Years < AmbitionStart + AmbitionSpeed), Shape)
+        Growth = np.zeros(Shape)
+        Growth[Ramping] = Scalar_Powers(np.broadcast_to(1 + Rate, Shape)[Ramping], np.broadcast_to(Years - AmbitionStart + 1, Shape)[Ramping])
+        Ramp = np.maximum(AmbStartValue * Growth, 0)
+
+    Pathways = np.where(Years >= AmbitionStart + AmbitionSpeed, Ambition_Value, Ramp)
+    return np.where(Years < AmbitionStart, BaU, Pathways)
+
+def Projections_Array(BaU, BaUYears, Ambition_Definitions, Levers, Years, BaseYear = 2018, AmbitionsMode = 'Percentage'):
+    """
+    Array counterpart of Projections_Batch, projecting either one BaU pathway for a batch of lever settings, or many BaU 
+    pathways (e.g. of several departments or samples) for a single lever setting. 
+
+    Args:
+        BaU (array): Business as usual values at each of BaUYears, with shape (len(BaUYears),) or (..., len(BaUYears)). 
+        BaUYears (array): Years of the business as usual values. 
+        Ambition_Definitions (dict): Definition of each level of ambition for the category of interest.
+        Levers (array): Lever settings as rows of (Level, AmbitionSpeed, AmbitionStart), with shape (n, 3) for a single 
+                        BaU pathway, or (3,). 
+        Years (list): Years of the projected pathways. 
+        BaseYear (int, optional): The year in which changes are in reference to. Defaults to 2018.
+        AmbitionsMode (str, optional): Signifies whether the ambition levels are defined in proportional or absolute terms. Defaults to 'Percentage'.
+
+    Returns:
+        array: Projected pathways with shape (n, len(Years)), or (..., len(Years)) for a single set of levers. 
+    """
+    BaU = np.asarray(BaU, dtype = float)
+    Levers = np.asarray(Levers, dtype = float)
+    Level, AmbitionSpeed, AmbitionStart = Levers[..., 0], Levers[..., 1], Levers[..., 2]
+
+    BaseYear_Value = BaU[..., Year_Positions(BaUYears, [BaseYear])[0]]
+    Compiled = Compile_AmbitionLevels(Ambition_Definitions)
+    Ambition_Value = Ambition_Values(np.broadcast_to(Compiled, BaseYear_Value.shape + Compiled.shape), Level, BaseYear_Value, AmbitionsMode)
+    AmbStartValue = BaU[..., Year_Positions(BaUYears, AmbitionStart.astype(int) - 1)]
+
+    return Projection_Pathways(BaU[..., Year_Positions(BaUYears, Years)], Years, Ambition_Value, AmbitionSpeed, AmbitionStart, AmbStartValue)
+
+def Projections_Batch(BaUData, Category, Ambition_Definitions, Levers, Years, BaseYear = 2018, AmbitionsMode = 'Percentage'):
+    """
+    Calculates projected pathways for the given category for a batch of lever settings at once. 
+
+    Args:
+        BaUData (dataframe): Business as usual data that includes the given category of interest.
+        Category (str): The category of interest in this calculation. 
+        Ambition_Definitions (dict): Definition of each level of ambition for the given category.
+        Levers (array): Lever settings as rows of (Level, AmbitionSpeed, AmbitionStart), with shape (n, 3) or (3,).
+        Years (list): Years of the projected pathways. 
+        BaseYear (int, optional): The year in which changes are in reference to. Defaults to 2018.
+        AmbitionsMode (str, optional): Signifies whether the ambition levels are defined in proportional or absolute terms. Defaults to 'Percentage'.
+
+    Returns:
+        array: Projected pathways with shape (n, len(Years)), or (len(Years),) for a single set of levers. 
+    """
+    BaU = BaUData[Category]
+    return Projections_Array(BaU.to_numpy(), BaU.index.to_numpy(), Ambition_Definitions, Levers, Years, BaseYear = BaseYear, 
+                             AmbitionsMode = AmbitionsMode)
+
 def Projections(BaUData, Category, Ambition_Definitions, Level, AmbitionSpeed, AmbitionStart, ProjectedChanges, 
                 BaseYear = 2018, AmbitionsMode = 'Percentage'):    
     """
@@ -98,40 +323,26 @@ def Projections(BaUData, Category, Ambition_Definitions, Level, AmbitionSpeed, A
     Returns:
         dataframe: The dataframe which stores the projected pathways. 
     """
-    # Define base year and set up ambition bounds. 
-    BaseYear_Value = BaUData[Category].loc[BaseYear]
-    AmbitionLevel_UB, AmbitionLevel_LB = Determine_AmbitionLevelBounds(Level)
+    ProjectedChanges[Category] = Projections_Batch(BaUData, Category, Ambition_Definitions, (Level, AmbitionSpeed, AmbitionStart), 
+                                                   ProjectedChanges['Year'], BaseYear = BaseYear, AmbitionsMode = AmbitionsMode)
 
-    if AmbitionsMode == 'Percentage':
-        MappedAmbitionLevels = {k: v * BaseYear_Value for k, v in Ambition_Definitions.items()}  # Translate percentages into correct units, if not this is absolute 
-    else:
-        MappedAmbitionLevels = Ambition_Definitions
+    return ProjectedChanges
 
-    if Level == 4:
-        Ambition_Value = MappedAmbitionLevels[Level]
-    else:
-        Ambition_Value = (AmbitionLevel_UB - Level) * MappedAmbitionLevels[AmbitionLevel_LB] + (Level - AmbitionLevel_LB) * MappedAmbitionLevels[AmbitionLevel_UB]
-
-    # Recalculate new pathways based on given parameters
-    NewData = []
-    AmbStartValue = BaUData[Category].loc[AmbitionStart-1]  # Value at the time when action is implemented.
-
-    for y in ProjectedChanges['Year']:
-        BaU = BaUData[Category].loc[y]
-        if y < AmbitionStart:
-            NewData.append(BaU)
-        elif y >= AmbitionStart + AmbitionSpeed:
-            NewData.append(Ambition_Value)
-        else:
-            if AmbStartValue == 0:
-                Rate = 0
-            else:
-                Rate = (Ambition_Value/AmbStartValue) ** (1/AmbitionSpeed) - 1
-            New_Value = max(AmbStartValue * (1+Rate)**(y - AmbitionStart + 1),0)
-            NewData.append(New_Value)
-    ProjectedChanges[Category] = NewData
+def Mask_NonFinite(Values):
+    """
+    Replaces infinite values with nan, as the JSON hand-off between modules once did, so that they are left out of sums. 
+    Infinite values arise for categories with no data in their first year, whose BaU rate of change is then infinite.
 
-    return ProjectedChanges
+    Args:
+        Values (array or dataframe): Projected values.
+
+    Returns:
+        array or dataframe: Copy of the values, with nan in place of infinite values.
+    """
+    if isinstance(Values, pd.DataFrame):
+        return Values.where(np.isfinite(Values))
+    Values = np.asarray(Values, dtype = float)
+    return np.where(np.isfinite(Values), Values, np.nan)
 
 def Shares(Data):
     """
@@ -165,6 +376,50 @@ def CheckShareAmbLevels(Share_AmbLevels):
     return Totals
 
 ### TRAVEL SPECIFIC FUNCTIONS 
+# Mode of transport -> (mode-engine, fuel) of each of its engine types, as named in the emission factors. Modes with several
+# engine types are split between them by the engine shares. Modes not listed are kept whole, under their own name, with the
+# liquid diesel fuel ('.fFsLD').
+Mode_Engines = {
+    'Car':                      [('carE', '.fElc'), ('carH2', '.fH2G'), ('carPHEV', '.fElc'), ('carIC', '.fFsLD')],
+    'Bus':                      [('busE', '.fElc'), ('busH2', '.fH2G'), ('busPHEV', '.fElc'), ('busIC', '.fFsLD')],
+    'National Rail (Train)':    [('trnPE', '.fElc'), ('trnPIC', '.fFsLD')],
+    'Train':                    [('trnPE', '.fElc'), ('trnPIC', '.fFsLD')],
+    'Underground':              [('Udg', '.fElc')],
+    'Motorcycle':               [('MtrCyc', '.fFsLD')],
+    'Light Rail':               [('dlr', '.fElc')],
+    'Taxi':                     [('Taxi', '')],
+    'Coach':                    [('Coach', '.fFsLP')],
+}
+
+# Fuel of each mode and engine in the emission factor names, where not liquid diesel ('.fFsLD').
+ModeEngine_Fuels = {ModeEngine: Fuel for Engines in Mode_Engines.values() for ModeEngine, Fuel in Engines if Fuel != '.fFsLD'}
+
+# Modes and engines without emissions, or without emission factors.
+NoEmission_ModeEngines = ['Bicycle', 'Walking', 'Other', 'carH2']
+
+def ModeEngine_Mapping(Modes, EngineShare = None):
+    """
+    Maps the activity of each mode of transport to its mode-engines, as a gather of the mode columns and a weight of each
+    mode-engine, so that the activity of every mode-engine is found in one array operation. Where several modes have the 
+    same mode-engine, it keeps the position of the first and the activity of the last.
+
+    Args:
+        Modes (list): Modes of transport.
+        EngineShare (dataframe, optional): Share of each engine type by mode. Only required for modes with several engine types.
+
+    Returns:
+        (list, array, array): Name of each mode-engine, the position in Modes of its mode, and its share of the mode's activity.
+    """
+    Mapping = {}
+    for i, Mode in enumerate(Modes):
+        Engines = Mode_Engines.get(Mode, [(Mode, '.fFsLD')])
+        for ModeEngine, Fuel in Engines:
+            Mapping[ModeEngine] = (i, EngineShare[ModeEngine][0] if len(Engines) > 1 else 1.0)
+
+    Source = np.array([i for i, Weight in Mapping.values()], dtype = int)
+    Weights = np.array([Weight for i, Weight in Mapping.values()], dtype = float)
+    return list(Mapping), Source, Weights
+
 def Map_ModeEngine(Mode, ActivityByMode, Activity_ModeEngine, EngineShare, AllModeEngines):
     """
     Map possible engine types to each mode of transport and splits the relevant transport activity by the given engine share.
@@ -176,83 +431,226 @@ def Map_ModeEngine(Mode, ActivityByMode, Activity_ModeEngine, EngineShare, AllMo
         EngineShare (dataframe): Share of each engine type by mode. 
         AllModeEngines (list): List of modes and engines considered in the calculation.
     """
-    if Mode in ['Car', 'Bus']:
-        Engines = ['E', 'H2', 'PHEV', 'IC']
-        ModeEngine = [Mode.lower() + m for m in Engines]
-        for m in ModeEngine:
-            Activity_ModeEngine[m] = ActivityByMode[Mode] * EngineShare[m][0]
-            AllModeEngines.append(m)
-
-    elif Mode in ['National Rail (Train)', 'Train']:
-        Engines = ['trnPE', 'trnPIC']
-        for m in Engines:
-            Activity_ModeEngine[m] = ActivityByMode[Mode] * EngineShare[m][0]
-            AllModeEngines.append(m)
-    
-    else:
-        if Mode == 'Underground':
-            m = 'Udg'
-        elif Mode == 'Motorcycle':
-            m = 'MtrCyc'
-        elif Mode == 'Light Rail':
-            m = 'dlr'
-        else:
-            m = Mode
-        Activity_ModeEngine[m] = ActivityByMode[Mode]
-        AllModeEngines.append(m)
-    
+    ModeEngines, Source, Weights = ModeEngine_Mapping([Mode], EngineShare)
+    for ModeEngine, Weight in zip(ModeEngines, Weights):
+        Activity_ModeEngine[ModeEngine] = ActivityByMode[Mode] * Weight
+    AllModeEngines.extend(ModeEngines)
+
 def Calc_TravelEmissions(AllModeEngines, Activity_ModeEngine,  EmFactors, CalculatorTime_Range = list(range(2018, 2051))):
     """
-    _summary_
+    Multiplies the activity of every mode-engine by its emission factor, looked up by position in one array operation.
 
     Args:
-        AllModeEngines (_type_): _description_
-        Activity_ModeEngine (_type_): _description_
-        EmFactors (_type_): _description_
-        CalculatorTime_Range (_type_, optional): _description_. Defaults to list(range(2018, 2051)).
+        AllModeEngines (list): Modes and engines considered in the calculation, as from ModeEngine_Mapping.
+        Activity_ModeEngine (dataframe): Activity of each mode-engine, with years as the index.
+        EmFactors (ModuleOutput): Emission factor pathways, also accepted as a dataframe with years as the index.
+        CalculatorTime_Range (list, optional): Years of the calculated emissions. Defaults to list(range(2018, 2051)).
 
     Returns:
-        _type_: _description_
+        dataframe: Emissions of each mode-engine with emissions, with the year as its index.
+    """
+    AllModeEngines = [m for m in dict.fromkeys(AllModeEngines) if m not in NoEmission_ModeEngines]
+    Names = [m + ModeEngine_Fuels.get(m, '.fFsLD') for m in AllModeEngines]
+    Activity = Activity_ModeEngine[AllModeEngines].reindex(CalculatorTime_Range).to_numpy(dtype = float)
+    AllEmissions = EmissionFactor_Table(EmFactors).Lookup(Names, CalculatorTime_Range) * Activity
+
+    return pd.DataFrame(AllEmissions, index = pd.Index(CalculatorTime_Range, name = 'Year'), columns = AllModeEngines)
+
+def EmissionFactor_Table(EmFactors):
     """
-    for mode in ['Bicycle', 'Walking', 'Other', 'carH2']:
-        if mode in AllModeEngines:
-            AllModeEngines.remove(mode)
-
-    ElectricFuels = ['Udg', 'busE', 'carE', 'trnPE', 'busPHEV', 'carPHEV', 'dlr']
-    H2Fuels = ['busH2', 'carH2']
-
-    AllEmissions =  pd.DataFrame({'Year':CalculatorTime_Range})
-    AllEmissions.set_index('Year', inplace = True)
-    for m in AllModeEngines:
-        if m in ElectricFuels:
-            Fuel = '.fElc'
-        elif m == 'Taxi':
-            Fuel = ''
-        elif m in H2Fuels:
-            Fuel = '.fH2G'
-        elif m == 'Coach':
-            Fuel = '.fFsLP'
+    Emission factors held as a dense (year x mode-fuel) array, indexed by name.
+
+    Args:
+        EmFactors (obj): Emission factor pathways, as a ModuleOutput or a dataframe with years as the index.
+
+    Returns:
+        ModuleOutput: Emission factors, looked up with ModuleOutput.Lookup.
+    """
+    if isinstance(EmFactors, ModuleOutput):
+        return EmFactors
+    return ModuleOutput.from_frame(EmFactors)
+
+def GHG_EmissionFactors(Data, GHGs = ['CO2', 'N2O', 'CH4']):
+    """
+    Extends the historical emission factors over the calculator time range and combines the individual greenhouse gases 
+    into a single emission factor per mode and fuel.
+
+    Args:
+        Data (dataframe): Raw emission factor data, with a 'Year' column and columns named as 'EmF.<GHG>.<Mode>.<Fuel>.'
+        GHGs (list, optional): Greenhouse gases to be combined. Defaults to ['CO2', 'N2O', 'CH4'].
+
+    Returns:
+        dataframe: Combined emission factors with the year as its index, and columns named as '<Mode>.<Fuel>' or '<Mode>'.
+    """
+    Data, BaU_ROC = CleanData(Data)
+
+    Categories = list(Data.columns)
+    BaU_EmF = BaU_Array(Data.index.to_numpy(), Data.to_numpy(dtype = float))
+
+    # Combine into GHG
+    GHGCategories = []
+    for c in Categories:
+        ghg_category = c.split('.')[2:4]
+        if ghg_category[1] == '':
+            ghg_category = ghg_category[0]
         else:
-            Fuel = '.fFsLD'
-            
-        AllEmissions[m] = Activity_ModeEngine[m] *  EmFactors[m + Fuel] 
-    return AllEmissions
+            ghg_category = '.'.join(ghg_category)
+        GHGCategories.append(ghg_category)
+    GHGCategories = list(dict.fromkeys(GHGCategories))        # Remove duplicates
+
+    Column = {c: i for i, c in enumerate(Categories)}
+    Positions = [[Column['EmF.' + ghg + '.' + c + '.'] for c in GHGCategories] for ghg in GHGs]
+    GHG_EmF = sum(BaU_EmF[:, p] for p in Positions)
+
+    return pd.DataFrame(GHG_EmF, index = pd.Index(list(range(2018, 2051)), name = 'Year'), columns = GHGCategories)
+
+Aviation_ClassNames = {'First Class': 'First',
+                       'Business Class': 'Biz',
+                       'Premium Economy Class': 'Prem',
+                       'Economy Class': 'Econ',
+                       'Unknown': 'Unknown'
+                       }
 
 def Aviation_Emissions(Categories, Haul, EmFactors, ActivityByMode, CalculatorTime_Range = list(range(2018, 2051))):
-    RenameMap = {'First Class': 'First',
-                 'Business Class': 'Biz',
-                 'Premium Economy Class': 'Prem',
-                 'Economy Class': 'Econ',
-                 'Unknown': 'Unknown'
-                 }
-    AllEmissions =  pd.DataFrame({'Year':CalculatorTime_Range})
-    AllEmissions.set_index('Year', inplace = True)
-    for Category in Categories:
-        EmFName ='avi' + Haul + 'Con' + RenameMap[Category] + '.fFsLD' 
-        AllEmissions[Category] = EmFactors[EmFName] * ActivityByMode[Category]
+    Activity = ActivityByMode[Categories].reindex(CalculatorTime_Range).to_numpy(dtype = float)
+    AllEmissions = Aviation_EmissionFactors(Categories, Haul, EmFactors, CalculatorTime_Range) * Activity
+
+    return pd.DataFrame(AllEmissions, index = pd.Index(CalculatorTime_Range, name = 'Year'), columns = Categories)
+
+def Aviation_EmissionFactors(Categories, Haul, EmFactors, Years):
+    """
+    Collects the emission factors of each travel class of the given haul into an array.
+
+    Args:
+        Categories (list): Travel classes, e.g. 'Economy Class'.
+        Haul (str): Shorthand of the haul used in the emission factor names, i.e. 'lH' or 'sH'.
+        EmFactors (ModuleOutput): Emission factor pathways, also accepted as a dataframe with years as the index. 
+        Years (list): Years required.
 
-    return AllEmissions
+    Returns:
+        array: Emission factors with shape (len(Years), len(Categories)).
+    """
+    Names = ['avi' + Haul + 'Con' + Aviation_ClassNames[Category] + '.fFsLD' for Category in Categories]
+    return EmissionFactor_Table(EmFactors).Lookup(Names, Years)
+
+def Shares_Array(Activity):
+    """
+    Array counterpart of Shares.
 
+    Args:
+        Activity (array): Activity with shape (years, categories).
+
+    Returns:
+        (array, array): The total activity of each year, and the share of each category with the same shape as Activity.
+    """
+    Activity = np.asarray(Activity, dtype = float)
+    Total = np.nansum(Activity, axis = 1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return Total, Activity / Total[:, None]
+
+def Travel_Kernel(HistYears, Total, HistShares, Demand_AmbLevels, Share_AmbLevels, Categories, DemandLevers, ClassLevers, Years, 
+                  BaseYear = 2018):
+    """
+    Fused array kernel projecting the total demand and the share of every category for batches of demand and class 
+    lever settings, directly from the historical data. Stacked historical data (e.g. of several departments) is projected
+    at once for a single demand and class lever setting.
+
+    Args:
+        HistYears (array): Years of the historical data.
+        Total (array): Historical total demand of each year, with shape (len(HistYears),) or (..., len(HistYears)). 
+        HistShares (array): Historical shares with shape (len(HistYears), len(Categories)) or (..., len(HistYears), len(Categories)).
+        Demand_AmbLevels (dict): Definition of each level of ambition for the total demand, relative to the base year. 
+        Share_AmbLevels (dict): Definition of each level of ambition for the share of each category.
+        Categories (list): Name of each category. 
+        DemandLevers (array): Demand lever settings as rows of (Level, AmbitionSpeed, AmbitionStart).
+        ClassLevers (array): Class share lever settings as rows of (Level, AmbitionSpeed, AmbitionStart).
+        Years (list): Years of the projected pathways. 
+        BaseYear (int, optional): The year in which changes are in reference to. Defaults to 2018.
+
+    Returns:
+        (array, array): The projected demand with shape (*DemandLevers.shape[:-1], len(Years)) and the projected shares 
+        with shape (*ClassLevers.shape[:-1], len(Years), len(Categories)). For stacked data, the projected demand has 
+        shape (..., len(Years)) and the projected shares (..., len(Years), len(Categories)).
+    """
+    BaUYears = np.arange(2018, 2051)
+    Total = np.asarray(Total, dtype = float)
+    BaU = BaU_Array(HistYears, np.concatenate([Total[..., None], HistShares], axis = -1), CalculatorTime_Range = BaUYears)
+    BaU = np.swapaxes(BaU, -1, -2)      # (..., 1 + categories, years)
+
+    # ---------- Total demand
+    Demand = Projections_Array(BaU[..., 0, :], BaUYears, Demand_AmbLevels, DemandLevers, Years, BaseYear = BaseYear)
+
+    # ---------- Shares of each category
+    BaU_Shares = BaU[..., 1:, :]        # (..., categories, years)
+    ClassLevers = np.asarray(ClassLevers, dtype = float)
+    Level, AmbitionSpeed, AmbitionStart = ClassLevers[..., 0], ClassLevers[..., 1], ClassLevers[..., 2]
+    Ambition_Value = Ambition_Values(Compile_AmbitionLevels(Share_AmbLevels, Categories), Level, AmbitionsMode = 'Absolute')
+    AmbStartValue = np.moveaxis(BaU_Shares[..., Year_Positions(BaUYears, AmbitionStart.astype(int) - 1)], BaU_Shares.ndim - 2, -1)
+    Shares = Projection_Pathways(BaU_Shares[..., Year_Positions(BaUYears, Years)], Years, Ambition_Value, 
+                                 AmbitionSpeed[..., None], AmbitionStart[..., None], AmbStartValue)
+
+    return Demand, np.swapaxes(Shares, -1, -2)
+
+def Travel_Pathways_Batch(Data_Shares, Demand_AmbLevels, Share_AmbLevels, DemandLevers, ClassLevers, Years, BaseYear = 2018):
+    """
+    Projects the total demand and the share of each category for batches of demand and class lever settings. 
+
+    Args:
+        Data_Shares (dataframe): Historical shares of each category, and the total demand, as produced by Shares.
+        Demand_AmbLevels (dict): Definition of each level of ambition for the total demand, relative to the base year. 
+        Share_AmbLevels (dict): Definition of each level of ambition for the share of each category.
+        DemandLevers (array): Demand lever settings as rows of (Level, AmbitionSpeed, AmbitionStart).
+        ClassLevers (array): Class share lever settings as rows of (Level, AmbitionSpeed, AmbitionStart).
+        Years (list): Years of the projected pathways. 
+        BaseYear (int, optional): The year in which changes are in reference to. Defaults to 2018.
+
+    Returns:
+        (list, array, array): The categories, the projected demand with shape (len(DemandLevers), len(Years)) and the 
+        projected shares with shape (len(ClassLevers), len(Years), len(Categories)).
+    """
+    Categories = list(Data_Shares.columns)
+    Categories.remove('Total')
+    Total, HistShares = Data_Shares['Total'].to_numpy(dtype = float), Data_Shares[Categories].to_numpy(dtype = float)
+
+    Demand, ProjectedShares = Travel_Kernel(Data_Shares.index.to_numpy(), Total, HistShares, Demand_AmbLevels, Share_AmbLevels, Categories,
+                                            DemandLevers, ClassLevers, Years, BaseYear = BaseYear)
+    return Categories, Demand, ProjectedShares
+
+def Aviation_Kernel(HistYears, Activity, Categories, Haul, Demand_AmbLevels, Share_AmbLevels, DemandLevers, ClassLevers, 
+                    EmFactors, Years, BaseYear = 2018, EmissionYears = list(range(2018, 2051))):
+    """
+    Fused kernel for a single haul, computing the demand and emissions of every travel class in one array pass. 
+
+    Args:
+        HistYears (array): Years of the historical data.
+        Activity (array): Historical activity with shape (len(HistYears), len(Categories)).
+        Categories (list): Travel classes, e.g. 'Economy Class'.
+        Haul (str): Shorthand of the haul used in the emission factor names, i.e. 'lH' or 'sH'.
+        Demand_AmbLevels (dict): Definition of each level of ambition for the total demand, relative to the base year. 
+        Share_AmbLevels (dict): Definition of each level of ambition for the share of each travel class.
+        DemandLevers (array): Demand lever settings (Level, AmbitionSpeed, AmbitionStart).
+        ClassLevers (array): Class share lever settings (Level, AmbitionSpeed, AmbitionStart).
+        EmFactors (dataframe): Emission factor pathways with years as the index. 
+        Years (list): Years of the projected pathways. 
+        BaseYear (int, optional): The year in which changes are in reference to. Defaults to 2018.
+        EmissionYears (list, optional): Years of the calculated emissions. Defaults to list(range(2018, 2051)).
+
+    Returns:
+        (array, array): Activity by travel class with shape (len(Years), len(Categories)), and emissions by travel class 
+        with shape (len(EmissionYears), len(Categories)), missing where the activity is not projected. 
+    """
+    Total, HistShares = Shares_Array(Activity)
+    Demand, ProjectedShares = Travel_Kernel(HistYears, Total, HistShares, Demand_AmbLevels, Share_AmbLevels, Categories, 
+                                            DemandLevers, ClassLevers, Years, BaseYear = BaseYear)
+    ActivityByMode = Demand[..., None] * ProjectedShares
+
+    EmissionYears = np.asarray(EmissionYears)
+    Projected = np.isin(EmissionYears, Years)
+    AlignedActivity = np.full((len(EmissionYears), len(Categories)), np.nan)
+    AlignedActivity[Projected] = ActivityByMode[Year_Positions(Years, EmissionYears[Projected])]
+    AllEmissions = Aviation_EmissionFactors(Categories, Haul, EmFactors, EmissionYears) * AlignedActivity
+
+    return ActivityByMode, AllEmissions
 
 def PopulationCategories(Mode):
     StudentCategories = ['UG', 'PGT', 'PGR', 'Part Time PGT', 'Part Time PGR']
@@ -306,20 +704,26 @@ def Module_DemandShares(Data, Population, EmF,
     Data, BaU_ROC = CleanData(Data)
 
     Data_Shares = Shares(Data)   # Transform data into share % of modes, kept in columns
+    Categories = list(Data_Shares.columns)
+    Categories.remove('Total')
 
     # Read data from other callbacks. 
-    PopulationPathways = pd.read_json(io.StringIO(Population), orient = 'split')
-    EmFactors = pd.read_json(io.StringIO(EmF), orient = 'split')
+    PopulationPathways = OutputToDF(Population)
+    EmFactors = EmF if isinstance(EmF, ModuleOutput) else OutputToDF(EmF)
     if ShareofEngineTypes is not None:
-        EngineShare = pd.read_json(io.StringIO(ShareofEngineTypes), orient = 'split')
+        EngineShare = OutputToDF(ShareofEngineTypes)
+    else:
+        EngineShare = None
 
-    # Set up demand ambition levels
-    ProjectedChanges = pd.DataFrame({'Year':CalculatorTime_Range})
+    # ---------- Unit demand and shares of every mode, projected in one array pass
+    UnitDemand, ProjectedShares = Travel_Kernel(Data_Shares.index.to_numpy(), Data_Shares['Total'].to_numpy(dtype = float),
+                                                Data_Shares[Categories].to_numpy(dtype = float), Demand_AmbLevels, Share_AmbLevels, 
+                                                Categories, (DemandLever, DemandSpeed, DemandStart), 
+                                                (SharesLever, SharesSpeed, SharesStart), CalculatorTime_Range)
 
     # ---------- Total Demand
     if ExtDemand is None:
-        BaU_Demand = BaU_Pathways(Data_Shares, 'Total')          # Unit demand.
-        Projections(BaU_Demand, 'Total', Demand_AmbLevels, DemandLever, DemandSpeed, DemandStart, ProjectedChanges)
+        ProjectedChanges = pd.DataFrame({'Year':CalculatorTime_Range, 'Total': UnitDemand})
 
         ProjectedDemand = pd.DataFrame({'Year':CalculatorTime_Range})
 
@@ -329,25 +733,15 @@ def Module_DemandShares(Data, Population, EmF,
         ProjectedDemand = ExtDemand
         ProjectedDemand.reset_index(inplace = True)
 
-    # ---------- Projected Shares 
-    ProjectedShares = pd.DataFrame({'Year':CalculatorTime_Range})
-
-    Categories = list(Data_Shares.columns)
-    Categories.remove('Total')
-    
-    # ---------- Determine activity by mode and engine
-    ActivityByMode = pd.DataFrame({'Year':CalculatorTime_Range})
-    Activity_ModeEngine = pd.DataFrame({'Year':CalculatorTime_Range})
-    AllModeEngines = []
-    for Category in Categories:
-        BaUData = BaU_Pathways(Data_Shares, Category)
-        Projections(BaUData, Category, Share_AmbLevels[Category], SharesLever, SharesSpeed, SharesStart, ProjectedShares, AmbitionsMode='Absolute')
-        ActivityByMode[Category] = ProjectedDemand['Total'] * ProjectedShares[Category]
-        if Travel_Type == 'Non-Aviation':
-            if Category != 'Aviation':
-                Map_ModeEngine(Category, ActivityByMode, Activity_ModeEngine, EngineShare, AllModeEngines)
-    Activity_ModeEngine.set_index('Year', inplace = True)
-    ActivityByMode.set_index('Year', inplace = True)
+    # ---------- Determine activity by mode, and by mode and engine
+    ActivityByMode = pd.DataFrame(ProjectedShares, columns = Categories).mul(ProjectedDemand['Total'], axis = 0)
+    ActivityByMode = ActivityByMode.reindex(range(len(CalculatorTime_Range)))
+    ActivityByMode.index = pd.Index(CalculatorTime_Range, name = 'Year')
+    if Travel_Type == 'Non-Aviation':
+        Modes = [c for c in Categories if c != 'Aviation']
+        AllModeEngines, Source, Weights = ModeEngine_Mapping(Modes, EngineShare)
+        Activity_ModeEngine = pd.DataFrame(ActivityByMode[Modes].to_numpy(dtype = float)[:, Source] * Weights, 
+                                           index = ActivityByMode.index, columns = AllModeEngines)
 
     # Calculate emissions #
     if Travel_Type == 'Non-Aviation':
@@ -363,9 +757,112 @@ def Module_DemandShares(Data, Population, EmF,
         return AllEmissions
 
 ### OTHER FUNCTIONS 
+@dataclass(frozen = True)
+class ModuleOutput:
+    """
+    Output of a calculation module, passed directly between modules instead of through JSON.
+    Data is held as a read-only numpy array with years in its rows and categories in its columns. 
+
+    Attributes:
+        Years (array): Year of each row.
+        Columns (tuple): Name of each category column.
+        Values (array): Data with shape (len(Years), len(Columns)).
+    """
+    Years: np.ndarray
+    Columns: tuple
+    Values: np.ndarray
+
+    def __post_init__(self):
+        Values = np.array(self.Values, dtype = float)
+        Values.flags.writeable = False
+        object.__setattr__(self, 'Years', np.asarray(self.Years))
+        object.__setattr__(self, 'Columns', tuple(self.Columns))
+        object.__setattr__(self, 'Values', Values)
+
+    @classmethod
+    def from_frame(cls, Data):
+        """
+        Args:
+            Data (dataframe): Module results with years in its index and categories as its columns.
+
+        Returns:
+            ModuleOutput: Results held in the output container. 
+        """
+        return cls(Data.index.to_numpy(), tuple(Data.columns), Data.to_numpy(dtype = float))
+
+    def __getitem__(self, Column):
+        return self.Values[:, self.Index[Column]]
+
+    @cached_property
+    def Index(self):
+        """
+        Returns:
+            dict: Position of each column, keyed by column name.
+        """
+        return {Column: i for i, Column in enumerate(self.Columns)}
+
+    def Lookup(self, Columns, Years = None):
+        """
+        Selects data by column name and year.
+
+        Args:
+            Columns (list): Names of the columns required.
+            Years (list, optional): Years required. Defaults to all years.
+
+        Returns:
+            array: Data with shape (len(Years), len(Columns)).
+        """
+        Positions = [self.Index[Column] for Column in Columns]
+        if Years is None:
+            return self.Values[:, Positions]
+        return self.Values[np.ix_(Year_Positions(self.Years, Years), Positions)]
+
+    @cached_property
+    def Fingerprint(self):
+        """
+        Returns:
+            str: Hash of the contents, identifying equal results. 
+        """
+        Digest = hashlib.sha1(repr(self.Columns).encode())
+        Digest.update(np.ascontiguousarray(self.Years).tobytes())
+        Digest.update(np.ascontiguousarray(self.Values).tobytes())
+        return Digest.hexdigest()
+
+    def to_frame(self):
+        """
+        Returns:
+            dataframe: Copy of the results with years in its index and categories as its columns.
+        """
+        return pd.DataFrame(self.Values.copy(), index = self.Years.copy(), columns = list(self.Columns))
+
+    def to_json(self):
+        """
+        Export boundary for the results. 
+
+        Returns:
+            str: JSON representation of the results, in the 'split' orientation used by JSONtoDF.
+        """
+        return self.to_frame().to_json(date_format = 'iso', orient = 'split')
+
+def OutputToDF(Var):
+    """
+    Reads the output of a calculation module into a dataframe to be manipulated. 
+
+    Args:
+        Var (obj): Module output, either as a ModuleOutput, a dataframe or its json representation. 
+
+    Returns:
+        dataframe: Module output in a dataframe format. 
+    """
+    if isinstance(Var, ModuleOutput):
+        return Var.to_frame()
+    elif isinstance(Var, pd.DataFrame):
+        return Var.copy()
+    return JSONtoDF(Var)
+
 def JSONtoDF(Var):
     """
-    Wrapper for reading json data, which are output from the calculation modules, into dataframes to be manipulated. 
+    Wrapper for reading json data, exported from the calculation modules, into dataframes to be manipulated. 
 
     Args:
         Var (obj): variable storing the json representation of the desired dataframe.
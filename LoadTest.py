@@ -0,0 +1,250 @@
+"""
+Load test of the Chemical Engineering aviation calculator served by Streamlit.
+Opens a number of concurrent sessions against a local server, each of which runs the app and then moves random levers
+as a user would, rerunning the script each time. Reports the latency of the reruns, measured from sending the changed
+lever to the end of the script run, and the memory held by the server per open session.
+Sessions talk to the server as the browser does, over its websocket with the websockets package used by the server.
+
+Usage: python LoadTest.py [--sessions N] [--reruns N] [--url URL --pid PID] [--app PATH] [--seed N]
+Created October 2024
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+App_File = 'CE_App_V1.1_Public.py'
+
+def Start_Server(App = App_File, Port = 8599, Timeout = 60):
+    """
+    Starts a headless Streamlit server for the app, and waits until it is ready.
+
+    Args:
+        App (str, optional): Path to the app script. Defaults to the calculator app.
+        Port (int, optional): Port on which the app is served. Defaults to 8599.
+        Timeout (float, optional): Time to wait for the server in seconds. Defaults to 60.
+
+    Returns:
+        (Popen, str): The server process and the URL of the app.
+    """
+    Url = 'http://localhost:{}'.format(Port)
+    Server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', App, '--server.headless', 'true', '--server.port', str(Port),
+                               '--browser.gatherUsageStats', 'false'], stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL,
+                              cwd = os.path.dirname(os.path.abspath(__file__)))
+    Deadline = time.monotonic() + Timeout
+    while time.monotonic() < Deadline:
+        if Server.poll() is not None:
+            raise RuntimeError('Streamlit server exited with code {}'.format(Server.returncode))
+        try:
+            with urllib.request.urlopen(Url + '/_stcore/health', timeout = 1):
+                return Server, Url
+        except OSError:
+            time.sleep(0.2)
+    Server.terminate()
+    raise TimeoutError('Streamlit server did not start within {} s'.format(Timeout))
+
+def Server_Memory(Pid):
+    """
+    Args:
+        Pid (int): Process ID of the server.
+
+    Returns:
+        float: Resident memory of the process in KiB, or None where it cannot be read (outside of Linux).
+    """
+    try:
+        with open('/proc/{}/status'.format(Pid)) as f:
+            for Line in f:
+                if Line.startswith('VmRSS:'):
+                    return float(Line.split()[1])
+    except OSError:
+        return None
+
+class Session:
+    """
+    One browser session of the app.
+
+    Attributes:
+        Levers (dict): (widget type, minimum, maximum) of each lever widget in the sidebar, keyed by widget ID.
+        Values (dict): Current value of each lever moved by the session, keyed by widget ID.
+        Latencies (list): Time of each script run in ms, from sending the request to the end of the run.
+    """
+    def __init__(self, Url):
+        self.Url = Url.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+        self.Origin = Url
+        self.Levers = {}
+        self.Values = {}
+        self.Latencies = []
+        self._Socket = None
+
+    async def Connect(self):
+        import websockets
+        self._Socket = await websockets.connect(self.Url, subprotocols = ['streamlit'], origin = self.Origin, max_size = None)
+
+    async def Close(self):
+        await self._Socket.close()
+
+    async def Run(self):
+        """
+        Reruns the script with the current lever values, and waits for it to finish.
+
+        Returns:
+            float: Latency of the run in ms.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        Message = BackMsg()
+        Message.rerun_script.SetInParent()
+        for Id, Value in self.Values.items():
+            State = Message.rerun_script.widget_states.widgets.add()
+            State.id = Id
+            if self.Levers[Id][0] == 'slider':
+                State.double_array_value.data.append(Value)
+            else:
+                State.int_value = Value
+
+        Started = time.perf_counter()
+        await self._Socket.send(Message.SerializeToString())
+        while True:
+            Reply = ForwardMsg()
+            Reply.ParseFromString(await self._Socket.recv())
+            Type = Reply.WhichOneof('type')
+            if Type == 'script_finished':
+                break
+            if Type != 'delta' or Reply.delta.WhichOneof('type') != 'new_element':
+                continue
+            Element = Reply.delta.new_element
+            if Element.WhichOneof('type') == 'exception':
+                raise RuntimeError('App raised {}: {}'.format(Element.exception.type, Element.exception.message))
+            if Reply.metadata.delta_path[0] == 1:        # Widgets in the sidebar.
+                self._Add_Lever(Element)
+        Latency = (time.perf_counter() - Started) * 1000
+        self.Latencies.append(Latency)
+        return Latency
+
+    def _Add_Lever(self, Element):
+        Type = Element.WhichOneof('type')
+        if Type == 'slider':
+            self.Levers[Element.slider.id] = (Type, int(Element.slider.min), int(Element.slider.max))
+        elif Type == 'number_input':
+            self.Levers[Element.number_input.id] = (Type, max(int(Element.number_input.min), 1), int(Element.number_input.max))
+
+    def Move_Lever(self, Generator):
+        """
+        Sets a random lever of the sidebar to a random value in its range.
+        """
+        Id = Generator.choice(sorted(self.Levers))
+        Type, Lower, Upper = self.Levers[Id]
+        self.Values[Id] = Generator.randint(Lower, Upper)
+
+async def _Phase(Event, Tasks):
+    Waiting = asyncio.create_task(Event.wait())
+    await asyncio.wait(Tasks + [Waiting], return_when = asyncio.FIRST_COMPLETED)
+    if not Event.is_set():          # Sessions only end early by failing.
+        Waiting.cancel()
+        await asyncio.gather(*Tasks)
+
+async def _Run_Sessions(Url, Sessions, Reruns, Seed, Pid, ThinkTime):
+    Memory = {'Idle': Server_Memory(Pid) if Pid else None}
+    Users = [Session(Url) for i in range(Sessions)]
+    Opened, Moving, Ready, Done = asyncio.Event(), asyncio.Event(), asyncio.Event(), asyncio.Event()
+
+    async def User(s, Session):
+        Generator = random.Random(Seed * 100003 + s)
+        await Session.Connect()
+        await Session.Run()
+        if all(u.Latencies for u in Users):
+            Opened.set()
+        await Moving.wait()
+        for i in range(Reruns):
+            await asyncio.sleep(ThinkTime * Generator.random())
+            Session.Move_Lever(Generator)
+            await Session.Run()
+        if all(len(u.Latencies) == Reruns + 1 for u in Users):
+            Ready.set()
+        await Done.wait()           # Sessions are kept open until all of them have been measured.
+        await Session.Close()
+
+    # Sessions are first opened with the default levers, whose results are shared, so that the memory held by each
+    # session can be told apart from results added to the shared caches by the later lever changes.
+    Tasks = [asyncio.create_task(User(s, u)) for s, u in enumerate(Users)]
+    await _Phase(Opened, Tasks)
+    Memory['Open'] = Server_Memory(Pid) if Pid else None
+    Started = time.perf_counter()
+    Moving.set()
+    await _Phase(Ready, Tasks)
+    Elapsed = time.perf_counter() - Started
+    Memory['Loaded'] = Server_Memory(Pid) if Pid else None
+    Done.set()
+    await asyncio.gather(*Tasks)
+    return Users, Memory, Elapsed
+
+def Run_LoadTest(Url, Sessions = 10, Reruns = 20, Seed = 0, Pid = None, ThinkTime = 0.0):
+    """
+    Runs concurrent sessions against a served app.
+
+    Args:
+        Url (str): URL of the app, e.g. 'http://localhost:8501'.
+        Sessions (int, optional): Number of concurrent sessions. Defaults to 10.
+        Reruns (int, optional): Number of lever changes made by each session after its first run. Defaults to 20.
+        Seed (int, optional): Seed of the lever changes, for repeatable tests. Defaults to 0.
+        Pid (int, optional): Process ID of the server, for memory measurements. Defaults to no measurements.
+        ThinkTime (float, optional): Maximum pause between the lever changes of a session in s. Defaults to 0.
+
+    Returns:
+        dict: Latency percentiles of the first runs and of the reruns (ms), throughput of the reruns (per s), the memory
+              of the server (KiB) before the sessions, with all sessions open, and after the reruns, and the memory per session.
+    """
+    Users, Memory, Elapsed = asyncio.run(_Run_Sessions(Url, Sessions, Reruns, Seed, Pid, ThinkTime))
+    First = np.array([u.Latencies[0] for u in Users])
+    Latencies = np.concatenate([u.Latencies[1:] for u in Users]) if Reruns else np.zeros(1)
+    Result = {'Sessions': Sessions, 'Reruns': int(Sessions * Reruns),
+              'First_p50_ms': float(np.percentile(First, 50)), 'First_p95_ms': float(np.percentile(First, 95)),
+              'p50_ms': float(np.percentile(Latencies, 50)), 'p95_ms': float(np.percentile(Latencies, 95)),
+              'Max_ms': float(Latencies.max()), 'Reruns_per_s': Sessions * Reruns / Elapsed if Reruns else 0.0,
+              'Idle_kib': Memory['Idle'], 'Open_kib': Memory['Open'], 'Loaded_kib': Memory['Loaded'], 'Per_Session_kib': None}
+    if Memory['Idle'] is not None and Memory['Open'] is not None:
+        Result['Per_Session_kib'] = (Memory['Open'] - Memory['Idle']) / Sessions
+    return Result
+
+def Report(Result):
+    Lines = ['{} sessions, {} reruns ({:.1f} per s)'.format(Result['Sessions'], Result['Reruns'], Result['Reruns_per_s']),
+             'First run   p50 {:8.1f} ms   p95 {:8.1f} ms'.format(Result['First_p50_ms'], Result['First_p95_ms']),
+             'Rerun       p50 {:8.1f} ms   p95 {:8.1f} ms   max {:8.1f} ms'.format(Result['p50_ms'], Result['p95_ms'], Result['Max_ms'])]
+    if Result['Per_Session_kib'] is not None:
+        Lines.append('Server memory {:.0f} KiB idle, {:.0f} KiB with all sessions open ({:.0f} KiB per session), '
+                     '{:.0f} KiB after the reruns'.format(Result['Idle_kib'], Result['Open_kib'], Result['Per_Session_kib'],
+                                                         Result['Loaded_kib']))
+    return '\n'.join(Lines)
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Load test the calculator app with concurrent sessions.')
+    Parser.add_argument('--sessions', type = int, default = 10, help = 'Number of concurrent sessions.')
+    Parser.add_argument('--reruns', type = int, default = 20, help = 'Number of lever changes made by each session.')
+    Parser.add_argument('--think', type = float, default = 0.0, help = 'Maximum pause between lever changes in s.')
+    Parser.add_argument('--seed', type = int, default = 0, help = 'Seed of the lever changes.')
+    Parser.add_argument('--url', help = 'URL of an app which is already served. Defaults to starting a local server.')
+    Parser.add_argument('--pid', type = int, help = 'Process ID of the server given by --url, for memory measurements.')
+    Parser.add_argument('--app', default = App_File, help = 'App script served when no URL is given.')
+    Parser.add_argument('--port', type = int, default = 8599, help = 'Port of the local server.')
+    Args = Parser.parse_args()
+
+    Server = None
+    if Args.url:
+        Url, Pid = Args.url, Args.pid
+    else:
+        Server, Url = Start_Server(Args.app, Args.port)
+        Pid = Server.pid
+        Run_LoadTest(Url, Sessions = 1, Reruns = 0, Pid = Pid)         # Warm up the server's process-wide data.
+    try:
+        print(Report(Run_LoadTest(Url, Args.sessions, Args.reruns, Args.seed, Pid, Args.think)))
+    finally:
+        if Server is not None:
+            Server.terminate()
+            Server.wait()
@@ -0,0 +1,144 @@
+"""
+Monte Carlo uncertainty analysis for the Chemical Engineering aviation calculator.
+Samples the uncertain inputs (the proportion of travel captured in the data, the BaU rates of change of the population,
+and multipliers of the emission factors) from configurable distributions, and propagates every sample at once as arrays.
+Emissions are proportional to the inverse of the leakage factor and to the emission factors, so each haul is only
+projected once per lever selection, and samples are applied by scaling.
+Created October 2024
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import GeneralisedFunctions as gf
+import ScenarioSweep as ss
+from CalculatorParameters import Default_Levers, Population_AmbLevels
+
+# Uncertain input -> (numpy.random.Generator distribution, *parameters).
+# '<Haul>_Leakage' are in %, 'Population_ROC' and '[<Haul>_]EmF' are multipliers of the BaU rates of change and emission factors.
+Default_Distributions = {
+    'LH_Leakage': ('triangular', 60, 70, 80),
+    'SH_Leakage': ('triangular', 50, 60, 70),
+    'DOM_Leakage': ('triangular', 30, 40, 50),
+    'Population_ROC': ('normal', 1, 0.25),
+    'EmF': ('lognormal', 0, 0.1),
+}
+Default_Percentiles = (5, 25, 50, 75, 95)
+
+@dataclass
+class MonteCarloResult(ss.SweepResult):
+    """
+    Results of each sample, as a SweepResult with one row of Levers per sample.
+
+    Attributes:
+        Samples (dataframe): Sampled values of each uncertain input, with one row per sample.
+    """
+    Samples: pd.DataFrame = None
+
+    @property
+    def Cumulative(self):
+        """
+        Returns:
+            array: Cumulative total emissions in tCO2e, with shape (samples, years).
+        """
+        return np.nancumsum(self.Total, axis = 1)
+
+    def Bands(self, Measure = 'Total', Percentiles = Default_Percentiles):
+        """
+        Args:
+            Measure (str, optional): 'Total', 'Cumulative', 'Emissions_FTE', or the name of a haul (e.g. 'LH'). Defaults to 'Total'.
+            Percentiles (tuple, optional): Percentiles to be calculated. Defaults to (5, 25, 50, 75, 95).
+
+        Returns:
+            dataframe: Percentiles of the measure across samples, with the year as the index and columns named 'P<percentile>'.
+        """
+        if Measure in ss.Hauls:
+            Values = self.Emissions[:, list(ss.Hauls).index(Measure)]
+        else:
+            Values = getattr(self, Measure)
+        with np.errstate(invalid = 'ignore'):
+            Bands = np.nanpercentile(Values, Percentiles, axis = 0).T
+        return pd.DataFrame(Bands, index = pd.Index(self.Years, name = 'Year'), columns = ['P{:g}'.format(p) for p in Percentiles])
+
+def Draw_Samples(Distributions, Samples, Seed = None):
+    """
+    Args:
+        Distributions (dict): (distribution, *parameters) of each uncertain input, with distributions named as the methods
+                              of numpy.random.Generator (e.g. 'normal', 'triangular'), or 'fixed' for a constant value.
+        Samples (int): Number of samples.
+        Seed (int, optional): Seed of the random number generator, for repeatable results. Defaults to None.
+
+    Returns:
+        dataframe: Sampled values, with one column per uncertain input.
+    """
+    Generator = np.random.default_rng(Seed)
+    Draws = {}
+    for Name, (Distribution, *Parameters) in Distributions.items():
+        if Distribution == 'fixed':
+            Draws[Name] = np.full(Samples, float(Parameters[0]))
+        else:
+            Draws[Name] = getattr(Generator, Distribution)(*Parameters, size = Samples)
+    return pd.DataFrame(Draws)
+
+def Population_Samples(ROC_Multiplier, Levers, Inputs):
+    """
+    Total population of each sample, with the BaU rates of change of every population category scaled by the sample's multiplier.
+
+    Args:
+        ROC_Multiplier (array): Multiplier of the BaU rates of change, for each sample.
+        Levers (tuple): Population lever setting as (Level, Speed, Start).
+        Inputs (dict): Shared inputs from ScenarioSweep.Prepare_Inputs.
+
+    Returns:
+        array: Total population, with shape (samples, years).
+    """
+    Data, BaU_ROC = Inputs['Population_Data']
+    BaU_Years = np.arange(2018, 2051)
+    ROC = BaU_ROC[Data.columns].to_numpy() * np.asarray(ROC_Multiplier, dtype = float)[:, None, None]
+    BaU = np.moveaxis(gf.BaU_Array(Data.index.to_numpy(), Data.to_numpy(), ROC, BaU_Years), 1, 2)     # (samples, categories, years)
+
+    Pathways = gf.Projections_Array(BaU, BaU_Years, Population_AmbLevels, Levers, Inputs['Years'], BaseYear = ss.BaseYear)
+    return np.nansum(gf.Mask_NonFinite(np.round(Pathways, 0)), axis = 1)        # As in Population_Module
+
+def Run_MonteCarlo(Levers = None, Distributions = None, Samples = 2000, Seed = None, Inputs = None):
+    """
+    Propagates samples of the uncertain inputs through the aviation and population calculations, for one lever selection.
+
+    Args:
+        Levers (dict, optional): Lever selections keyed by lever name. Levers which are not given are kept at their default values.
+        Distributions (dict, optional): Distributions of the uncertain inputs, as in Default_Distributions, which are used
+                                        by default. Leakage factors without a distribution are fixed at their lever values.
+        Samples (int, optional): Number of samples. Defaults to 2000.
+        Seed (int, optional): Seed of the random number generator, for repeatable results. Defaults to None.
+        Inputs (dict, optional): Shared inputs from ScenarioSweep.Prepare_Inputs. Defaults to those of the current data.
+
+    Returns:
+        MonteCarloResult: Emissions and population of each sample.
+    """
+    Levers = dict(Default_Levers, **(Levers or {}))
+    ss._Check_Levers(Levers)
+    Distributions = Default_Distributions if Distributions is None else Distributions
+    Unknown = set(Distributions) - {h + '_Leakage' for h in ss.Hauls} - {h + '_EmF' for h in ss.Hauls} - {'EmF', 'Population_ROC'}
+    if Unknown:
+        raise ValueError('Unknown uncertain inputs: {}'.format(', '.join(sorted(Unknown))))
+    Inputs = Inputs or ss.Shared_Inputs()
+    Draws = Draw_Samples(Distributions, Samples, Seed)
+    Table = pd.DataFrame({Name: np.full(Samples, float(Value)) for Name, Value in Levers.items()})
+
+    EmF = Draws['EmF'].to_numpy() if 'EmF' in Draws else np.ones(Samples)
+    Emissions = []
+    for Haul in ss.Hauls:
+        Leakage = Draws[Haul + '_Leakage'].to_numpy() if Haul + '_Leakage' in Draws else Table[Haul + '_Leakage'].to_numpy()
+        Table[Haul + '_Leakage'] = Leakage
+        Lever = lambda Names: np.array([[Levers[Haul + '_' + n] for n in Names]], dtype = float)
+        Full_Capture = ss.Evaluate_Haul(Haul, np.array([100.0]), Lever(['Demand_Lever', 'Demand_Speed', 'Demand_Start']),
+                                        Lever(['Class_Lever', 'Class_Speed', 'Class_Start']), Inputs)
+        Multiplier = EmF * (Draws[Haul + '_EmF'].to_numpy() if Haul + '_EmF' in Draws else 1)
+        with np.errstate(divide = 'ignore'):
+            Emissions.append(Full_Capture * (100 / Leakage * Multiplier)[:, None] / 1000)      # Presented in tCO2e
+
+    ROC_Multiplier = Draws['Population_ROC'].to_numpy() if 'Population_ROC' in Draws else np.ones(Samples)
+    Population = Population_Samples(ROC_Multiplier, [Levers['Population_' + n] for n in ['Change', 'Speed', 'Start']], Inputs)
+    return MonteCarloResult(Table, Inputs['Years'], np.stack(Emissions, axis = 1), Population, Samples = Draws)
@@ -0,0 +1,179 @@
+"""
+Target-seeking optimiser for the Chemical Engineering aviation calculator.
+Finds the lever selection with the least effort that meets an emissions target, e.g. a 25% cut of the 2022 emissions per
+person by 2026. Emissions of each haul only depend on that haul's levers, so the options of each haul are evaluated as one
+batch, reduced to their Pareto front of effort against emissions, and combined by branch and bound.
+Created October 2024
+"""
+
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+
+import GeneralisedFunctions as gf
+import ScenarioSweep as ss
+from CalculatorParameters import Default_Levers
+
+# Effort of each unit of a lever: levels above 1, years faster than the slowest speed, and years earlier than the latest start.
+# Population levers, when optimised, cost their distance from the selected population levers.
+Default_Weights = {}
+for Prefix in ['LH_Demand', 'LH_Class', 'SH_Demand', 'SH_Class', 'DOM_Demand', 'DOM_Class']:
+    Default_Weights.update({Prefix + '_Lever': 1.0, Prefix + '_Speed': 0.05, Prefix + '_Start': 0.1})
+Default_Weights.update({'Population_Change': 1.0, 'Population_Speed': 0.05, 'Population_Start': 0.1})
+
+Default_Options = {'Lever': [1, 1.5, 2, 2.5, 3, 3.5, 4], 'Speed': [1, 2, 3, 5, 10]}
+
+@dataclass
+class OptimiserResult:
+    """
+    Attributes:
+        Levers (dict): Selected value of every lever, or None if no selection meets the target.
+        Effort (float): Effort of the selected levers.
+        Achieved (float): Value of the measure in the target year, for the selected levers.
+        Target (float): Value of the measure required in the target year.
+        Baseline (float): Value of the measure in the base year.
+    """
+    Levers: dict
+    Effort: float
+    Achieved: float
+    Target: float
+    Baseline: float
+
+def Lever_Effort(Names, Values, Weights, Options, Selected = None):
+    """
+    Args:
+        Names (list): Lever names.
+        Values (array): Lever values with shape (n, len(Names)).
+        Weights (dict): Effort per unit of each lever.
+        Options (dict): Values considered for each lever.
+        Selected (dict, optional): Levers costed by their distance from the given value, in either direction. Defaults to None.
+
+    Returns:
+        array: Effort of each row of lever values.
+    """
+    Selected = Selected or {}
+    Effort = np.zeros(len(Values))
+    for i, Name in enumerate(Names):
+        if Name in Selected:
+            Units = np.abs(Values[:, i] - Selected[Name])
+        elif Name.endswith(('_Lever', '_Change')):
+            Units = Values[:, i] - 1
+        else:
+            Units = max(Options[Name]) - Values[:, i]
+        Effort += Weights.get(Name, 0) * Units
+    return Effort
+
+def Pareto_Front(Effort, Value):
+    """
+    Finds the options which are not dominated, i.e. for which no other option has less or equal effort and a lower value.
+
+    Args:
+        Effort (array): Effort of each option.
+        Value (array): Value of each option, to be minimised.
+
+    Returns:
+        array: Indices of the options on the front, in order of increasing effort and decreasing value.
+    """
+    Value = np.where(np.isnan(Value), np.inf, Value)
+    Order = np.lexsort((Value, Effort))
+    Best = np.minimum.accumulate(Value[Order])
+    Keep = np.concatenate([[True], Value[Order][1:] < Best[:-1]]) & np.isfinite(Value[Order])
+    return Order[Keep]
+
+def _Grid(Names, Options):
+    return np.array(list(itertools.product(*[Options[Name] for Name in Names])), dtype = float)
+
+def Optimise(Cut = 0.25, TargetYear = 2026, Measure = 'Emissions_FTE', Weights = None, Fixed = None, Options = None,
+             Inputs = None, BaseYear = ss.BaseYear, Hold_Population = True):
+    """
+    Finds the least-effort lever selection for which the measure in the target year is at most (1 - Cut) times its base year value.
+
+    Args:
+        Cut (float, optional): Fractional reduction from the base year. Defaults to 0.25.
+        TargetYear (int, optional): Year in which the target must be met. Defaults to 2026.
+        Measure (str, optional): 'Emissions_FTE' (tCO2e/person) or 'Total' (tCO2e). Defaults to 'Emissions_FTE'.
+        Weights (dict, optional): Effort per unit of each lever, as in Default_Weights, which are used for levers not given.
+        Fixed (dict, optional): Levers kept at the given values, e.g. the leakage factors and the selected population levers.
+                                Defaults to their default values for the leakage factors and population levers, with all
+                                other levers optimised.
+        Options (dict, optional): Values considered for each lever, keyed by lever name or by 'Lever', 'Speed' or 'Start'.
+                                  Defaults to Default_Options, and starts from 2024 to the target year.
+        Inputs (dict, optional): Shared inputs from ScenarioSweep.Prepare_Inputs. Defaults to those of the current data.
+        BaseYear (int, optional): Year of the reference emissions. Defaults to 2022.
+        Hold_Population (bool, optional): Whether the population levers are kept at their selected values, as population
+                                          growth is not an action for cutting emissions. Otherwise they are optimised, at the
+                                          effort of their distance from the selected values. Defaults to True.
+
+    Returns:
+        OptimiserResult: The selected levers and their effort.
+    """
+    Weights = dict(Default_Weights, **(Weights or {}))
+    Population_Names = ['Population_Change', 'Population_Speed', 'Population_Start']
+    Fixed = dict({Name: Value for Name, Value in Default_Levers.items() if Name.endswith('_Leakage') or Name in Population_Names},
+                 **(Fixed or {}))
+    ss._Check_Levers(Fixed)
+    Selected = {Name: Fixed.pop(Name) for Name in Population_Names} if not Hold_Population else {}
+    Inputs = Inputs or ss.Shared_Inputs()
+    Given = {**Default_Options, 'Start': list(range(2024, TargetYear + 1)), **(Options or {})}
+    Options = {}
+    for Name in ss.Lever_Names:
+        Kind = 'Lever' if Name.endswith(('_Lever', '_Change')) else Name.rsplit('_', 1)[-1]
+        Options[Name] = [Fixed[Name]] if Name in Fixed else Given.get(Name, Given.get(Kind))
+    Year = gf.Year_Positions(Inputs['Years'], [TargetYear])[0]
+
+    # Baseline, from before any action can start.
+    Reference = ss.Evaluate_Scenarios(dict(Fixed, **Selected), Inputs)
+    Baseline = float(getattr(Reference, Measure)[0, gf.Year_Positions(Inputs['Years'], [BaseYear])[0]])
+    Target = (1 - Cut) * Baseline
+
+    # Pareto front of each haul: effort against emissions in the target year.
+    Fronts = []
+    for Haul in ss.Hauls:
+        Names = [Haul + '_' + n for n in ['Demand_Lever', 'Demand_Speed', 'Demand_Start', 'Class_Lever', 'Class_Speed', 'Class_Start']]
+        Grid = _Grid(Names, Options)
+        Leakage = np.full(len(Grid), float(Fixed[Haul + '_Leakage']))
+        Emissions = ss.Evaluate_Haul(Haul, Leakage, Grid[:, :3], Grid[:, 3:], Inputs)[:, Year] / 1000
+        Effort = Lever_Effort(Names, Grid, Weights, Options)
+        Front = Pareto_Front(Effort, Emissions)
+        Fronts.append((Names, Grid[Front], Effort[Front], Emissions[Front]))
+
+    # Population front: effort against (negative) population in the target year.
+    Names = Population_Names
+    Grid = _Grid(Names, Options)
+    if Measure == 'Emissions_FTE':
+        Population = ss.Evaluate_Population(Grid, Inputs)[:, Year]
+    else:
+        Population = np.ones(len(Grid))
+    Effort = Lever_Effort(Names, Grid, Weights, Options, Selected)
+    Front = Pareto_Front(Effort, -Population)
+    Population_Front = (Names, Grid[Front], Effort[Front], Population[Front])
+
+    # Branch and bound: population options in order of effort, then every LH and SH pair, with the cheapest sufficient DOM option.
+    (LH_Names, LH_Grid, LH_Effort, LH_Emissions), (SH_Names, SH_Grid, SH_Effort, SH_Emissions), \
+        (DOM_Names, DOM_Grid, DOM_Effort, DOM_Emissions) = Fronts
+    Pair_Effort = LH_Effort[:, None] + SH_Effort[None, :]
+    Pair_Emissions = LH_Emissions[:, None] + SH_Emissions[None, :]
+    Best = (np.inf, None)
+    for p, (Pop_Effort, Pop) in enumerate(zip(Population_Front[2], Population_Front[3])):
+        if Pop_Effort + Pair_Effort.min() + DOM_Effort.min() >= Best[0]:
+            break       # Options are in order of effort, so no later option can improve on the best found.
+        Remaining = Target * Pop - Pair_Emissions
+        if Remaining.max() < DOM_Emissions.min():
+            continue
+        d = np.searchsorted(-DOM_Emissions, -Remaining, side = 'left')      # Cheapest DOM option within the remaining emissions.
+        Feasible = d < len(DOM_Emissions)
+        Total_Effort = np.where(Feasible, Pop_Effort + Pair_Effort + DOM_Effort[np.minimum(d, len(DOM_Effort) - 1)], np.inf)
+        i, j = np.unravel_index(np.argmin(Total_Effort), Total_Effort.shape)
+        if Total_Effort[i, j] < Best[0]:
+            Best = (Total_Effort[i, j], (p, i, j, d[i, j]))
+
+    if Best[1] is None:
+        return OptimiserResult(None, np.inf, np.nan, Target, Baseline)
+    p, i, j, k = Best[1]
+    Levers = dict(Fixed)
+    for Names, Values in [(Population_Front[0], Population_Front[1][p]), (LH_Names, LH_Grid[i]), (SH_Names, SH_Grid[j]),
+                          (DOM_Names, DOM_Grid[k])]:
+        Levers.update({Name: Value.item() for Name, Value in zip(Names, Values)})
+    Achieved = float(getattr(ss.Evaluate_Scenarios(Levers, Inputs), Measure)[0, Year])
+    return OptimiserResult(Levers, float(Best[0]), Achieved, Target, Baseline)
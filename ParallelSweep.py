@@ -0,0 +1,107 @@
+"""
+Parallel execution of large scenario sweeps for the Chemical Engineering aviation calculator.
+Splits the Cartesian product of lever values into chunks evaluated on a process pool, with results streamed to a 
+Parquet results directory (see SweepStorage) as each chunk completes. Each worker prepares the shared inputs once, when it starts.
+
+Usage: python ParallelSweep.py <lever ranges json> <output directory> [--workers N] [--chunk-size N] [--totals-only]
+Created October 2024
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import ScenarioSweep as ss
+import SweepStorage
+
+_Worker = {}        # Shared inputs and lever ranges of the current worker process.
+
+def _Init_Worker(Ranges, Details):
+    _Worker['Ranges'] = Ranges
+    _Worker['Details'] = Details
+    _Worker['Inputs'] = ss.Prepare_Inputs()
+
+def Sweep_Ranges(Lever_Ranges):
+    """
+    Args:
+        Lever_Ranges (dict): Values to be swept, keyed by lever name. Levers which are not given are kept at their default values.
+
+    Returns:
+        list: Array of values of each lever, in the order of ss.Lever_Names.
+    """
+    ss._Check_Levers(Lever_Ranges)
+    return [np.atleast_1d(np.asarray(Lever_Ranges.get(Name, ss.Default_Levers[Name]), dtype = float)) for Name in ss.Lever_Names]
+
+def Scenario_Levers(Ranges, Start, Stop):
+    """
+    Lever selections of a contiguous block of scenarios of the Cartesian product, without building the whole product.
+
+    Args:
+        Ranges (list): Array of values of each lever, in the order of ss.Lever_Names.
+        Start (int): Index of the first scenario.
+        Stop (int): Index after the last scenario.
+
+    Returns:
+        dict: Lever values of each scenario, keyed by lever name.
+    """
+    Index = np.unravel_index(np.arange(Start, Stop), [len(r) for r in Ranges])
+    return {Name: Values[Idx] for Name, Values, Idx in zip(ss.Lever_Names, Ranges, Index)}
+
+def _Run_Chunk(Chunk, Start, Stop, OutputDirectory):
+    Result = ss.Evaluate_Scenarios(Scenario_Levers(_Worker['Ranges'], Start, Stop), _Worker['Inputs'], Details = _Worker['Details'])
+    Path = SweepStorage.SweepWriter(OutputDirectory, FirstChunk = Chunk).Write(Result, ScenarioOffset = Start)
+    return Chunk, os.path.basename(Path), Stop - Start
+
+def Run_ParallelSweep(Lever_Ranges, OutputDirectory, ChunkSize = 10000, Workers = None, Details = True):
+    """
+    Evaluates every combination of the given lever values across a pool of processes.
+    Each chunk of scenarios is saved as 'chunk-<n>.parquet', readable with SweepStorage.Read_Results, and a 'manifest.json' 
+    listing the chunks is written once all have completed. Results of an earlier sweep in the directory are removed first.
+
+    Args:
+        Lever_Ranges (dict): Values to be swept, keyed by lever name. Levers which are not given are kept at their default values.
+        OutputDirectory (str): Directory in which results are saved.
+        ChunkSize (int, optional): Number of scenarios evaluated per task. Defaults to 10000.
+        Workers (int, optional): Number of processes. Defaults to the number of CPUs.
+        Details (bool, optional): Whether the demand and emissions of each travel class are saved. Defaults to True.
+
+    Returns:
+        dict: The manifest of the saved results.
+    """
+    Ranges = Sweep_Ranges(Lever_Ranges)
+    Total = int(np.prod([len(r) for r in Ranges]))
+    os.makedirs(OutputDirectory, exist_ok = True)
+    SweepStorage.Clear_Results(OutputDirectory)
+
+    Chunks = []
+    with ProcessPoolExecutor(max_workers = Workers, initializer = _Init_Worker, initargs = (Ranges, Details)) as Executor:
+        Futures = [Executor.submit(_Run_Chunk, Chunk, Start, min(Start + ChunkSize, Total), OutputDirectory)
+                   for Chunk, Start in enumerate(range(0, Total, ChunkSize))]
+        for Future in as_completed(Futures):
+            Chunk, FileName, Count = Future.result()
+            Chunks.append({'Chunk': Chunk, 'File': FileName, 'Scenarios': Count})
+
+    Manifest = {'Levers': ss.Lever_Names, 'Ranges': [r.tolist() for r in Ranges], 'Scenarios': Total,
+                'Chunks': sorted(Chunks, key = lambda c: c['Chunk'])}
+    with open(os.path.join(OutputDirectory, 'manifest.json'), 'w') as f:
+        json.dump(Manifest, f, indent = 1)
+    return Manifest
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Run a parallel sweep over lever values.')
+    Parser.add_argument('Ranges', help = 'JSON file of lever values to be swept, keyed by lever name.')
+    Parser.add_argument('Output', help = 'Directory in which results are saved.')
+    Parser.add_argument('--workers', type = int, default = None)
+    Parser.add_argument('--chunk-size', type = int, default = 10000)
+    Parser.add_argument('--totals-only', action = 'store_true', help = 'Only save the totals of each haul.')
+    Args = Parser.parse_args()
+
+    with open(Args.Ranges) as f:
+        Lever_Ranges = json.load(f)
+    Manifest = Run_ParallelSweep(Lever_Ranges, Args.Output, ChunkSize = Args.chunk_size, Workers = Args.workers, 
+                                 Details = not Args.totals_only)
+    print('{} scenarios written to {}'.format(Manifest['Scenarios'], Args.Output), file = sys.stderr)
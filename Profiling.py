@@ -0,0 +1,216 @@
+"""
+Opt-in profiling of the NZ calculator.
+Records the wall time and number of calls of the calculation modules, functions and figure builders, and the number of bytes
+serialised for display. Recordings belong to the thread that started them, so concurrent app sessions are kept apart.
+Outside of a recording, instrumented functions only check for one before calling the original function.
+Recordings can be exported as JSON, or in the Chrome trace format (viewable in chrome://tracing or Perfetto).
+Profiling is enabled from the app's diagnostics panel, and by default with the environment variable CE_PROFILE=1.
+Created October 2024
+"""
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+Default_Enabled = os.environ.get('CE_PROFILE', '') not in ('', '0')
+
+_Local = threading.local()      # Recording of the current thread
+_Originals = {}                 # (module name, function name) -> original function, for instrumented modules
+_Lock = threading.Lock()
+_Null = contextlib.nullcontext()
+
+class Recording:
+    """
+    Timings recorded over one run of the calculator.
+
+    Attributes:
+        Events (list): Timed calls as tuples of (name, start, end), in seconds of time.perf_counter().
+        Bytes (dict): Number of bytes serialised, keyed by name.
+        Origin (float): Time at which the recording started.
+    """
+    def __init__(self):
+        self.Events = []
+        self.Bytes = {}
+        self.Origin = time.perf_counter()
+        self.Thread = threading.get_ident()
+
+    def Add(self, Name, Start, End):
+        self.Events.append((Name, Start, End))
+
+    def Add_Bytes(self, Name, Size):
+        self.Bytes[Name] = self.Bytes.get(Name, 0) + Size
+
+    def Summary(self):
+        """
+        Returns:
+            dict: Number of 'Calls', 'Total_ms', 'Mean_ms' and 'Max_ms' wall times, and 'Bytes' serialised, keyed by name.
+                  Times include those of nested calls.
+        """
+        Summary = {}
+        for Name, Start, End in self.Events:
+            Entry = Summary.setdefault(Name, {'Calls': 0, 'Total_ms': 0.0, 'Max_ms': 0.0, 'Bytes': 0})
+            Entry['Calls'] += 1
+            Entry['Total_ms'] += (End - Start) * 1000
+            Entry['Max_ms'] = max(Entry['Max_ms'], (End - Start) * 1000)
+        for Name, Size in self.Bytes.items():
+            Summary.setdefault(Name, {'Calls': 0, 'Total_ms': 0.0, 'Max_ms': 0.0, 'Bytes': 0})['Bytes'] = Size
+        for Entry in Summary.values():
+            Entry['Mean_ms'] = Entry['Total_ms'] / Entry['Calls'] if Entry['Calls'] else 0.0
+        return dict(sorted(Summary.items(), key = lambda Item: -Item[1]['Total_ms']))
+
+    def to_json(self):
+        """
+        Returns:
+            str: JSON of the summary and of each timed call, with times in ms from the start of the recording.
+        """
+        Events = [{'Name': Name, 'Start_ms': (Start - self.Origin) * 1000, 'Duration_ms': (End - Start) * 1000}
+                  for Name, Start, End in self.Events]
+        return json.dumps({'Summary': self.Summary(), 'Events': Events}, indent = 1)
+
+    def to_chrome_trace(self):
+        """
+        Returns:
+            str: JSON in the Chrome trace event format, with one complete ('X') event per timed call.
+        """
+        Events = [{'name': Name, 'cat': Name.split('.')[0], 'ph': 'X', 'ts': (Start - self.Origin) * 1e6,
+                   'dur': (End - Start) * 1e6, 'pid': os.getpid(), 'tid': self.Thread}
+                  for Name, Start, End in self.Events]
+        Events += [{'name': 'Bytes serialised', 'ph': 'C', 'ts': 0, 'pid': os.getpid(), 'tid': self.Thread, 'args': self.Bytes}]
+        return json.dumps({'traceEvents': Events, 'displayTimeUnit': 'ms'})
+
+def Current():
+    """
+    Returns:
+        Recording: Recording of the current thread, or None if profiling is not enabled.
+    """
+    return getattr(_Local, 'Recording', None)
+
+def Start():
+    """
+    Starts a new recording on the current thread, replacing any previous one.
+
+    Returns:
+        Recording: The new recording.
+    """
+    _Local.Recording = Recording()
+    return _Local.Recording
+
+def Stop():
+    """
+    Ends the recording of the current thread, adding a 'Run' event covering all of it.
+
+    Returns:
+        Recording: The finished recording, or None if there was none.
+    """
+    Run = Current()
+    _Local.Recording = None
+    if Run is not None:
+        Run.Add('Run', Run.Origin, time.perf_counter())
+    return Run
+
+class _Section:
+    __slots__ = ('Run', 'Name', 'Start')
+
+    def __init__(self, Run, Name):
+        self.Run = Run
+        self.Name = Name
+
+    def __enter__(self):
+        self.Start = time.perf_counter()
+        return self
+
+    def __exit__(self, *Exception):
+        self.Run.Add(self.Name, self.Start, time.perf_counter())
+        return False
+
+def Timed(Name):
+    """
+    Context manager timing the enclosed code, if the current thread is recording.
+
+    Args:
+        Name (str): Name under which the time is recorded.
+    """
+    Run = Current()
+    if Run is None:
+        return _Null
+    return _Section(Run, Name)
+
+def Profiled(Function = None, Name = None):
+    """
+    Decorator timing each call of a function, if the calling thread is recording.
+    Can be applied with or without arguments, i.e. @Profiled or @Profiled(Name = '...').
+
+    Args:
+        Function (function): Function to be timed.
+        Name (str, optional): Name under which the time is recorded. Defaults to the function name.
+
+    Returns:
+        function: The timed function.
+    """
+    if Function is None:
+        return lambda Function: Profiled(Function, Name)
+    Name = Name or Function.__name__
+
+    @functools.wraps(Function)
+    def Wrapper(*args, **kwargs):
+        Run = getattr(_Local, 'Recording', None)
+        if Run is None:
+            return Function(*args, **kwargs)
+        Start = time.perf_counter()
+        try:
+            return Function(*args, **kwargs)
+        finally:
+            Run.Add(Name, Start, time.perf_counter())
+    return Wrapper
+
+def Instrument(Module, Names = None):
+    """
+    Replaces the public functions of a module with timed versions, named '<module>.<function>'.
+    Calls made through the module (e.g. gf.Shares, including those between its own functions) are then timed.
+    Instrumenting a module more than once has no further effect.
+
+    Args:
+        Module (module): Module to be instrumented, e.g. GeneralisedFunctions.
+        Names (list, optional): Functions to be instrumented. Defaults to all public functions defined in the module.
+    """
+    if Names is None:
+        Names = [Name for Name, Value in vars(Module).items()
+                 if inspect.isfunction(Value) and not Name.startswith('_') and Value.__module__ == Module.__name__]
+    with _Lock:
+        for Name in Names:
+            if (Module.__name__, Name) not in _Originals:
+                _Originals[(Module.__name__, Name)] = getattr(Module, Name)
+                setattr(Module, Name, Profiled(getattr(Module, Name), Name = '{}.{}'.format(Module.__name__, Name)))
+
+def Restore(Module):
+    """
+    Undoes Instrument, restoring the original functions of the module.
+
+    Args:
+        Module (module): Instrumented module.
+    """
+    with _Lock:
+        for (ModuleName, Name), Original in list(_Originals.items()):
+            if ModuleName == Module.__name__:
+                setattr(Module, Name, Original)
+                del _Originals[(ModuleName, Name)]
+
+def Record_Serialised(Name, Value):
+    """
+    Records the size of the JSON sent for a value (e.g. a Plotly figure or a ModuleOutput), if the current thread is recording.
+    The value is serialised only while recording.
+
+    Args:
+        Name (str): Name under which the size is recorded.
+        Value (obj): String, bytes, or object with a to_json method.
+    """
+    Run = Current()
+    if Run is None:
+        return
+    with Timed('Serialise.' + Name):
+        Data = Value if isinstance(Value, (str, bytes)) else Value.to_json()
+    Run.Add_Bytes(Name, len(Data.encode() if isinstance(Data, str) else Data))
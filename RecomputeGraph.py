@@ -0,0 +1,83 @@
+"""
+Incremental recomputation of the NZ calculator pipeline.
+Each node (a module output or a figure) declares the inputs it reads, either lever values or the results of earlier nodes.
+When the lever values change, only the nodes depending on a changed value are recalculated; all other results are reused
+from the previous evaluation, kept in a state dictionary such as Streamlit's session state.
+Created October 2024
+"""
+
+class RecomputeGraph:
+    """
+    Dependency graph of calculation nodes, evaluated in the order they were added.
+
+    Attributes:
+        Nodes (dict): (function, input names) of each node, keyed by node name.
+    """
+    def __init__(self):
+        self.Nodes = {}
+
+    def Add(self, Name, Function, Inputs = ()):
+        """
+        Args:
+            Name (str): Name of the node.
+            Function (function): Calculates the node, called with the value of each input, in order.
+            Inputs (list, optional): Names of the lever values or earlier nodes read by the node. Defaults to none.
+        """
+        if Name in self.Nodes:
+            raise ValueError('Node {} is already defined'.format(Name))
+        if Name in Inputs:
+            raise ValueError('Node {} cannot depend on itself'.format(Name))
+        self.Nodes[Name] = (Function, list(Inputs))
+
+    def Dependents(self, Inputs):
+        """
+        Args:
+            Inputs (list): Names of lever values or nodes.
+
+        Returns:
+            list: Nodes which are recalculated when any of the given inputs change, in evaluation order.
+        """
+        Changed = set(Inputs)
+        Dependents = []
+        for Name, (Function, NodeInputs) in self.Nodes.items():
+            if Changed.intersection(NodeInputs):
+                Changed.add(Name)
+                Dependents.append(Name)
+        return Dependents
+
+    def Evaluate(self, Values, State):
+        """
+        Calculates every node which is new or depends on a changed value, reusing the previous results of all others.
+        A recalculated node returning the same object as before (e.g. from a memoised module) does not invalidate its dependents.
+
+        Args:
+            Values (dict): Current lever values (and other external inputs), keyed by name.
+            State (dict): Results and values of the previous evaluation, updated in place. Empty for the first evaluation.
+
+        Returns:
+            dict: Results of every node, keyed by node name.
+        """
+        Previous = State.get('Values', {})
+        Results = dict(State.get('Results', {}))
+        Changed = {Name for Name, Value in Values.items() if Name not in Previous or not _Equal(Previous[Name], Value)}
+
+        Recomputed = []
+        for Name, (Function, Inputs) in self.Nodes.items():
+            if Name in Results and Changed.isdisjoint(Inputs):
+                continue
+            Result = Function(*[Results[i] if i in self.Nodes else Values[i] for i in Inputs])
+            if Name not in Results or Result is not Results[Name]:
+                Changed.add(Name)
+            Results[Name] = Result
+            Recomputed.append(Name)
+
+        State['Values'] = dict(Values)
+        State['Results'] = Results
+        State['Recomputed'] = Recomputed
+        return Results
+
+def _Equal(a, b):
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):     # e.g. arrays, which are not compared as a whole.
+        return a is b
@@ -0,0 +1,136 @@
+"""
+Remote data fetching for the NZ calculator.
+Downloads data files from the remote repository concurrently over a pooled HTTP session, keeping a local copy of each.
+Copies are revalidated with ETag / If-Modified-Since requests, so unchanged files are not downloaded again.
+Requests time out and are retried with backoff; if a file still cannot be fetched, its last downloaded copy is used.
+Created October 2024
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+Default_Timeout = (3.05, 30)        # (connect, read) timeouts in seconds
+Retry_Statuses = [429, 500, 502, 503, 504]
+
+_Session = None
+_Session_Lock = threading.Lock()
+_Logger = logging.getLogger(__name__)
+
+def Make_Session(PoolSize = 8, Retries = 3, Backoff = 0.5):
+    """
+    Creates an HTTP session reusing its connections, retrying failed requests.
+
+    Args:
+        PoolSize (int, optional): Number of connections kept per host. Defaults to 8.
+        Retries (int, optional): Number of retries of failed connections and server errors. Defaults to 3.
+        Backoff (float, optional): Backoff factor between retries, which wait Backoff * 2^n seconds. Defaults to 0.5.
+
+    Returns:
+        Session: The configured session.
+    """
+    Session = requests.Session()
+    Adapter = HTTPAdapter(pool_connections = PoolSize, pool_maxsize = PoolSize,
+                          max_retries = Retry(total = Retries, backoff_factor = Backoff, status_forcelist = Retry_Statuses,
+                                              allowed_methods = ['GET', 'HEAD']))
+    Session.mount('http://', Adapter)
+    Session.mount('https://', Adapter)
+    return Session
+
+def Shared_Session():
+    """
+    Returns:
+        Session: Session shared by every fetch of the process.
+    """
+    global _Session
+    with _Session_Lock:
+        if _Session is None:
+            _Session = Make_Session()
+        return _Session
+
+def _Read_Meta(Path):
+    try:
+        with open(Path + '.meta.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def Fetch(URL, Path, Session = None, Timeout = Default_Timeout):
+    """
+    Brings the local copy of a remote file up to date, downloading it only if it has changed.
+
+    Args:
+        URL (str): Address of the remote file.
+        Path (str): Path of the local copy. Validators of the copy are kept in '<Path>.meta.json'.
+        Session (Session, optional): HTTP session. Defaults to the shared session.
+        Timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to Default_Timeout.
+
+    Returns:
+        str: 'Downloaded', 'Not modified', or 'Stale' if the file could not be fetched but an earlier copy exists.
+
+    Raises:
+        RequestException: If the file could not be fetched and there is no local copy.
+    """
+    Session = Session or Shared_Session()
+    Meta = _Read_Meta(Path) if os.path.exists(Path) else {}
+    Headers = {}
+    if Meta.get('URL') == URL:
+        if Meta.get('ETag'):
+            Headers['If-None-Match'] = Meta['ETag']
+        if Meta.get('Last-Modified'):
+            Headers['If-Modified-Since'] = Meta['Last-Modified']
+
+    try:
+        Response = Session.get(URL, headers = Headers, timeout = Timeout)
+        if Response.status_code == 304:
+            return 'Not modified'
+        Response.raise_for_status()
+    except requests.RequestException as Error:
+        if os.path.exists(Path):
+            _Logger.warning('Using the local copy of %s, which could not be fetched: %s', URL, Error)
+            return 'Stale'
+        raise
+
+    os.makedirs(os.path.dirname(Path) or '.', exist_ok = True)
+    TempPath = '{}.{}.tmp'.format(Path, uuid.uuid4().hex)
+    with open(TempPath, 'wb') as f:
+        f.write(Response.content)
+    os.replace(TempPath, Path)
+    with open(Path + '.meta.json', 'w') as f:
+        json.dump({'URL': URL, 'ETag': Response.headers.get('ETag'), 'Last-Modified': Response.headers.get('Last-Modified')}, f)
+    return 'Downloaded'
+
+def Fetch_All(URLs, Directory, Session = None, Timeout = Default_Timeout):
+    """
+    Fetches several remote files concurrently, so that the total time is that of the slowest file.
+
+    Args:
+        URLs (dict): Addresses of the remote files, keyed by the file name of their local copies.
+        Directory (str): Directory of the local copies.
+        Session (Session, optional): HTTP session. Defaults to the shared session.
+        Timeout (tuple, optional): Connect and read timeouts in seconds. Defaults to Default_Timeout.
+
+    Returns:
+        dict: Path of the local copy of each file, or None for files which could not be fetched and have no local copy.
+    """
+    Session = Session or Shared_Session()
+    with ThreadPoolExecutor(max_workers = max(len(URLs), 1)) as Executor:
+        Futures = {FileName: Executor.submit(Fetch, URL, os.path.join(Directory, FileName), Session, Timeout)
+                   for FileName, URL in URLs.items()}
+
+    Paths = {}
+    for FileName, Future in Futures.items():
+        try:
+            Future.result()
+            Paths[FileName] = os.path.join(Directory, FileName)
+        except requests.RequestException as Error:
+            _Logger.warning('Could not fetch %s: %s', URLs[FileName], Error)
+            Paths[FileName] = None
+    return Paths
@@ -0,0 +1,165 @@
+"""
+In-process memoisation of calculation module results for the NZ calculator.
+Results are keyed on the module's inputs and the version of the input data, and evicted least-recently-used first.
+Modules may also keep their results in the persistent store of ResultStore, shared between processes and restarts.
+Created October 2024
+"""
+
+import functools
+import threading
+import types
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+import DataLoading
+import GeneralisedFunctions as gf
+import ResultStore
+
+_Registry = {}          # Module name -> ModuleCache
+
+class ModuleCache:
+    """
+    Bounded, thread-safe store of results for a single calculation module.
+
+    Attributes:
+        MaxSize (int): Maximum number of results held before the least recently used is evicted.
+        Hits (int): Number of lookups which returned a stored result.
+        Misses (int): Number of lookups which required the module to be recalculated.
+    """
+    def __init__(self, MaxSize = 128):
+        self.MaxSize = MaxSize
+        self.Hits = 0
+        self.Misses = 0
+        self._Results = OrderedDict()
+        self._Lock = threading.Lock()
+
+    def Get(self, Key):
+        """
+        Args:
+            Key (tuple): Hashable key of the module inputs.
+
+        Returns:
+            tuple: Whether the key was found, and the stored result.
+        """
+        with self._Lock:
+            if Key in self._Results:
+                self._Results.move_to_end(Key)
+                self.Hits += 1
+                return True, self._Results[Key]
+            self.Misses += 1
+            return False, None
+
+    def Put(self, Key, Result):
+        with self._Lock:
+            self._Results[Key] = Result
+            self._Results.move_to_end(Key)
+            while len(self._Results) > self.MaxSize:
+                self._Results.popitem(last = False)
+
+    def Clear(self):
+        with self._Lock:
+            self._Results.clear()
+            self.Hits = 0
+            self.Misses = 0
+
+    def Stats(self):
+        with self._Lock:
+            return {'Hits': self.Hits, 'Misses': self.Misses, 'Size': len(self._Results), 'MaxSize': self.MaxSize}
+
+def Make_Key(Value):
+    """
+    Translates module inputs into a hashable key, so that equal inputs give equal keys.
+
+    Args:
+        Value (obj): Module input, e.g. a lever value, an ambition level dictionary or the output of another module.
+
+    Returns:
+        obj: Hashable representation of the input.
+    """
+    if isinstance(Value, Mapping):
+        return ('dict', tuple(sorted((Make_Key(k), Make_Key(v)) for k, v in Value.items())))
+    elif isinstance(Value, (list, tuple)):
+        return ('seq', tuple(Make_Key(v) for v in Value))
+    elif isinstance(Value, gf.ModuleOutput):
+        return ('ModuleOutput', Value.Fingerprint)
+    elif isinstance(Value, np.generic):
+        return Value.item()
+    return Value
+
+def Register(Name, Cache):
+    """
+    Adds a cache used outside of Memoise (e.g. of figures) to the statistics and clearing of all caches.
+
+    Args:
+        Name (str): Name of the cache.
+        Cache (ModuleCache): The cache.
+
+    Returns:
+        ModuleCache: The registered cache.
+    """
+    _Registry[Name] = Cache
+    return Cache
+
+def Memoise(MaxSize = 128, Context = None, Persistent = False):
+    """
+    Decorator caching the results of a calculation module, keyed on its arguments and on the input data version.
+    Module results must be treated as read-only, as the same result is returned to every caller with the same inputs,
+    including callers in other sessions of the app. Dictionaries of results are returned as read-only mappings.
+
+    Args:
+        MaxSize (int, optional): Maximum number of results kept for the module. Defaults to 128.
+        Context (function, optional): Returns any further setting read by the module (e.g. the default Plotly template),
+                                      to be added to the key. Defaults to none.
+        Persistent (bool, optional): Whether results missing from memory are looked up in, and added to, the default
+                                     ResultStore. Only for modules taking plain values, dictionaries and ModuleOutputs,
+                                     and returning ModuleOutputs. Every setting read by the module must be one of its
+                                     arguments, or defined in the source of its calculator modules (see
+                                     ResultStore.Code_Version). Defaults to False.
+
+    Returns:
+        function: Decorator to be applied to the module.
+    """
+    def Decorator(Module):
+        Cache = Register(Module.__name__, ModuleCache(MaxSize))
+
+        def Calculate(Key, args, kwargs):
+            Store = ResultStore.Default_Store() if Persistent else None
+            if Store is None:
+                return Module(*args, **kwargs)
+            StoreKey = ResultStore.Store_Key((Module.__qualname__, ResultStore.Code_Version(Module)), Key)
+            Found, Result = Store.Get(StoreKey)
+            if not Found:
+                Result = Module(*args, **kwargs)
+                Store.Put(StoreKey, Module.__qualname__, Result)
+            return Result
+
+        @functools.wraps(Module)
+        def Wrapper(*args, **kwargs):
+            Key = (Make_Key(args), Make_Key(kwargs), DataLoading.Data_Version(), Context() if Context else None)
+            Found, Result = Cache.Get(Key)
+            if not Found:
+                Result = Calculate(Key, args, kwargs)
+                if isinstance(Result, dict):
+                    Result = types.MappingProxyType(Result)     # The same object is returned on every hit, so that
+                Cache.Put(Key, Result)                          # callers such as RecomputeGraph may compare results by identity.
+            return Result
+
+        Wrapper.Cache = Cache
+        return Wrapper
+    return Decorator
+
+def Cache_Stats():
+    """
+    Returns:
+        dict: Hit and miss counters and sizes of every memoised module, keyed by module name.
+    """
+    return {Name: Cache.Stats() for Name, Cache in _Registry.items()}
+
+def Clear_All():
+    """
+    Drops all memoised results and resets the counters.
+    """
+    for Cache in _Registry.values():
+        Cache.Clear()
@@ -0,0 +1,314 @@
+"""
+Persistent store of calculation module results for the NZ calculator, shared between processes and kept across restarts.
+Results are held in a SQLite database in WAL mode, so that the workers of the app read while another writes, with SQLite's
+file locks keeping writes from separate processes safe. Entries are keyed by a hash of the module and the source code it
+depends on, its inputs (the levers and ambition definitions) and the version of the input data, and the least recently
+used are evicted once the store grows past its size limit. Only module outputs, or dictionaries of them, are stored,
+written as arrays without pickling.
+Set CE_RESULT_STORE to the path of the database, or to 'off' to disable the store, and CE_RESULT_STORE_MB to its size.
+
+Usage: python ResultStore.py [warm | stats | clear] [--path PATH]
+Created October 2024
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import DataLoading
+import GeneralisedFunctions as gf
+
+Store_Version = 2           # Raised whenever the format of the stored results changes.
+Store_Path = os.environ.get('CE_RESULT_STORE', os.path.join(DataLoading.Data_Directory, '.results', 'results.sqlite'))
+Store_MB = float(os.environ.get('CE_RESULT_STORE_MB', 256))
+Busy_Timeout = 10           # Time to wait for the write lock held by another process, in s.
+Touch_Seconds = 60          # Interval at which the last access of an entry is updated, for eviction.
+
+_Code_Versions = {}         # Source file -> hash of the source it depends on
+_Default = None
+_Default_Set = False
+_Default_Lock = threading.Lock()
+_Logger = logging.getLogger(__name__)
+
+def Encode(Result):
+    """
+    Writes a module result as arrays in the NumPy .npz format.
+
+    Args:
+        Result (obj): Module result.
+
+    Returns:
+        bytes: Encoded result, or None if the result is not a ModuleOutput or a dictionary of them keyed by name.
+    """
+    Outputs = {'': Result} if isinstance(Result, gf.ModuleOutput) else Result
+    if not isinstance(Outputs, dict) or not all(isinstance(Name, str) and isinstance(Output, gf.ModuleOutput)
+                                                and all(isinstance(Column, str) for Column in Output.Columns)
+                                                for Name, Output in Outputs.items()):
+        return None
+    Arrays = {}
+    for i, (Name, Output) in enumerate(Outputs.items()):
+        Arrays['{}.name'.format(i)] = np.array(Name)
+        Arrays['{}.years'.format(i)] = Output.Years
+        Arrays['{}.columns'.format(i)] = np.array(Output.Columns, dtype = str)
+        Arrays['{}.values'.format(i)] = Output.Values
+    Buffer = io.BytesIO()
+    np.savez(Buffer, **Arrays)
+    return Buffer.getvalue()
+
+def Decode(Value):
+    """
+    Args:
+        Value (bytes): Result encoded by Encode.
+
+    Returns:
+        obj: The module result.
+    """
+    with np.load(io.BytesIO(Value), allow_pickle = False) as Arrays:
+        Outputs = {}
+        for i in range(len(Arrays.files) // 4):
+            Outputs[str(Arrays['{}.name'.format(i)])] = gf.ModuleOutput(Arrays['{}.years'.format(i)],
+                                                                        tuple(str(c) for c in Arrays['{}.columns'.format(i)]),
+                                                                        Arrays['{}.values'.format(i)])
+    return Outputs[''] if list(Outputs) == [''] else Outputs
+
+def Local_Imports(Path):
+    """
+    Args:
+        Path (str): Path to a source file of the calculator.
+
+    Returns:
+        list: Paths to the source files of the calculator modules imported by the file, anywhere in its code.
+    """
+    with open(Path, 'rb') as f:
+        Tree = ast.parse(f.read(), Path)
+    Names = []
+    for Node in ast.walk(Tree):
+        if isinstance(Node, ast.Import):
+            Names += [Alias.name for Alias in Node.names]
+        elif isinstance(Node, ast.ImportFrom) and Node.module and Node.level == 0:
+            Names.append(Node.module)
+    Candidates = [os.path.join(os.path.dirname(Path), Name.split('.')[0] + '.py') for Name in Names]
+    return [Candidate for Candidate in Candidates if os.path.exists(Candidate)]
+
+def Code_Version(Module):
+    """
+    Hashes the source of the file defining a module and of every calculator module it imports, directly or indirectly.
+    Stored results are therefore not reused once the module, the functions it calls, or the constants it reads (e.g.
+    CalculatorParameters) are edited. Any edit to these files invalidates the results, including edits which would not
+    change them.
+
+    Args:
+        Module (function): Calculation module.
+
+    Returns:
+        str: Hash of the source code.
+    """
+    Source = os.path.abspath(inspect.getsourcefile(Module))
+    if Source not in _Code_Versions:
+        Files, Pending = set(), [Source]
+        while Pending:
+            Path = os.path.abspath(Pending.pop())
+            if Path not in Files:
+                Files.add(Path)
+                Pending += Local_Imports(Path)
+        Digest = hashlib.sha256()
+        for Path in sorted(Files):
+            Digest.update(os.path.basename(Path).encode())
+            with open(Path, 'rb') as f:
+                Digest.update(f.read())
+        _Code_Versions[Source] = Digest.hexdigest()
+    return _Code_Versions[Source]
+
+def Store_Key(Module, Key):
+    """
+    Args:
+        Module (tuple): Name of the module, and the hash of its source code from Code_Version.
+        Key (tuple): In-process cache key of the module inputs, from ResultCache.Make_Key, including the data version.
+
+    Returns:
+        str: Key of the result in the store.
+    """
+    return hashlib.sha256(repr((Store_Version, Module, Key)).encode()).hexdigest()
+
+class ResultStore:
+    """
+    SQLite store of module results, which may be used by many threads and processes at once.
+
+    Args:
+        Path (str): Path to the database, created if needed.
+        MaxBytes (int, optional): Size of the stored results above which the least recently used are evicted. Defaults to 256 MiB.
+
+    Attributes:
+        Hits (int): Number of lookups by this process which returned a stored result.
+        Misses (int): Number of lookups by this process which found no result.
+    """
+    def __init__(self, Path, MaxBytes = 256 * 2**20):
+        self.Path = Path
+        self.MaxBytes = MaxBytes
+        self.Hits = 0
+        self.Misses = 0
+        self._Local = threading.local()
+        self._Lock = threading.Lock()
+
+    def _Connection(self):
+        # Connections are kept per thread, and are not carried over into forked processes.
+        if getattr(self._Local, 'Pid', None) != os.getpid():
+            Directory = os.path.dirname(os.path.abspath(self.Path))
+            os.makedirs(Directory, exist_ok = True)
+            Connection = sqlite3.connect(self.Path, timeout = Busy_Timeout, isolation_level = None)
+            Connection.execute('PRAGMA journal_mode = WAL')
+            Connection.execute('PRAGMA synchronous = NORMAL')
+            Connection.execute('CREATE TABLE IF NOT EXISTS Results (Key TEXT PRIMARY KEY, Module TEXT, Value BLOB, '
+                               'Size INTEGER, Accessed REAL)')
+            Connection.execute('CREATE INDEX IF NOT EXISTS Results_Accessed ON Results (Accessed)')
+            self._Local.Connection, self._Local.Pid = Connection, os.getpid()
+        return self._Local.Connection
+
+    def Get(self, Key):
+        """
+        Args:
+            Key (str): Key of the result, from Store_Key.
+
+        Returns:
+            tuple: Whether the key was found, and the stored result. Errors reading the store are logged and treated as misses.
+        """
+        try:
+            Connection = self._Connection()
+            Row = Connection.execute('SELECT Value, Accessed FROM Results WHERE Key = ?', (Key,)).fetchone()
+            if Row is None:
+                self._Count(False)
+                return False, None
+            Result = Decode(Row[0])
+            Now = time.time()
+            if Now - Row[1] > Touch_Seconds:
+                Connection.execute('UPDATE Results SET Accessed = ? WHERE Key = ?', (Now, Key))
+        except (sqlite3.Error, OSError, ValueError, KeyError) as Error:
+            _Logger.warning('Could not read from the result store %s: %s', self.Path, Error)
+            self._Count(False)
+            return False, None
+        self._Count(True)
+        return True, Result
+
+    def _Count(self, Hit):
+        with self._Lock:
+            if Hit:
+                self.Hits += 1
+            else:
+                self.Misses += 1
+
+    def Put(self, Key, Module, Result):
+        """
+        Stores a result, evicting the least recently used results if the store becomes too large.
+        Results which cannot be encoded are not stored, and errors writing the store are logged.
+
+        Args:
+            Key (str): Key of the result, from Store_Key.
+            Module (str): Name of the module, kept for the statistics.
+            Result (obj): Module result.
+        """
+        Value = Encode(Result)
+        if Value is None:
+            return
+        try:
+            Connection = self._Connection()
+            Connection.execute('BEGIN IMMEDIATE')
+            try:
+                Connection.execute('INSERT OR REPLACE INTO Results VALUES (?, ?, ?, ?, ?)', (Key, Module, Value, len(Value), time.time()))
+                self._Evict(Connection)
+                Connection.execute('COMMIT')
+            except BaseException:
+                Connection.execute('ROLLBACK')
+                raise
+        except (sqlite3.Error, OSError) as Error:
+            _Logger.warning('Could not write to the result store %s: %s', self.Path, Error)
+
+    def _Evict(self, Connection):
+        Excess = Connection.execute('SELECT COALESCE(SUM(Size), 0) FROM Results').fetchone()[0] - self.MaxBytes
+        if Excess <= 0:
+            return
+        Excess += self.MaxBytes // 10        # Evict down to 90% of the limit, so that eviction is not needed on every write.
+        Keys = []
+        for Key, Size in Connection.execute('SELECT Key, Size FROM Results ORDER BY Accessed'):
+            Keys.append((Key,))
+            Excess -= Size
+            if Excess <= 0:
+                break
+        Connection.executemany('DELETE FROM Results WHERE Key = ?', Keys)
+
+    def Clear(self):
+        self._Connection().execute('DELETE FROM Results')
+        self.Hits = 0
+        self.Misses = 0
+
+    def Stats(self):
+        """
+        Returns:
+            dict: Hits and misses of this process, and the number of entries and bytes held for each module.
+        """
+        Rows = self._Connection().execute('SELECT Module, COUNT(*), COALESCE(SUM(Size), 0) FROM Results GROUP BY Module').fetchall()
+        return {'Hits': self.Hits, 'Misses': self.Misses, 'Entries': sum(r[1] for r in Rows), 'Bytes': sum(r[2] for r in Rows),
+                'MaxBytes': self.MaxBytes, 'Path': self.Path, 'Modules': {r[0]: {'Entries': r[1], 'Bytes': r[2]} for r in Rows}}
+
+def Default_Store():
+    """
+    Returns:
+        ResultStore: Store used by the memoised modules of this process, set by CE_RESULT_STORE, or None if disabled.
+    """
+    global _Default, _Default_Set
+    with _Default_Lock:
+        if not _Default_Set:
+            _Default = None if Store_Path.lower() == 'off' else ResultStore(Store_Path, int(Store_MB * 2**20))
+            _Default_Set = True
+        return _Default
+
+def Use_Store(Store):
+    """
+    Replaces the store used by the memoised modules of this process.
+
+    Args:
+        Store (ResultStore): The store, or None to disable the store.
+    """
+    global _Default, _Default_Set
+    with _Default_Lock:
+        _Default, _Default_Set = Store, True
+
+def Warm():
+    """
+    Calculates the default scenario (all levers at their defaults, population at 3), so that it is held by the store,
+    e.g. when deploying new data or code ahead of restarting the app.
+
+    Returns:
+        float: Time taken in s.
+    """
+    import AviationModel
+    Started = time.perf_counter()
+    AviationModel.Run_Scenario()
+    return time.perf_counter() - Started
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Manage the persistent store of calculation module results.')
+    Parser.add_argument('action', choices = ['warm', 'stats', 'clear'], help = 'Calculate the default scenario, report the '
+                                                                               'contents of the store, or empty it.')
+    Parser.add_argument('--path', default = Store_Path, help = 'Path to the database. Defaults to CE_RESULT_STORE.')
+    Args = Parser.parse_args()
+
+    import ResultStore as Shared         # The module used by the memoised modules, rather than this script.
+    Store = Shared.ResultStore(Args.path, int(Store_MB * 2**20))
+    Shared.Use_Store(Store)
+    if Args.action == 'warm':
+        print('Default scenario calculated in {:.2f} s ({} results found, {} stored)'.format(Shared.Warm(), Store.Hits, Store.Misses))
+    elif Args.action == 'clear':
+        Store.Clear()
+    Stats = Store.Stats()
+    print('{}: {} results, {:.1f} KiB of {:.0f} MiB'.format(Stats['Path'], Stats['Entries'], Stats['Bytes'] / 1024, Stats['MaxBytes'] / 2**20))
+    for Module, ModuleStats in Stats['Modules'].items():
+        print('  {:<60}{:>6} results {:>10.1f} KiB'.format(Module, ModuleStats['Entries'], ModuleStats['Bytes'] / 1024))
@@ -0,0 +1,305 @@
+"""
+HTTP/JSON scenario service for the Chemical Engineering aviation calculator.
+A small ASGI application returning the emissions and population pathways of lever selections, for dashboards which do not
+embed Streamlit. Results are those of Generalised_TravelModule, Population_Module and Sum_TravelEmissions, calculated by
+the vectorised ScenarioSweep on the shared inputs of the process. Concurrent requests are coalesced: requests arriving
+while a batch is evaluated are queued, and evaluated together as the next batch, so that one evaluation serves many requests.
+
+Endpoints:
+    GET  /health      Status and version of the input data.
+    GET  /levers      Default lever values, lever ranges and the names of the outputs.
+    POST /scenarios   {"levers": {...}} for one scenario, or {"scenarios": [{...}, ...]} for a batch, with the optional
+                      "outputs" (names, defaults to Default_Outputs), "years" (defaults to all) and "decimals" (defaults to
+                      no rounding). Levers which are not given are kept at their default values. Returns the "years" and,
+                      under "outputs", the pathway of each scenario for each output, with missing or infinite values as null.
+
+Serving requires uvicorn (pip install uvicorn); the application itself only uses the standard library.
+
+Usage: python ScenarioAPI.py [--host 127.0.0.1] [--port 8000] [--max-batch N]
+Created October 2024
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import DataLoading
+import ScenarioSweep as ss
+from CalculatorParameters import CalculatorTime_Range, Default_Levers, Integer_Levers, Lever_Bounds
+
+_Logger = logging.getLogger(__name__)
+
+# Output name -> function of a SweepResult, returning an array with shape (scenarios, years).
+Outputs = {
+    'LH': lambda Result: Result.Emissions[:, 0],
+    'SH': lambda Result: Result.Emissions[:, 1],
+    'DOM': lambda Result: Result.Emissions[:, 2],
+    'Total': lambda Result: Result.Total,
+    'Population': lambda Result: Result.Population,
+    'Emissions_FTE': lambda Result: Result.Emissions_FTE,
+}
+Default_Outputs = ['Total', 'Emissions_FTE']
+
+Max_Body = 16 * 2**20        # Largest request body accepted, in bytes.
+
+class RequestError(ValueError):
+    """
+    Raised for requests which cannot be evaluated, and returned to the client with the given status.
+    """
+    def __init__(self, Message, Status = 400):
+        super().__init__(Message)
+        self.Status = Status
+
+def Parse_Scenarios(Scenarios):
+    """
+    Args:
+        Scenarios (list): Lever selections of each scenario, keyed by lever name, as sent by a client.
+
+    Returns:
+        array: Lever values with shape (scenarios, levers), levers in the order of ScenarioSweep.Lever_Names, with default
+               values for the levers which are not given.
+
+    Raises:
+        RequestError: If a lever is unknown, not a number, outside the range of values of the lever, or a fraction of a year.
+    """
+    if not all(isinstance(Levers, dict) for Levers in Scenarios):
+        raise RequestError('Scenarios must be objects of lever values')
+    Unknown = set().union(*Scenarios) - set(Default_Levers)
+    if Unknown:
+        raise RequestError('Unknown levers: {}'.format(', '.join(sorted(Unknown))))
+    Values = [[Levers.get(Name, Default) for Name, Default in Default_Levers.items()] for Levers in Scenarios]
+    if not all(type(Value) in (int, float) for Row in Values for Value in Row):
+        raise RequestError('Lever values must be numbers')
+    Table = np.array(Values, dtype = float).reshape(len(Scenarios), len(ss.Lever_Names))
+    for i, Name in enumerate(ss.Lever_Names):
+        Kind = 'Lever' if Name.endswith(('_Lever', '_Change')) else Name.rsplit('_', 1)[-1]
+        Lower, Upper = Lever_Bounds[Kind]
+        if not ((Table[:, i] >= Lower) & (Table[:, i] <= Upper)).all():
+            raise RequestError('{} must be between {} and {}'.format(Name, Lower, Upper))
+        if Kind in Integer_Levers and not (Table[:, i] == np.round(Table[:, i])).all():
+            raise RequestError('{} must be a whole number of years'.format(Name))
+    return Table
+
+def Format_Output(Values, Decimals = None):
+    """
+    Args:
+        Values (array): Output values, with shape (scenarios, years).
+        Decimals (int, optional): Number of decimals kept. Defaults to no rounding.
+
+    Returns:
+        list: Nested lists of the values, with missing and infinite values as None, so that they can be written as JSON.
+    """
+    if Decimals is not None:
+        Values = np.round(Values, Decimals)
+    Finite = np.isfinite(Values)
+    if Finite.all():
+        return Values.tolist()
+    Values = Values.astype(object)
+    Values[~Finite] = None
+    return Values.tolist()
+
+class ScenarioBatcher:
+    """
+    Coalesces the scenarios of concurrent requests into batches, each evaluated at once by ScenarioSweep.Evaluate_Scenarios
+    on a single background thread, so that the event loop keeps accepting requests during an evaluation.
+
+    Attributes:
+        MaxBatch (int): Most scenarios evaluated in one batch. Larger requests are evaluated alone.
+        Batches (int): Number of batches evaluated.
+        Scenarios (int): Number of scenarios evaluated.
+    """
+    def __init__(self, MaxBatch = 4096):
+        self.MaxBatch = MaxBatch
+        self.Batches = 0
+        self.Scenarios = 0
+        self._Pending = []          # (lever values, future) of each queued request
+        self._Worker = None
+        self._Executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'ScenarioBatcher')
+
+    async def Evaluate(self, Levers):
+        """
+        Args:
+            Levers (array): Lever values of each scenario, as from Parse_Scenarios.
+
+        Returns:
+            SweepResult: Results of the scenarios, in order.
+        """
+        Future = asyncio.get_running_loop().create_future()
+        self._Pending.append((Levers, Future))
+        if self._Worker is None or self._Worker.done():
+            self._Worker = asyncio.create_task(self._Drain())
+        return await Future
+
+    async def _Drain(self):
+        Loop = asyncio.get_running_loop()
+        while self._Pending:
+            # Whole requests are taken in order of arrival, up to the largest batch.
+            Count, Size = 0, 0
+            while Count < len(self._Pending) and (Count == 0 or Size + len(self._Pending[Count][0]) <= self.MaxBatch):
+                Size += len(self._Pending[Count][0])
+                Count += 1
+            Batch, self._Pending = self._Pending[:Count], self._Pending[Count:]
+            Levers = np.concatenate([Request for Request, Future in Batch])
+            try:
+                Result = await Loop.run_in_executor(self._Executor, _Evaluate, Levers)
+            except Exception as Error:
+                for Request, Future in Batch:
+                    if not Future.done():
+                        Future.set_exception(Error)
+                continue
+            self.Batches += 1
+            self.Scenarios += len(Levers)
+            Start = 0
+            for Request, Future in Batch:
+                if not Future.done():         # Requests whose client went away are skipped.
+                    Future.set_result(_Slice(Result, Start, Start + len(Request)))
+                Start += len(Request)
+
+    def Close(self):
+        self._Executor.shutdown(wait = False)
+
+def _Evaluate(Levers):
+    return ss.Evaluate_Scenarios({Name: Levers[:, i] for i, Name in enumerate(ss.Lever_Names)}, ss.Shared_Inputs())
+
+def _Slice(Result, Start, End):
+    return ss.SweepResult(None, Result.Years, Result.Emissions[Start:End], Result.Population[Start:End])
+
+class ScenarioAPI:
+    """
+    ASGI application of the scenario service. Its batcher is created on the first request, in the event loop serving it.
+
+    Attributes:
+        MaxBatch (int): Most scenarios evaluated in one batch.
+        MaxScenarios (int): Most scenarios accepted in one request.
+    """
+    def __init__(self, MaxBatch = 4096, MaxScenarios = 100000):
+        self.MaxBatch = MaxBatch
+        self.MaxScenarios = MaxScenarios
+        self.Batcher = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._Lifespan(receive, send)
+        elif scope['type'] == 'http':
+            try:
+                Body = await self._Read_Body(receive)
+                Status, Response = 200, await self.Handle(scope['method'], scope['path'], Body)
+            except RequestError as Error:
+                Status, Response = Error.Status, {'error': str(Error)}
+            except Exception:
+                _Logger.exception('Could not serve %s %s', scope['method'], scope['path'])
+                Status, Response = 500, {'error': 'Internal error'}
+            Content = json.dumps(Response, separators = (',', ':')).encode()
+            await send({'type': 'http.response.start', 'status': Status,
+                        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(Content)).encode())]})
+            await send({'type': 'http.response.body', 'body': Content})
+
+    async def _Lifespan(self, receive, send):
+        while True:
+            Message = await receive()
+            if Message['type'] == 'lifespan.startup':
+                await asyncio.get_running_loop().run_in_executor(None, ss.Shared_Inputs)        # Reads the data before the first request.
+                await send({'type': 'lifespan.startup.complete'})
+            elif Message['type'] == 'lifespan.shutdown':
+                if self.Batcher is not None:
+                    self.Batcher.Close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _Read_Body(self, receive):
+        Body, More = b'', True
+        while More:
+            Message = await receive()
+            Body += Message.get('body', b'')
+            More = Message.get('more_body', False)
+            if len(Body) > Max_Body:
+                raise RequestError('Request body is larger than {} bytes'.format(Max_Body), Status = 413)
+        return Body
+
+    async def Handle(self, Method, Path, Body):
+        """
+        Args:
+            Method (str): HTTP method.
+            Path (str): Path of the request.
+            Body (bytes): Body of the request.
+
+        Returns:
+            dict: Response, to be written as JSON.
+
+        Raises:
+            RequestError: If the request cannot be served.
+        """
+        Path = Path.rstrip('/') or '/'
+        if Method == 'GET' and Path == '/health':
+            Stats = {'batches': self.Batcher.Batches, 'scenarios': self.Batcher.Scenarios} if self.Batcher else {}
+            return {'status': 'ok', 'data_version': DataLoading.Data_Version(), **Stats}
+        if Method == 'GET' and Path == '/levers':
+            return {'defaults': Default_Levers, 'bounds': Lever_Bounds, 'outputs': list(Outputs), 'default_outputs': Default_Outputs}
+        if Path == '/scenarios':
+            if Method != 'POST':
+                raise RequestError('Scenarios are requested with POST', Status = 405)
+            return await self.Scenarios(Body)
+        raise RequestError('Not found: {} {}'.format(Method, Path), Status = 404)
+
+    async def Scenarios(self, Body):
+        """
+        Evaluates the scenarios of a request, together with those of any concurrent requests.
+
+        Args:
+            Body (bytes): JSON request, as described in the module documentation.
+
+        Returns:
+            dict: 'years' and 'outputs' of the scenarios, as lists of values for one scenario, or lists of these for a batch.
+        """
+        try:
+            Request = json.loads(Body or b'{}')
+        except ValueError:
+            raise RequestError('Request body is not valid JSON') from None
+        if not isinstance(Request, dict) or ('levers' in Request) == ('scenarios' in Request):
+            raise RequestError('Requests hold either "levers" for one scenario or "scenarios" for a batch')
+        Single = 'levers' in Request
+        Scenarios = [Request['levers']] if Single else Request['scenarios']
+        if not isinstance(Scenarios, list) or not 0 < len(Scenarios) <= self.MaxScenarios:
+            raise RequestError('"scenarios" must be a list of 1 to {} scenarios'.format(self.MaxScenarios))
+        Names = Request.get('outputs', Default_Outputs)
+        if not isinstance(Names, list) or set(Names) - set(Outputs):
+            raise RequestError('"outputs" must be a list of {}'.format(', '.join(Outputs)))
+        Decimals = Request.get('decimals')
+        if Decimals is not None and (isinstance(Decimals, bool) or not isinstance(Decimals, int)):
+            raise RequestError('"decimals" must be an integer')
+        Years = Request.get('years')
+        Positions = slice(None)
+        if Years is not None:
+            if not isinstance(Years, list) or not all(type(Year) is int and Year in CalculatorTime_Range for Year in Years):
+                raise RequestError('"years" must be a list of years from {} to {}'.format(CalculatorTime_Range[0], CalculatorTime_Range[-1]))
+            Positions = [CalculatorTime_Range.index(Year) for Year in Years]
+        Levers = Parse_Scenarios(Scenarios)
+
+        if self.Batcher is None:
+            self.Batcher = ScenarioBatcher(self.MaxBatch)
+        Result = await self.Batcher.Evaluate(Levers)
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            Values = {Name: Format_Output(Outputs[Name](Result)[:, Positions], Decimals) for Name in Names}
+        return {'years': Result.Years[Positions].tolist(),
+                'outputs': {Name: Value[0] if Single else Value for Name, Value in Values.items()}}
+
+App = ScenarioAPI()
+
+if __name__ == '__main__':
+    Parser = argparse.ArgumentParser(description = 'Serve emissions pathways of lever selections over HTTP.')
+    Parser.add_argument('--host', default = '127.0.0.1', help = 'Address on which the service listens.')
+    Parser.add_argument('--port', type = int, default = 8000, help = 'Port on which the service listens.')
+    Parser.add_argument('--max-batch', type = int, default = 4096, help = 'Most scenarios evaluated in one batch.')
+    Args = Parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise ImportError('Serving the scenario API requires uvicorn (pip install uvicorn)') from None
+    App.MaxBatch = Args.max_batch
+    uvicorn.run(App, host = Args.host, port = Args.port, log_level = 'warning')
@@ -0,0 +1,231 @@
+"""
+Batch scenario sweeps for the Chemical Engineering aviation calculator.
+Evaluates many lever selections in one pass, sharing the business-as-usual pathways and emission factors between scenarios.
+Created October 2024
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import DataLoading
+import GeneralisedFunctions as gf
+import ResultCache
+from CalculatorParameters import (CalculatorTime_Range, Default_Levers, Population_AmbLevels,
+                                  LH_Demand_AmbLevels, LH_Share_AmbLevels, SH_Demand_AmbLevels, SH_Share_AmbLevels,
+                                  Dom_Demand_AmbLevels, Dom_Share_AmbLevels)
+
+# Lever prefix -> (workbook sheet, emission factor shorthand, demand ambitions, class share ambitions)
+Hauls = {
+    'LH': ('LongHaul', 'lH', LH_Demand_AmbLevels, LH_Share_AmbLevels),
+    'SH': ('ShortHaul', 'sH', SH_Demand_AmbLevels, SH_Share_AmbLevels),
+    'DOM': ('Domestic', 'sH', Dom_Demand_AmbLevels, Dom_Share_AmbLevels),
+}
+Lever_Names = list(Default_Levers.keys())
+BaseYear = 2022
+
+@dataclass
+class SweepResult:
+    """
+    Results of a batch of scenarios.
+
+    Attributes:
+        Levers (dataframe): Lever selections, with one row per scenario and one column per lever.
+        Years (array): Years of the calculated pathways.
+        Emissions (array): Emissions of each haul in tCO2e, with shape (scenarios, hauls, years), hauls ordered as in Hauls.
+        Population (array): Total population, with shape (scenarios, years).
+        Details (dict, optional): Results by travel class of each haul, if requested. Keyed by haul, each holds the 
+                                  'Categories', and the 'Demand' (Psg km) and 'Emissions' (kgCO2e) arrays with shape
+                                  (scenarios, years, categories), as from Generalised_TravelModule.
+    """
+    Levers: pd.DataFrame
+    Years: np.ndarray
+    Emissions: np.ndarray
+    Population: np.ndarray
+    Details: dict = None
+
+    @property
+    def Total(self):
+        """
+        Returns:
+            array: Total emissions in tCO2e, with shape (scenarios, years).
+        """
+        return self.Emissions.sum(axis = 1)
+
+    @property
+    def Emissions_FTE(self):
+        """
+        Returns:
+            array: Total emissions per person in tCO2e/person, with shape (scenarios, years).
+        """
+        return self.Total / self.Population
+
+_Shares = ResultCache.Register('Haul_Shares', ResultCache.ModuleCache(MaxSize = 64))
+
+def _Check_Levers(Levers):
+    Unknown = set(Levers) - set(Lever_Names)
+    if Unknown:
+        raise ValueError('Unknown levers: {}'.format(', '.join(sorted(Unknown))))
+
+def Prepare_Inputs():
+    """
+    Carries out the calculations shared by every scenario: reading the data, and extracting the emission factors
+    of each haul and the population BaU pathways.
+
+    Returns:
+        dict: Shared inputs, to be passed to Evaluate_Scenarios.
+    """
+    Years = np.array(CalculatorTime_Range)
+    EmFactors = DataLoading.Load_EmissionFactor_Table()
+
+    Inputs = {'Version': DataLoading.Data_Version(), 'Years': Years, 'Hauls': {}}
+    for Haul, (Sheet, Shorthand, Demand_AmbLevels, Share_AmbLevels) in Hauls.items():
+        Data = DataLoading.Load_Sheet(Sheet)
+        Categories = [c for c in Data.columns if c != 'Year']
+        Inputs['Hauls'][Haul] = {'Data': Data, 'Categories': Categories,
+                                 'EmF': gf.Aviation_EmissionFactors(Categories, Shorthand, EmFactors, Years)}
+
+    Data, BaU_ROC = gf.CleanData(DataLoading.Load_Sheet('Population'))
+    Inputs['Population_Data'] = (Data, BaU_ROC)
+    Inputs['Population'] = {Category: gf.BaU_Pathways(Data, Category, BaU_ROC = BaU_ROC[Category]) for Category in Data.columns}
+    return Inputs
+
+@ResultCache.Memoise(MaxSize = 1)
+def Shared_Inputs():
+    """
+    Returns:
+        dict: Inputs from Prepare_Inputs for the current data, kept for reuse between calls.
+    """
+    return Prepare_Inputs()
+
+def _Haul_Shares(Haul, Leakage, Inputs):
+    """
+    Historical shares for the given haul after adjusting for the proportion of travel captured, kept for reuse as the 
+    arrays taken by gf.Travel_Kernel, i.e. (years, total demand, shares, categories).
+    """
+    Key = (Haul, Leakage, Inputs['Version'])
+    Found, Result = _Shares.Get(Key)
+    if not Found:
+        Data = Inputs['Hauls'][Haul]['Data']
+        Data_Adj = Data.drop(columns = 'Year') / (Leakage/100)
+        Data = pd.concat([Data['Year'], Data_Adj], axis = 1)
+        Data, BaU_ROC = gf.CleanData(Data)
+        Data_Shares = gf.Shares(Data)
+        Categories = [Category for Category in Data_Shares.columns if Category != 'Total']
+        Result = (Data_Shares.index.to_numpy(), Data_Shares['Total'].to_numpy(dtype = float),
+                  Data_Shares[Categories].to_numpy(dtype = float), Categories)
+        _Shares.Put(Key, Result)
+    return Result
+
+def Evaluate_Haul(Haul, Leakage, DemandLevers, ClassLevers, Inputs, Details = False):
+    """
+    Calculates the emissions of one haul for a batch of scenarios. Each distinct lever setting is only projected once.
+
+    Args:
+        Haul (str): Lever prefix of the haul, i.e. 'LH', 'SH' or 'DOM'.
+        Leakage (array): Percentage of travel captured in the data, for each scenario.
+        DemandLevers (array): Demand lever settings as rows of (Level, Speed, Start), with shape (scenarios, 3).
+        ClassLevers (array): Class lever settings as rows of (Level, Speed, Start), with shape (scenarios, 3).
+        Inputs (dict): Shared inputs from Prepare_Inputs.
+        Details (bool, optional): Whether the demand and emissions of each travel class are also returned. Defaults to False.
+
+    Returns:
+        array or dict: Emissions in kgCO2e, with shape (scenarios, years). With details, a dictionary of these 'Total' 
+        emissions, the 'Categories', and the 'Demand' and 'Emissions' of each category with shape (scenarios, years, categories).
+    """
+    Sheet, Shorthand, Demand_AmbLevels, Share_AmbLevels = Hauls[Haul]
+    HaulInputs = Inputs['Hauls'][Haul]
+    Emissions = np.empty((len(Leakage), len(Inputs['Years'])))
+    if Details:
+        Shape = (len(Leakage), len(Inputs['Years']), len(HaulInputs['Categories']))
+        ClassDemand, ClassEmissions = np.empty(Shape), np.empty(Shape)
+
+    for LeakageValue in np.unique(Leakage):
+        Rows = Leakage == LeakageValue
+        HistYears, Total, HistShares, Categories = _Haul_Shares(Haul, float(LeakageValue), Inputs)
+        UniqueDemand, DemandIdx = np.unique(DemandLevers[Rows], axis = 0, return_inverse = True)
+        UniqueClass, ClassIdx = np.unique(ClassLevers[Rows], axis = 0, return_inverse = True)
+
+        Demand, Shares = gf.Travel_Kernel(HistYears, Total, HistShares, Demand_AmbLevels, Share_AmbLevels, Categories,
+                                          UniqueDemand, UniqueClass, Inputs['Years'], BaseYear = BaseYear)
+        if Details:
+            ClassDemand[Rows] = Demand[DemandIdx.ravel(), :, None] * Shares[ClassIdx.ravel()]
+            ClassEmissions[Rows] = HaulInputs['EmF'] * ClassDemand[Rows]
+            Emissions[Rows] = np.nansum(ClassEmissions[Rows], axis = -1)
+        else:
+            EmF_PerDemand = np.nansum(Shares * HaulInputs['EmF'], axis = -1)     # Emissions per unit of demand, over all classes.
+            Emissions[Rows] = Demand[DemandIdx.ravel()] * EmF_PerDemand[ClassIdx.ravel()]
+
+    if Details:
+        return {'Total': Emissions, 'Categories': HaulInputs['Categories'], 'Demand': ClassDemand, 'Emissions': ClassEmissions}
+    return Emissions
+
+def Evaluate_Population(PopulationLevers, Inputs):
+    """
+    Calculates the total population for a batch of scenarios.
+
+    Args:
+        PopulationLevers (array): Population lever settings as rows of (Level, Speed, Start), with shape (scenarios, 3).
+        Inputs (dict): Shared inputs from Prepare_Inputs.
+
+    Returns:
+        array: Total population, with shape (scenarios, years).
+    """
+    UniqueLevers, LeverIdx = np.unique(PopulationLevers, axis = 0, return_inverse = True)
+    Population = [np.round(gf.Projections_Batch(BaUData, Category, Population_AmbLevels, UniqueLevers, Inputs['Years'], BaseYear = BaseYear), 0)
+                  for Category, BaUData in Inputs['Population'].items()]
+    return np.nansum(gf.Mask_NonFinite(Population), axis = 0)[LeverIdx.ravel()]      # As in Population_Module
+
+def Evaluate_Scenarios(Levers, Inputs = None, Details = False):
+    """
+    Calculates the emissions and population of a batch of scenarios.
+
+    Args:
+        Levers (dict): Lever selections keyed by lever name (as in Default_Levers), each an array with one value per scenario.
+                       Levers which are not given are kept at their default values.
+        Inputs (dict, optional): Shared inputs from Prepare_Inputs. Prepared from the current data if not given.
+        Details (bool, optional): Whether results by travel class are included. Defaults to False.
+
+    Returns:
+        SweepResult: Results of each scenario.
+    """
+    _Check_Levers(Levers)
+    if Inputs is None:
+        Inputs = Prepare_Inputs()
+
+    Length = max([np.size(v) for v in Levers.values()] + [1])
+    Table = pd.DataFrame({Name: np.broadcast_to(np.asarray(Levers.get(Name, Default_Levers[Name]), dtype = float), (Length,))
+                          for Name in Lever_Names})
+
+    Emissions, HaulDetails = [], {}
+    for Haul in Hauls:
+        HaulLevers = Table[[Haul + '_' + n for n in ['Leakage', 'Demand_Lever', 'Demand_Speed', 'Demand_Start',
+                                                       'Class_Lever', 'Class_Speed', 'Class_Start']]].to_numpy()
+        HaulEmissions = Evaluate_Haul(Haul, HaulLevers[:, 0], HaulLevers[:, 1:4], HaulLevers[:, 4:7], Inputs, Details = Details)
+        if Details:
+            HaulDetails[Haul] = HaulEmissions
+            HaulEmissions = HaulEmissions.pop('Total')
+        Emissions.append(HaulEmissions / 1000)      # Presented in tCO2e
+
+    Population = Evaluate_Population(Table[['Population_Change', 'Population_Speed', 'Population_Start']].to_numpy(), Inputs)
+    return SweepResult(Table, Inputs['Years'], np.stack(Emissions, axis = 1), Population, HaulDetails if Details else None)
+
+def Scenario_Sweep(Lever_Ranges, Inputs = None, Details = False):
+    """
+    Evaluates every combination (Cartesian product) of the given lever values.
+
+    Args:
+        Lever_Ranges (dict): Values to be swept, keyed by lever name (as in Default_Levers).
+                             Levers which are not given are kept at their default values.
+        Inputs (dict, optional): Shared inputs from Prepare_Inputs. Prepared from the current data if not given.
+        Details (bool, optional): Whether results by travel class are included. Defaults to False.
+
+    Returns:
+        SweepResult: Results of each scenario, in the order of the Cartesian product over Lever_Names.
+    """
+    _Check_Levers(Lever_Ranges)
+    Ranges = [np.atleast_1d(Lever_Ranges.get(Name, Default_Levers[Name])) for Name in Lever_Names]
+    Grid = np.meshgrid(*Ranges, indexing = 'ij')
+    Levers = {Name: Values.ravel() for Name, Values in zip(Lever_Names, Grid)}
+    return Evaluate_Scenarios(Levers, Inputs, Details = Details)
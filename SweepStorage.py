@@ -0,0 +1,161 @@
+"""
+Streaming storage of scenario sweep results for the Chemical Engineering aviation calculator.
+Each batch of results is written as its own Parquet file in a results directory, with one row per scenario and year.
+Results are read back lazily, filtered by lever values, without loading the whole sweep. Once a sweep has completed, only
+the chunks listed in its 'manifest.json' are read.
+Created October 2024
+"""
+
+import glob
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import ScenarioSweep as ss
+
+Haul_Totals = {'LH': 'Long Haul', 'SH': 'Short Haul', 'DOM': 'Domestic'}     # As in Sum_TravelEmissions
+
+def Result_Table(Result, ScenarioOffset = 0):
+    """
+    Flattens sweep results into a table with one row per scenario and year.
+    Columns are the 'Scenario' number, the lever values, the 'Year', the emissions of each haul and their 'Total' (tCO2e),
+    the 'Population' and, if included in the results, 'Demand.<Haul>.<Category>' (Psg km) and 'Emissions.<Haul>.<Category>' (kgCO2e).
+
+    Args:
+        Result (SweepResult): Results of a batch of scenarios.
+        ScenarioOffset (int, optional): Number of the first scenario of the batch. Defaults to 0.
+
+    Returns:
+        Table: Arrow table of the results.
+    """
+    Scenarios, Years = len(Result.Levers), len(Result.Years)
+    Columns = {'Scenario': np.repeat(np.arange(ScenarioOffset, ScenarioOffset + Scenarios), Years)}
+    for Name in Result.Levers.columns:
+        Columns[Name] = np.repeat(Result.Levers[Name].to_numpy(), Years)
+    Columns['Year'] = np.tile(Result.Years, Scenarios)
+
+    for i, Haul in enumerate(ss.Hauls):
+        Columns[Haul_Totals[Haul]] = Result.Emissions[:, i].ravel()
+    Columns['Total'] = Result.Total.ravel()
+    Columns['Population'] = Result.Population.ravel()
+
+    for Haul, HaulDetails in (Result.Details or {}).items():
+        for Measure in ['Demand', 'Emissions']:
+            for i, Category in enumerate(HaulDetails['Categories']):
+                Columns['{}.{}.{}'.format(Measure, Haul, Category)] = HaulDetails[Measure][:, :, i].ravel()
+    return pa.table(Columns)
+
+def Clear_Results(Directory):
+    """
+    Removes the results of an earlier sweep from a results directory, i.e. its manifest and chunks, leaving any other files.
+
+    Args:
+        Directory (str): Results directory.
+    """
+    for Path in [os.path.join(Directory, 'manifest.json')] + glob.glob(os.path.join(Directory, 'chunk-*.parquet*')):
+        if os.path.exists(Path):
+            os.remove(Path)
+
+def Result_Files(Directory):
+    """
+    Args:
+        Directory (str): Results directory.
+
+    Returns:
+        list: Paths to the chunks listed in the manifest of a completed sweep, or to every chunk of a sweep in progress.
+    """
+    try:
+        with open(os.path.join(Directory, 'manifest.json')) as f:
+            return [os.path.join(Directory, Chunk['File']) for Chunk in json.load(f)['Chunks']]
+    except FileNotFoundError:
+        return sorted(glob.glob(os.path.join(Directory, 'chunk-*.parquet')))
+
+class SweepWriter:
+    """
+    Writes batches of sweep results to a results directory as they are produced, so that they need not be held in memory.
+    Batches written by separate writers (e.g. from separate processes) should be given distinct chunk numbers.
+    Results of an earlier sweep in the directory should first be removed with Clear_Results.
+
+    Args:
+        Directory (str): Results directory.
+        FirstChunk (int, optional): Number of the first chunk written. Defaults to 0.
+    """
+    def __init__(self, Directory, FirstChunk = 0):
+        self.Directory = Directory
+        self.Chunk = FirstChunk
+        self.Scenarios = 0
+        os.makedirs(Directory, exist_ok = True)
+
+    def Write(self, Result, ScenarioOffset = None):
+        """
+        Args:
+            Result (SweepResult): Results of a batch of scenarios.
+            ScenarioOffset (int, optional): Number of the first scenario of the batch. Defaults to continuing from the last batch.
+
+        Returns:
+            str: Path to the written file.
+        """
+        if ScenarioOffset is None:
+            ScenarioOffset = self.Scenarios
+        Path = os.path.join(self.Directory, 'chunk-{:06d}.parquet'.format(self.Chunk))
+        TempPath = Path + '.tmp'
+        pq.write_table(Result_Table(Result, ScenarioOffset), TempPath, row_group_size = 64 * len(Result.Years))
+        os.replace(TempPath, Path)        # Readers never see partially written chunks.
+
+        self.Chunk += 1
+        self.Scenarios = ScenarioOffset + len(Result.Levers)
+        return Path
+
+def _Filter_Expression(Filters):
+    Expression = None
+    for Name, Values in Filters.items():
+        Values = np.atleast_1d(Values).tolist()
+        Condition = ds.field(Name).isin(Values)
+        Expression = Condition if Expression is None else Expression & Condition
+    return Expression
+
+def Iter_Results(Directory, Filters = None, Columns = None, BatchSize = 65536):
+    """
+    Lazily reads sweep results, only loading the rows matching the given lever values.
+    Chunks and row groups whose statistics exclude the filters are skipped without being read.
+
+    Args:
+        Directory (str): Results directory.
+        Filters (dict, optional): Accepted values of each filtered column, e.g. {'LH_Demand_Lever': [3, 4], 'Year': 2030}. Defaults to None.
+        Columns (list, optional): Columns to be read. Defaults to all columns.
+        BatchSize (int, optional): Maximum number of rows of each batch. Defaults to 65536.
+
+    Yields:
+        dataframe: Batches of matching results.
+    """
+    Files = Result_Files(Directory)
+    if not Files:
+        return
+    Dataset = ds.dataset(Files, format = 'parquet')
+    Expression = _Filter_Expression(Filters) if Filters else None
+    for Batch in Dataset.to_batches(columns = Columns, filter = Expression, batch_size = BatchSize):
+        if Batch.num_rows:
+            yield Batch.to_pandas()
+
+def Read_Results(Directory, Filters = None, Columns = None):
+    """
+    Reads the sweep results matching the given lever values.
+
+    Args:
+        Directory (str): Results directory.
+        Filters (dict, optional): Accepted values of each filtered column, e.g. {'LH_Demand_Lever': [3, 4], 'Year': 2030}. Defaults to None.
+        Columns (list, optional): Columns to be read. Defaults to all columns.
+
+    Returns:
+        dataframe: Matching results, with one row per scenario and year.
+    """
+    Files = Result_Files(Directory)
+    if not Files:
+        return pa.table({}).to_pandas()
+    Dataset = ds.dataset(Files, format = 'parquet')
+    Expression = _Filter_Expression(Filters) if Filters else None
+    return Dataset.to_table(columns = Columns, filter = Expression).to_pandas()
@@ -0,0 +1,197 @@
+"""
+Baseline results for the regression tests of the NZ calculator.
+Each file of the baseline directory holds the lever changes of a scenario, the JSON output of every calculation module
+and the emissions per person of the FTE figure, as produced by the original modules, which passed their results to each
+other as JSON. The JSON hand-off turned infinite values into nulls, which later modules skipped over in their sums.
+The original year-by-year projections and mode-by-mode travel emissions are also kept, as the reference for results of
+any other lever selection.
+Created October 2024
+"""
+
+import functools
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import DataLoading
+import GeneralisedFunctions as gf
+from CalculatorParameters import CalculatorTime_Range, Population_AmbLevels
+
+Baseline_Directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline')
+Scenarios = ['defaults', 'population_start', 'mixed']
+
+def Load(Scenario):
+    """
+    Args:
+        Scenario (str): Name of the scenario, one of Scenarios.
+
+    Returns:
+        (dict, dict, dict): Lever changes from the defaults, module outputs as dataframes keyed by name (as in
+        AviationModel.Run_Scenario), and emissions per person keyed by the bars of the FTE figure.
+    """
+    with open(os.path.join(Baseline_Directory, Scenario + '.json')) as f:
+        Baseline = json.load(f)
+    Outputs = {Name: pd.read_json(io.StringIO(json.dumps(Output)), orient = 'split') for Name, Output in Baseline['Outputs'].items()}
+    return Baseline['Levers'], Outputs, Baseline['Emissions_FTE']
+
+def Assert_Matches(Actual, Expected, Tolerance = 1e-9):
+    """
+    Checks module results against the baseline: the same years and categories, missing values in the same places,
+    no infinite values, and other values equal within the relative tolerance.
+
+    Args:
+        Actual (dataframe): Results, with years as the index.
+        Expected (dataframe): Baseline results.
+        Tolerance (float, optional): Accepted relative difference. Defaults to 1e-9.
+    """
+    assert list(Actual.columns) == list(Expected.columns)
+    assert list(Actual.index) == list(Expected.index)
+    Actual, Expected = Actual.to_numpy(dtype = float), Expected.to_numpy(dtype = float)
+    assert not np.isinf(Actual).any(), 'infinite values are shown as missing in the baseline'
+    np.testing.assert_array_equal(np.isnan(Actual), np.isnan(Expected))
+    np.testing.assert_allclose(Actual[~np.isnan(Actual)], Expected[~np.isnan(Expected)], rtol = Tolerance, atol = 1e-9)
+
+def Original_Projection(BaUData, Category, Ambition_Definitions, Level, AmbitionSpeed, AmbitionStart, Years, BaseYear = 2018,
+                        AmbitionsMode = 'Percentage'):
+    """
+    Projected pathway of one category, calculated year by year as by the original Projections.
+
+    Returns:
+        array: Projected values of each of the given years.
+    """
+    BaseYear_Value = BaUData[Category].loc[BaseYear]
+    AmbitionLevel_UB, AmbitionLevel_LB = gf.Determine_AmbitionLevelBounds(Level)
+    if AmbitionsMode == 'Percentage':
+        MappedAmbitionLevels = {k: v * BaseYear_Value for k, v in Ambition_Definitions.items()}
+    else:
+        MappedAmbitionLevels = Ambition_Definitions
+    if Level == 4:
+        Ambition_Value = MappedAmbitionLevels[Level]
+    else:
+        Ambition_Value = (AmbitionLevel_UB - Level) * MappedAmbitionLevels[AmbitionLevel_LB] + (Level - AmbitionLevel_LB) * MappedAmbitionLevels[AmbitionLevel_UB]
+
+    NewData = []
+    AmbStartValue = BaUData[Category].loc[AmbitionStart-1]
+    with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        for y in pd.Series(Years):
+            BaU = BaUData[Category].loc[y]
+            if y < AmbitionStart:
+                NewData.append(BaU)
+            elif y >= AmbitionStart + AmbitionSpeed:
+                NewData.append(Ambition_Value)
+            else:
+                if AmbStartValue == 0:
+                    Rate = 0
+                else:
+                    Rate = (Ambition_Value/AmbStartValue) ** (1/AmbitionSpeed) - 1
+                NewData.append(max(AmbStartValue * (1+Rate)**(y - AmbitionStart + 1), 0))
+    return np.array(NewData, dtype = float)
+
+@functools.lru_cache(maxsize = 1)
+def _Population_BaU():
+    Data, BaU_ROC = gf.CleanData(DataLoading.Load_Sheet('Population'))
+    return {Category: gf.BaU_Pathways(Data, Category, BaU_ROC = BaU_ROC[Category]) for Category in Data.columns}
+
+def Original_Population(PopulationLever, PopulationSpeed, PopulationStart):
+    """
+    Returns:
+        dataframe: Population of each category for the given levers, as calculated by the original Population_Module,
+                   with infinite values shown as missing, as after its JSON hand-off.
+    """
+    Population = pd.DataFrame({Category: Original_Projection(BaUData, Category, Population_AmbLevels, PopulationLever, PopulationSpeed,
+                                                             PopulationStart, CalculatorTime_Range, BaseYear = 2022)
+                               for Category, BaUData in _Population_BaU().items()}, index = pd.Index(CalculatorTime_Range, name = 'Year'))
+    return Population.round(0).replace([np.inf, -np.inf], np.nan)
+
+def Original_Map_ModeEngine(Mode, ActivityByMode, Activity_ModeEngine, EngineShare, AllModeEngines):
+    """
+    Splits the activity of one mode by engine type, as the original Map_ModeEngine.
+    """
+    if Mode in ['Car', 'Bus']:
+        Engines = ['E', 'H2', 'PHEV', 'IC']
+        ModeEngine = [Mode.lower() + m for m in Engines]
+        for m in ModeEngine:
+            Activity_ModeEngine[m] = ActivityByMode[Mode] * EngineShare[m][0]
+            AllModeEngines.append(m)
+    elif Mode in ['National Rail (Train)', 'Train']:
+        Engines = ['trnPE', 'trnPIC']
+        for m in Engines:
+            Activity_ModeEngine[m] = ActivityByMode[Mode] * EngineShare[m][0]
+            AllModeEngines.append(m)
+    else:
+        if Mode == 'Underground':
+            m = 'Udg'
+        elif Mode == 'Motorcycle':
+            m = 'MtrCyc'
+        elif Mode == 'Light Rail':
+            m = 'dlr'
+        else:
+            m = Mode
+        Activity_ModeEngine[m] = ActivityByMode[Mode]
+        AllModeEngines.append(m)
+
+def Original_TravelEmissions(AllModeEngines, Activity_ModeEngine, EmFactors, CalculatorTime_Range = list(range(2018, 2051))):
+    """
+    Emissions of each mode-engine, as the original Calc_TravelEmissions.
+    """
+    for mode in ['Bicycle', 'Walking', 'Other', 'carH2']:
+        if mode in AllModeEngines:
+            AllModeEngines.remove(mode)
+
+    ElectricFuels = ['Udg', 'busE', 'carE', 'trnPE', 'busPHEV', 'carPHEV', 'dlr']
+    H2Fuels = ['busH2', 'carH2']
+
+    AllEmissions = pd.DataFrame({'Year':CalculatorTime_Range})
+    AllEmissions.set_index('Year', inplace = True)
+    for m in AllModeEngines:
+        if m in ElectricFuels:
+            Fuel = '.fElc'
+        elif m == 'Taxi':
+            Fuel = ''
+        elif m in H2Fuels:
+            Fuel = '.fH2G'
+        elif m == 'Coach':
+            Fuel = '.fFsLP'
+        else:
+            Fuel = '.fFsLD'
+        AllEmissions[m] = Activity_ModeEngine[m] * EmFactors[m + Fuel]
+    return AllEmissions
+
+def Original_DemandShares(Data, Population, EmF, Demand_AmbLevels, Share_AmbLevels, PopulationMode,
+                          DemandLever = 1, DemandSpeed = 10, DemandStart = 2025, SharesLever = 1, SharesSpeed = 5, SharesStart = 2035,
+                          ShareofEngineTypes = None, CalculatorTime_Range = list(range(2018, 2051))):
+    """
+    Non-aviation travel emissions, calculated mode by mode as by the original Module_DemandShares, but taking dataframes
+    in place of their JSON representations.
+
+    Returns:
+        (dataframe, dataframe): Emissions of each mode-engine, and activity of each mode, with years as the index.
+    """
+    Data, BaU_ROC = gf.CleanData(Data)
+    Data_Shares = gf.Shares(Data)
+
+    BaU_Demand = gf.BaU_Pathways(Data_Shares, 'Total')
+    UnitDemand = Original_Projection(BaU_Demand, 'Total', Demand_AmbLevels, DemandLever, DemandSpeed, DemandStart, CalculatorTime_Range)
+    ProjectedDemand = pd.DataFrame({'Year':CalculatorTime_Range})
+    ProjectedDemand['Total'] = UnitDemand * sum(Population[R] for R in gf.PopulationCategories(PopulationMode))
+
+    Categories = list(Data_Shares.columns)
+    Categories.remove('Total')
+
+    ActivityByMode = pd.DataFrame({'Year':CalculatorTime_Range})
+    Activity_ModeEngine = pd.DataFrame({'Year':CalculatorTime_Range})
+    AllModeEngines = []
+    for Category in Categories:
+        BaUData = gf.BaU_Pathways(Data_Shares, Category)
+        Shares = Original_Projection(BaUData, Category, Share_AmbLevels[Category], SharesLever, SharesSpeed, SharesStart,
+                                     CalculatorTime_Range, AmbitionsMode = 'Absolute')
+        ActivityByMode[Category] = ProjectedDemand['Total'] * Shares
+        if Category != 'Aviation':
+            Original_Map_ModeEngine(Category, ActivityByMode, Activity_ModeEngine, ShareofEngineTypes, AllModeEngines)
+    Activity_ModeEngine.set_index('Year', inplace = True)
+    ActivityByMode.set_index('Year', inplace = True)
+
+    return Original_TravelEmissions(AllModeEngines, Activity_ModeEngine, EmF), ActivityByMode
@@ -0,0 +1,12 @@
+"""
+Test configuration for the NZ calculator: runs the tests against the modules of the repository, on the bundled data,
+without the persistent result store, so that every test recalculates its results.
+Created October 2024
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['CE_RESULT_STORE'] = 'off'
+os.environ['CE_DATA_SOURCE'] = 'local'
@@ -0,0 +1,53 @@
+"""
+Regression tests of the calculation modules against the results of the original JSON-passing modules.
+Created October 2024
+"""
+
+import numpy as np
+import plotly.io as pio
+import pytest
+
+import AviationModel as Model
+import Baseline
+import Figures as fg
+import Graph_Themes
+from CalculatorParameters import Default_Levers, Population_AmbLevels
+
+pio.templates.default = 'NZ_Calc'
+
+def Population_Levers(Levers):
+    Levers = dict(Default_Levers, **Levers)
+    return [Levers['Population_' + n] for n in ['Change', 'Speed', 'Start']]
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Population_Module(Scenario):
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Baseline.Assert_Matches(Model.Population_Module(Population_AmbLevels, *Population_Levers(Levers)).to_frame(), Outputs['Population'])
+
+def Random_Levers(Count, Seed):
+    Generator = np.random.default_rng(Seed)
+    return list(zip(Generator.choice(np.arange(1, 4.25, 0.25), Count), Generator.integers(1, 41, Count), Generator.integers(2024, 2051, Count)))
+
+@pytest.mark.parametrize('Levers', [(3, 16, 2032), (3, 6, 2033)] + Random_Levers(60, 0))
+def test_Population_Module_Matches_Original(Levers):
+    # Identical to the year-by-year calculation, so that no rounded population differs by one person.
+    Population = Model.Population_Module(Population_AmbLevels, *Levers).to_frame()
+    Expected = Baseline.Original_Population(*Levers)
+    assert list(Population.columns) == list(Expected.columns) and list(Population.index) == list(Expected.index)
+    np.testing.assert_array_equal(Population.to_numpy(), Expected.to_numpy())
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Figure_FTE_Emissions(Scenario):
+    # Population categories with infinite projections (PT-PGT) must be left out of the total population.
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Results = Model.Run_Scenario(Levers)
+    Figure = fg.Figure_FTE_Emissions(Results['Total_Emissions'], Results['Population'])
+    np.testing.assert_allclose(list(Figure.data[0].y), list(FTE.values()), rtol = 1e-9)
+    assert list(Figure.data[0].x) == list(FTE)
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Run_Scenario(Scenario):
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Results = Model.Run_Scenario(Levers)
+    for Name, Expected in Outputs.items():
+        Baseline.Assert_Matches(Results[Name].to_frame(), Expected)
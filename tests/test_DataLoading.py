@@ -0,0 +1,50 @@
+"""
+Tests of the cached data layer and its snapshots.
+Created October 2024
+"""
+
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import DataLoading
+
+@pytest.fixture
+def Snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(DataLoading, 'Snapshot_Directory', str(tmp_path / 'snapshots'))
+    yield tmp_path
+    DataLoading.Clear_Cache()
+
+def test_Workbooks_With_The_Same_Name(Snapshots):
+    Bundled = os.path.join(DataLoading.Data_Directory, DataLoading.Workbook_File)
+    First, Second = Snapshots / 'first', Snapshots / 'second'
+    First.mkdir()
+    Second.mkdir()
+    shutil.copy(Bundled, First / 'Department.xlsx')
+    Sheets = pd.read_excel(Bundled, sheet_name = DataLoading.Workbook_Sheets)
+    Sheets['Population'].loc[0, 'UG'] = 12345
+    with pd.ExcelWriter(Second / 'Department.xlsx') as Writer:
+        for Name, Sheet in Sheets.items():
+            Sheet.to_excel(Writer, sheet_name = Name, index = False)
+
+    for Read in range(2):       # Parsed from the workbooks, then from their snapshots.
+        DataLoading.Clear_Cache()
+        assert DataLoading.Read_Workbook(str(First / 'Department.xlsx'))['Population'].loc[0, 'UG'] != 12345
+        assert DataLoading.Read_Workbook(str(Second / 'Department.xlsx'))['Population'].loc[0, 'UG'] == 12345
+    assert len(os.listdir(Snapshots / 'snapshots')) == 2
+
+def test_Workbook_With_Text_Is_Not_Snapshotted(Snapshots, caplog):
+    Sheets = pd.read_excel(os.path.join(DataLoading.Data_Directory, DataLoading.Workbook_File), sheet_name = DataLoading.Workbook_Sheets)
+    Sheets['Population']['UG'] = Sheets['Population']['UG'].astype(object)
+    Sheets['Population'].loc[0, 'UG'] = 'unknown'
+    with pd.ExcelWriter(Snapshots / 'Department.xlsx') as Writer:
+        for Name, Sheet in Sheets.items():
+            Sheet.to_excel(Writer, sheet_name = Name, index = False)
+
+    for Read in range(2):       # Parsed from the workbook both times, as no snapshot could be written.
+        DataLoading.Clear_Cache()
+        assert DataLoading.Read_Workbook(str(Snapshots / 'Department.xlsx'))['Population'].loc[0, 'UG'] == 'unknown'
+    assert not os.path.exists(Snapshots / 'snapshots')
+    assert 'Could not write the snapshot' in caplog.text
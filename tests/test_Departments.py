@@ -0,0 +1,43 @@
+"""
+Tests of the multi-department calculations against the baseline results of a single workbook.
+Created October 2024
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Baseline
+import DataLoading
+import Departments
+
+@pytest.fixture(scope = 'module')
+def Inputs(tmp_path_factory):
+    Directory = tmp_path_factory.mktemp('departments')
+    for Department in ['Chemistry', 'Physics']:
+        shutil.copy(os.path.join(DataLoading.Data_Directory, DataLoading.Workbook_File), Directory / (Department + '.xlsx'))
+    with pytest.MonkeyPatch.context() as Patch:
+        Patch.setattr(DataLoading, 'Snapshot_Directory', str(Directory / 'snapshots'))
+        Tables = Departments.Load_Departments(Departments.Find_Workbooks(str(Directory)))
+        yield Departments.Prepare_Departments(Tables)
+    DataLoading.Clear_Cache()
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Departments_Baseline(Inputs, Scenario):
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Result = Departments.Evaluate_Departments(Inputs, Levers)
+    for d in range(len(Result.Departments)):
+        Baseline.Assert_Matches(pd.DataFrame(Result.Population[d], index = Result.Years, columns = Result.Population_Categories),
+                                Outputs['Population'])
+        for Haul in Departments.Hauls:
+            Baseline.Assert_Matches(pd.DataFrame(Result.Demand[Haul][d], index = Result.Years, columns = Result.Categories[Haul]),
+                                    Outputs[Haul + '_Demand'])
+
+    Institution = Result.Institution()
+    Population = Outputs['Population'].sum(axis = 1, min_count = 1)
+    np.testing.assert_allclose(Institution.loc[Population.index, 'Population'], 2 * Population, rtol = 1e-12)
+    np.testing.assert_allclose(Institution.loc[[2022, 2026], 'Emissions_FTE'],
+                               [FTE['Baseline (2022)'], FTE['Current Selection (2026)']], rtol = 1e-9)
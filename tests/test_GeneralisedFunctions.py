@@ -0,0 +1,70 @@
+"""
+Tests of the vectorised projections and travel emissions against the year-by-year and mode-by-mode calculations they replaced.
+Created October 2024
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import Baseline
+import GeneralisedFunctions as gf
+
+Years = list(range(2019, 2051))
+Ambition_Definitions = {1: 1, 2: 0.8, 3: 0.6, 4: 0.3}
+
+@pytest.fixture(scope = 'module')
+def BaUData():
+    Data = pd.DataFrame({'Growing': 100 * 1.05 ** np.arange(6), 'Empty': [0, 0, 0, 0, 0, 0.0]}, index = pd.Index(range(2018, 2024), name = 'Year'))
+    return pd.concat([gf.BaU_Pathways(Data, Category, BaU_ROC = ROC) for Category, ROC in [('Growing', 0.02), ('Empty', None)]], axis = 1)
+
+@pytest.mark.parametrize('Category', ['Growing', 'Empty'])
+def test_Projections_Batch(BaUData, Category):
+    Generator = np.random.default_rng(1)
+    Random = np.column_stack([Generator.uniform(1, 4, 100), Generator.integers(1, 41, 100), Generator.integers(2020, 2051, 100)])
+    Levers = np.concatenate([np.array(list(itertools.product([1, 1.5, 2.25, 3, 4], [1, 3, 10, 16], [2020, 2024, 2035])), dtype = float), Random])
+    Batch = gf.Projections_Batch(BaUData, Category, Ambition_Definitions, Levers, Years)
+    assert Batch.shape == (len(Levers), len(Years))
+    for Lever, Pathway in zip(Levers, Batch):
+        Expected = Baseline.Original_Projection(BaUData, Category, Ambition_Definitions, Lever[0], Lever[1], int(Lever[2]), Years)
+        np.testing.assert_array_equal(Pathway, Expected)
+        np.testing.assert_array_equal(Pathway, gf.Projections_Batch(BaUData, Category, Ambition_Definitions, Lever, Years))
+
+def test_Projections_Array_Of_Pathways(BaUData):
+    BaU = np.stack([BaUData['Growing'].to_numpy(), 2 * BaUData['Growing'].to_numpy()])
+    Pathways = gf.Projections_Array(BaU, BaUData.index.to_numpy(), Ambition_Definitions, (2.5, 4, 2026), Years)
+    Expected = gf.Projections_Batch(BaUData, 'Growing', Ambition_Definitions, (2.5, 4, 2026), Years)
+    np.testing.assert_array_equal(Pathways, [Expected, 2 * Expected])
+
+@pytest.fixture(scope = 'module')
+def TravelInputs():
+    # Ferry has no entry in the engine table, Bicycle and Walking have no emissions, and both trains share their engines.
+    Modes = ['Car', 'Bus', 'National Rail (Train)', 'Train', 'Underground', 'Light Rail', 'Coach', 'Taxi', 'Motorcycle', 'Ferry', 'Bicycle', 'Walking']
+    Generator = np.random.default_rng(2)
+    Data = pd.DataFrame({'Year': range(2018, 2024), **{Mode: Generator.uniform(100, 1000, 6) for Mode in Modes}})
+    Data['Taxi'] = Data['Taxi'].astype(object)
+    Data.loc[2, 'Taxi'] = '-'
+    Share_AmbLevels = {Mode: {Level: Generator.uniform(0, 0.2) for Level in range(1, 5)} for Mode in Modes}
+    Staff = pd.DataFrame({Category: Generator.uniform(1000, 2000, 33) for Category in gf.PopulationCategories('Staff')})
+    EmF = pd.DataFrame({Name: Generator.uniform(0, 1, 33) for Name in ['carIC.fFsLD', 'carPHEV.fElc', 'carE.fElc', 'Taxi', 'MtrCyc.fFsLD',
+                                                                     'trnPE.fElc', 'trnPIC.fFsLD', 'Udg.fElc', 'dlr.fElc', 'busE.fElc',
+                                                                     'busH2.fH2G', 'busPHEV.fElc', 'busIC.fFsLD', 'Coach.fFsLP', 'Ferry.fFsLD']},
+                       index = pd.Index(range(2018, 2051), name = 'Year'))
+    EngineShare = pd.DataFrame({Name: [Generator.uniform(0, 1)] for Name in ['carE', 'carH2', 'carPHEV', 'carIC', 'busE', 'busH2', 'busPHEV',
+                                                                             'busIC', 'trnPE', 'trnPIC']})
+    return Data, Staff, EmF, {1: 1.1, 2: 0.9, 3: 0.7, 4: 0.6}, Share_AmbLevels, EngineShare
+
+@pytest.mark.parametrize('Levers', [(1, 10, 2025, 1, 5, 2035), (2.5, 4, 2026, 3.5, 8, 2030), (4, 1, 2024, 1.75, 20, 2040), (1.5, 16, 2032, 4, 3, 2049)])
+def test_Module_DemandShares_Matches_Original(TravelInputs, Levers):
+    Data, Staff, EmF, Demand_AmbLevels, Share_AmbLevels, EngineShare = TravelInputs
+    Levers = dict(zip(['DemandLever', 'DemandSpeed', 'DemandStart', 'SharesLever', 'SharesSpeed', 'SharesStart'], Levers))
+    Emissions, Activity = gf.Module_DemandShares(Data.copy(), Staff, EmF, Demand_AmbLevels, Share_AmbLevels, 'Staff', **Levers,
+                                                 ShareofEngineTypes = EngineShare, OutputDemand = True, Details = True)
+    Expected_Emissions, Expected_Activity = Baseline.Original_DemandShares(Data.copy(), Staff, EmF, Demand_AmbLevels, Share_AmbLevels, 'Staff',
+                                                                           **Levers, ShareofEngineTypes = EngineShare)
+    for Actual, Expected in [(Emissions, Expected_Emissions), (Activity, Expected_Activity)]:
+        assert list(Actual.columns) == list(Expected.columns) and list(Actual.index) == list(Expected.index)
+        np.testing.assert_array_equal(Actual.to_numpy(dtype = float), Expected.to_numpy(dtype = float))
+    assert 'Ferry' in Emissions.columns and not {'Bicycle', 'Walking', 'carH2'} & set(Emissions.columns)
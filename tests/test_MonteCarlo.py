@@ -0,0 +1,18 @@
+"""
+Tests of the Monte Carlo propagation of uncertain inputs.
+Created October 2024
+"""
+
+import numpy as np
+import pytest
+
+import MonteCarlo
+import ScenarioSweep as ss
+
+@pytest.mark.parametrize('Levers', [(1, 2, 2024), (1.5, 3, 2026), (2, 7, 2030)])
+def test_Population_Samples_Match_Sweep(Levers):
+    Inputs = ss.Shared_Inputs()
+    Samples = MonteCarlo.Population_Samples(np.array([1, 0.8, 1.2]), Levers, Inputs)
+    assert np.isfinite(Samples).all()
+    Expected = ss.Evaluate_Scenarios(dict(zip(['Population_Change', 'Population_Speed', 'Population_Start'], Levers)), Inputs)
+    np.testing.assert_allclose(Samples[0], Expected.Population[0], rtol = 1e-12)
@@ -0,0 +1,59 @@
+"""
+Tests of the target-seeking optimiser against a brute-force search of a small lever grid.
+Created October 2024
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+import GeneralisedFunctions as gf
+import Optimiser
+import ScenarioSweep as ss
+from CalculatorParameters import Default_Levers
+
+Options = {'Lever': [1, 2, 4], 'Speed': [1, 5], 'Start': [2024, 2026]}
+Fixed = {Name: Value for Name, Value in Default_Levers.items() if Name.endswith('_Leakage') or '_Class_' in Name}
+Population = {'Population_Change': 2.5, 'Population_Speed': 3, 'Population_Start': 2025}
+
+def Brute_Force(Cut, Measure, Inputs, Fixed, Selected = None, TargetYear = 2026):
+    """
+    Least effort of every lever selection of the grid meeting the target, or inf if none does. Selected levers are costed
+    by their distance from the selected value.
+    """
+    Lever_Options = {Name: [Fixed[Name]] if Name in Fixed
+                     else Options['Lever' if Name.endswith(('_Lever', '_Change')) else Name.rsplit('_', 1)[-1]]
+                     for Name in ss.Lever_Names}
+    Grid = np.array(list(itertools.product(*Lever_Options.values())), dtype = float)
+    Result = ss.Evaluate_Scenarios(dict(zip(ss.Lever_Names, Grid.T)), Inputs)
+    Values = getattr(Result, Measure)[:, gf.Year_Positions(Result.Years, [TargetYear])[0]]
+    Baseline = getattr(ss.Evaluate_Scenarios(dict(Fixed, **(Selected or {})), Inputs), Measure)[0, gf.Year_Positions(Result.Years, [ss.BaseYear])[0]]
+    Effort = Optimiser.Lever_Effort(ss.Lever_Names, Grid, Optimiser.Default_Weights, Lever_Options, Selected)
+    Feasible = Values <= (1 - Cut) * Baseline
+    return Effort[Feasible].min() if Feasible.any() else np.inf
+
+@pytest.mark.parametrize('Hold_Population', [True, False])
+@pytest.mark.parametrize('Measure', ['Emissions_FTE', 'Total'])
+@pytest.mark.parametrize('Cut', [-0.5, 0.1, 0.25, 0.3, 0.9])
+def test_Optimise_Matches_Brute_Force(Measure, Cut, Hold_Population):
+    Inputs = ss.Shared_Inputs()
+    Result = Optimiser.Optimise(Cut = Cut, Measure = Measure, Fixed = dict(Fixed, **Population), Options = Options, Inputs = Inputs,
+                                Hold_Population = Hold_Population)
+    if Hold_Population:
+        Expected = Brute_Force(Cut, Measure, Inputs, dict(Fixed, **Population))
+    else:
+        Expected = Brute_Force(Cut, Measure, Inputs, Fixed, Population)
+    if np.isinf(Expected):
+        assert Result.Levers is None
+    else:
+        assert Result.Effort == pytest.approx(Expected, abs = 1e-9)
+        assert Result.Achieved <= Result.Target * (1 + 1e-12)
+
+def test_Population_Held_At_Selection():
+    # Faster population growth lowers the emissions per person, but is not an action for meeting the target.
+    Inputs = ss.Shared_Inputs()
+    Result = Optimiser.Optimise(Cut = 0.25, Fixed = Population, Options = Options, Inputs = Inputs)
+    assert {Name: Result.Levers[Name] for Name in Population} == Population
+    Result = Optimiser.Optimise(Cut = 0.25, Options = Options, Inputs = Inputs)
+    assert all(Result.Levers[Name] == Default_Levers[Name] for Name in Population)
@@ -0,0 +1,52 @@
+"""
+Tests of the opt-in profiling, which must time the calculations without changing their results.
+Created October 2024
+"""
+
+import json
+import threading
+
+import pytest
+
+import AviationModel as Model
+import Baseline
+import DataLoading
+import GeneralisedFunctions as gf
+import Profiling
+import ResultCache
+
+@pytest.fixture
+def Instrumented():
+    Profiling.Instrument(gf)
+    Profiling.Instrument(DataLoading)
+    ResultCache.Clear_All()
+    yield
+    Profiling.Stop()
+    Profiling.Restore(gf)
+    Profiling.Restore(DataLoading)
+    ResultCache.Clear_All()
+
+def test_Profiled_Run_Matches_Baseline(Instrumented):
+    Levers, Outputs, FTE = Baseline.Load('mixed')
+    Profiling.Start()
+    Results = Model.Run_Scenario(Levers)
+    Recording = Profiling.Stop()
+    for Name, Expected in Outputs.items():
+        Baseline.Assert_Matches(Results[Name].to_frame(), Expected)
+
+    Summary = Recording.Summary()
+    assert Summary['GeneralisedFunctions.Travel_Kernel']['Calls'] == 3
+    assert Summary['Run']['Calls'] == 1
+    Trace = json.loads(Recording.to_chrome_trace())['traceEvents']
+    assert sum(Event['ph'] == 'X' for Event in Trace) == len(Recording.Events)
+    assert json.loads(Recording.to_json())['Summary'].keys() == Summary.keys()
+
+def test_Recordings_Belong_To_Their_Thread(Instrumented):
+    Recording = Profiling.Start()
+    Other = threading.Thread(target = gf.Year_Positions, args = ([2018, 2019], [2019]))
+    Other.start()
+    Other.join()
+    gf.Year_Positions([2018, 2019], [2018])
+    assert Profiling.Stop() is Recording
+    assert Recording.Summary()['GeneralisedFunctions.Year_Positions']['Calls'] == 1
+    assert Profiling.Current() is None
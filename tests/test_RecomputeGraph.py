@@ -0,0 +1,36 @@
+"""
+Tests of the incremental recomputation of the app pipeline.
+Created October 2024
+"""
+
+import pytest
+
+import AviationModel as Model
+import RecomputeGraph
+from CalculatorParameters import LH_Demand_AmbLevels, LH_Share_AmbLevels
+
+def test_Memoised_Results_Keep_Dependents():
+    Calls = []
+    EmF = Model.Travel_EmissionFactors()
+    Graph = RecomputeGraph.RecomputeGraph()
+    # The label is read by the node, but does not change the module result.
+    Graph.Add('LH_Data', lambda Lever, Label: Model.Generalised_TravelModule('LongHaul', LH_Demand_AmbLevels, LH_Share_AmbLevels,
+                                                                           Lever, 2, 2024, 1, 2, 2024, EmF, 70), ['Lever', 'Label'])
+    Graph.Add('Total', lambda LH: Calls.append(LH) or LH['Emissions'].Values.sum(), ['LH_Data'])
+
+    State = {}
+    Graph.Evaluate({'Lever': 2, 'Label': 'a'}, State)
+    Graph.Evaluate({'Lever': 2, 'Label': 'b'}, State)
+    assert State['Recomputed'] == ['LH_Data']
+    assert len(Calls) == 1
+
+    Graph.Evaluate({'Lever': 3, 'Label': 'b'}, State)
+    assert State['Recomputed'] == ['LH_Data', 'Total']
+
+def test_Memoised_Dictionaries_Are_Read_Only():
+    EmF = Model.Travel_EmissionFactors()
+    Arguments = ('LongHaul', LH_Demand_AmbLevels, LH_Share_AmbLevels, 1, 2, 2024, 1, 2, 2024, EmF, 70)
+    Result = Model.Generalised_TravelModule(*Arguments)
+    assert Model.Generalised_TravelModule(*Arguments) is Result
+    with pytest.raises(TypeError):
+        Result['Demand'] = None
@@ -0,0 +1,89 @@
+"""
+Tests of loading the calculator inputs from the remote repository, against a local HTTP stand-in.
+Created October 2024
+"""
+
+import hashlib
+import http.server
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import DataLoading
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the bundled data files with an ETag, slowly, recording each request and whether the remote lock was free.
+    """
+    Requests = []
+
+    def log_message(self, *Args):
+        pass
+
+    def do_GET(self):
+        Free = DataLoading._Remote_Lock.acquire(timeout = 1)
+        if Free:
+            DataLoading._Remote_Lock.release()
+        time.sleep(0.2)
+        Path = os.path.join(DataLoading.Data_Directory, self.path.lstrip('/'))
+        if not os.path.exists(Path):
+            self.Requests.append((self.path, 404, Free))
+            self.send_error(404)
+            return
+        with open(Path, 'rb') as f:
+            Content = f.read()
+        ETag = '"{}"'.format(hashlib.sha256(Content).hexdigest())
+        Status = 304 if self.headers.get('If-None-Match') == ETag else 200
+        self.Requests.append((self.path, Status, Free))
+        self.send_response(Status)
+        self.send_header('ETag', ETag)
+        self.send_header('Content-Length', '0' if Status == 304 else str(len(Content)))
+        self.end_headers()
+        if Status == 200:
+            self.wfile.write(Content)
+
+@pytest.fixture(scope = 'module')
+def Server():
+    Server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target = Server.serve_forever, daemon = True).start()
+    yield 'http://127.0.0.1:{}/'.format(Server.server_address[1])
+    Server.shutdown()
+
+@pytest.fixture
+def Remote(Server, tmp_path, monkeypatch):
+    monkeypatch.setattr(DataLoading, 'Data_Source', 'remote')
+    monkeypatch.setattr(DataLoading, 'Remote_URL', Server)
+    monkeypatch.setattr(DataLoading, 'Download_Directory', str(tmp_path / 'remote'))
+    monkeypatch.setattr(DataLoading, 'Snapshot_Directory', str(tmp_path / 'snapshots'))
+    _Handler.Requests.clear()
+    DataLoading.Clear_Cache()
+    yield tmp_path
+    DataLoading.Clear_Cache()
+
+def test_Remote_Loading(Remote):
+    Bundled = pd.read_excel(os.path.join(DataLoading.Data_Directory, DataLoading.Workbook_File), sheet_name = 'Population')
+    pd.testing.assert_frame_equal(DataLoading.Load_Sheet('Population'), Bundled)
+    assert DataLoading.Resolve_Source(DataLoading.Workbook_File) == str(Remote / 'remote' / DataLoading.Workbook_File)
+    assert sorted(Status for Path, Status, Free in _Handler.Requests) == [200, 200]
+
+def test_Concurrent_Callers_Share_One_Fetch(Remote):
+    Files = [DataLoading.Workbook_File, DataLoading.EmissionFactors_File] * 4
+    with ThreadPoolExecutor(max_workers = len(Files)) as Executor:
+        Paths = list(Executor.map(DataLoading.Resolve_Source, Files))
+    assert Paths == [str(Remote / 'remote' / File) for File in Files]
+    assert len(_Handler.Requests) == 2
+    assert all(Free for Path, Status, Free in _Handler.Requests), 'the remote lock is held during the download'
+
+def test_Unchanged_Files_Are_Revalidated(Remote, monkeypatch):
+    DataLoading.Resolve_Source(DataLoading.Workbook_File)
+    monkeypatch.setattr(DataLoading, 'Revalidate_Seconds', 0)
+    DataLoading.Resolve_Source(DataLoading.Workbook_File)
+    assert sorted(Status for Path, Status, Free in _Handler.Requests) == [200, 200, 304, 304]
+
+def test_Missing_Files_Fall_Back_To_Bundled_Copies(Remote, monkeypatch):
+    monkeypatch.setattr(DataLoading, 'Remote_URL', DataLoading.Remote_URL + 'missing/')
+    assert DataLoading.Resolve_Source(DataLoading.Workbook_File) == os.path.join(DataLoading.Data_Directory, DataLoading.Workbook_File)
@@ -0,0 +1,48 @@
+"""
+Tests of the persistent result store.
+Created October 2024
+"""
+
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+import AviationModel as Model
+import ResultCache
+import ResultStore
+from CalculatorParameters import Population_AmbLevels
+
+@pytest.fixture
+def Store(tmp_path):
+    Store = ResultStore.ResultStore(str(tmp_path / 'results.sqlite'))
+    ResultStore.Use_Store(Store)
+    ResultCache.Clear_All()
+    yield Store
+    ResultStore.Use_Store(None)
+    ResultCache.Clear_All()
+
+def test_Stored_Results_Are_Reused(Store):
+    Calculated = Model.Run_Scenario({'Population_Start': 2030, 'LH_Demand_Lever': 3})
+    ResultCache.Clear_All()         # As after a restart.
+    Stored = Model.Run_Scenario({'Population_Start': 2030, 'LH_Demand_Lever': 3})
+    assert Store.Hits == 6
+    for Name in ['Population', 'LH_Emissions', 'Total_Emissions', 'Total_Demand']:
+        assert Stored[Name].Fingerprint == Calculated[Name].Fingerprint
+
+def test_Ambition_Definitions_Are_Keyed(Store):
+    Default = Model.Population_Module(Population_AmbLevels, 2, 2, 2024)
+    Changed = Model.Population_Module({**Population_AmbLevels, 2: 1.3}, 2, 2, 2024)
+    assert Store.Hits == 0 and Store.Misses == 2
+    assert not np.allclose(np.nan_to_num(Default.Values), np.nan_to_num(Changed.Values))
+
+def test_Code_Version_Follows_Imports(tmp_path, monkeypatch):
+    (tmp_path / 'Store_Constants.py').write_text('Factor = 1000\n')
+    (tmp_path / 'Store_Module.py').write_text('import Store_Constants\n\ndef Module(x):\n    return x * Store_Constants.Factor\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    Version = ResultStore.Code_Version(importlib.import_module('Store_Module').Module)
+
+    (tmp_path / 'Store_Constants.py').write_text('Factor = 1\n')
+    ResultStore._Code_Versions.clear()
+    assert ResultStore.Code_Version(sys.modules['Store_Module'].Module) != Version
@@ -0,0 +1,72 @@
+"""
+Tests of the scenario service, called as an ASGI application.
+Created October 2024
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import Baseline
+import ScenarioAPI
+
+def Request(Method, Path, Body = None):
+    """
+    Returns:
+        (int, dict): Status and JSON response of a request to a new instance of the service.
+    """
+    async def Call():
+        App = ScenarioAPI.ScenarioAPI()
+        Messages = [{'type': 'http.request', 'body': json.dumps(Body).encode() if Body is not None else b'', 'more_body': False}]
+        Sent = []
+        async def Receive():
+            return Messages.pop(0)
+        async def Send(Message):
+            Sent.append(Message)
+        await App({'type': 'http', 'method': Method, 'path': Path}, Receive, Send)
+        if App.Batcher is not None:
+            App.Batcher.Close()
+        return Sent[0]['status'], json.loads(Sent[1]['body'])
+    return asyncio.run(Call())
+
+def test_Service_Does_Not_Import_Analyses():
+    Loaded = subprocess.run([sys.executable, '-c', 'import sys, ScenarioAPI; print(sorted({"Sensitivity", "MonteCarlo"} & set(sys.modules)))'],
+                            cwd = os.path.dirname(os.path.abspath(ScenarioAPI.__file__)), capture_output = True, text = True, check = True)
+    assert Loaded.stdout.strip() == '[]'
+
+@pytest.mark.parametrize('Levers', [{'LH_Demand_Start': 2030.5}, {'Population_Speed': 2.5}, {'SH_Class_Start': 2051},
+                                    {'DOM_Demand_Lever': '2'}])
+def test_Invalid_Levers_Are_Rejected(Levers):
+    Status, Response = Request('POST', '/scenarios', {'levers': Levers})
+    assert Status == 400
+    assert list(Levers)[0] in Response['error'] or 'numbers' in Response['error']
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Scenarios_Match_Baseline(Scenario):
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Levers = {Name: float(Value) for Name, Value in Levers.items()}         # Whole numbers of years may be sent as floats.
+    Status, Response = Request('POST', '/scenarios', {'levers': Levers, 'outputs': ['Emissions_FTE', 'Population'], 'years': [2022, 2026]})
+    assert Status == 200
+    np.testing.assert_allclose(Response['outputs']['Emissions_FTE'], [FTE['Baseline (2022)'], FTE['Current Selection (2026)']], rtol = 1e-9)
+    np.testing.assert_allclose(Response['outputs']['Population'], Outputs['Population'].sum(axis = 1).loc[[2022, 2026]], rtol = 1e-12)
+
+@pytest.mark.parametrize('Years', [[2018], [2030, 2051], [2030.0], 2030])
+def test_Invalid_Years_Are_Rejected_Before_Evaluation(Years, monkeypatch):
+    def Evaluate(Levers):
+        raise AssertionError('invalid requests are not evaluated')
+    monkeypatch.setattr(ScenarioAPI, '_Evaluate', Evaluate)
+    Status, Response = Request('POST', '/scenarios', {'levers': {}, 'years': Years})
+    assert Status == 400 and '"years"' in Response['error']
+
+def test_Internal_Errors_Are_Logged_Not_Returned(monkeypatch, caplog):
+    def Fail(Levers):
+        raise RuntimeError('details of /root/package')
+    monkeypatch.setattr(ScenarioAPI, '_Evaluate', Fail)
+    Status, Response = Request('POST', '/scenarios', {'levers': {}})
+    assert Status == 500 and Response == {'error': 'Internal error'}
+    assert 'details of /root/package' in caplog.text
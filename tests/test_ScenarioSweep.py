@@ -0,0 +1,47 @@
+"""
+Tests of the batch scenario sweeps against the calculation modules and the baseline results.
+Created October 2024
+"""
+
+import numpy as np
+import pytest
+
+import AviationModel as Model
+import Baseline
+import ScenarioSweep as ss
+from CalculatorParameters import Population_AmbLevels
+
+@pytest.mark.parametrize('Scenario', Baseline.Scenarios)
+def test_Emissions_FTE_Baseline(Scenario):
+    Levers, Outputs, FTE = Baseline.Load(Scenario)
+    Result = ss.Evaluate_Scenarios(Levers, ss.Shared_Inputs())
+    Years = list(Result.Years)
+    np.testing.assert_allclose(Result.Emissions_FTE[0, [Years.index(2022), Years.index(2026)]],
+                               [FTE['Baseline (2022)'], FTE['Current Selection (2026)']], rtol = 1e-9)
+
+def test_Population_Matches_Module():
+    Starts = np.arange(2024, 2051)
+    Result = ss.Evaluate_Scenarios({'Population_Change': 2, 'Population_Speed': 5, 'Population_Start': Starts}, ss.Shared_Inputs())
+    assert np.isfinite(Result.Population).all()
+    for Start, Population in zip(Starts, Result.Population):
+        Expected = Model.Population_Module(Population_AmbLevels, 2, 5, int(Start)).to_frame().sum(axis = 1)
+        np.testing.assert_allclose(Population, Expected.loc[Result.Years].to_numpy(), rtol = 1e-12)
+
+def test_Sweep_Matches_Run_Scenario():
+    Generator = np.random.default_rng(1)
+    Levers = {}
+    for Haul in ss.Hauls:
+        Levers[Haul + '_Leakage'] = Generator.choice([40, 70, 100], 6)
+        for Kind in ['Demand', 'Class']:
+            Levers[Haul + '_' + Kind + '_Lever'] = Generator.choice([1, 1.5, 2.75, 4], 6)
+            Levers[Haul + '_' + Kind + '_Speed'] = Generator.choice([1, 3, 10], 6)
+            Levers[Haul + '_' + Kind + '_Start'] = Generator.choice([2024, 2027, 2035], 6)
+    Result = ss.Evaluate_Scenarios(Levers, ss.Shared_Inputs(), Details = True)
+    for s, Scenario in Result.Levers.iterrows():
+        Expected = Model.Run_Scenario(Scenario.to_dict())
+        for h, Haul in enumerate(ss.Hauls):
+            for Kind in ['Demand', 'Emissions']:
+                Frame = Expected[Haul + '_' + Kind].to_frame().loc[Result.Years, Result.Details[Haul]['Categories']]
+                np.testing.assert_allclose(Result.Details[Haul][Kind][s], Frame.to_numpy(dtype = float), rtol = 1e-12)
+        Totals = Expected['Total_Emissions'].to_frame().loc[Result.Years].drop(columns = 'Total')
+        np.testing.assert_allclose(Result.Emissions[s].T, Totals.to_numpy(dtype = float), rtol = 1e-12)
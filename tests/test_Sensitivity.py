@@ -0,0 +1,56 @@
+"""
+Tests of the finite-difference sensitivity analysis against individually evaluated scenarios.
+Created October 2024
+"""
+
+import numpy as np
+import pytest
+
+import ScenarioSweep as ss
+import Sensitivity
+from CalculatorParameters import Default_Levers
+
+Selection = {'LH_Demand_Lever': 2, 'SH_Class_Speed': 5, 'DOM_Leakage': 30, 'Population_Change': 2.5}
+
+@pytest.fixture(scope = 'module')
+def Inputs():
+    return ss.Shared_Inputs()
+
+@pytest.mark.parametrize('Name', ['LH_Demand_Lever', 'SH_Class_Speed', 'SH_Class_Start', 'DOM_Leakage', 'Population_Change'])
+def test_Lever_Row_Matches_Stepped_Scenario(Inputs, Name):
+    Result = Sensitivity.Run_Sensitivity(Selection, Parameters = [Name, 'LH_EmF'], Inputs = Inputs)
+    np.testing.assert_allclose(Result.Base, ss.Evaluate_Scenarios(Selection, Inputs).Total[0], rtol = 1e-12)
+    for Side, Measured in [('Low', Result.Low[0]), ('High', Result.High[0])]:
+        Stepped = dict(Selection, **{Name: Result.Values.loc[Name, Side]})
+        np.testing.assert_allclose(Measured, ss.Evaluate_Scenarios(Stepped, Inputs).Total[0], rtol = 1e-12)
+
+def test_EmF_Row_Scales_Haul_Emissions(Inputs):
+    Result = Sensitivity.Run_Sensitivity(Selection, Measure = 'LH', Parameters = ['LH_EmF', 'SH_EmF'], Steps = {'EmF': 0.2}, Inputs = Inputs)
+    np.testing.assert_allclose(Result.Values.loc['LH_EmF'].to_numpy(), [1, 0.8, 1.2])
+    np.testing.assert_allclose(Result.Low[0], 0.8 * Result.Base, rtol = 1e-12)
+    np.testing.assert_allclose(Result.High[0], 1.2 * Result.Base, rtol = 1e-12)
+    np.testing.assert_array_equal(Result.Low[1], Result.Base)      # Other hauls do not change the long haul emissions.
+    np.testing.assert_array_equal(Result.High[1], Result.Base)
+
+def test_Steps_Cut_Short_At_Lever_Bounds(Inputs):
+    Parameters = ['LH_Demand_Lever', 'LH_Demand_Start', 'SH_Class_Speed', 'LH_Leakage']
+    Result = Sensitivity.Run_Sensitivity({'SH_Class_Speed': 40}, Parameters = Parameters, Inputs = Inputs)
+    Values = Result.Values
+    assert Default_Levers['LH_Demand_Lever'] == 1 and Default_Levers['LH_Demand_Start'] == 2024
+    assert list(Values.loc['LH_Demand_Lever']) == [1, 1, 1.5]
+    assert list(Values.loc['LH_Demand_Start']) == [2024, 2024, 2025]
+    assert list(Values.loc['SH_Class_Speed']) == [40, 39, 40]
+    assert list(Values.loc['LH_Leakage']) == [70, 65, 75]
+    for i in range(3):      # A side cut short at a bound is the selected scenario.
+        np.testing.assert_allclose(Result.Low[i] if i < 2 else Result.High[i], Result.Base, rtol = 1e-12)
+
+def test_Tornado_Order(Inputs):
+    Result = Sensitivity.Run_Sensitivity(Selection, Inputs = Inputs)
+    Table = Result.Tornado(2035)
+    assert sorted(Table.index) == sorted(Sensitivity.Default_Parameters)
+    Swing = Table['Swing'].abs().to_numpy()
+    assert (np.diff(Swing) <= 0).all()
+    y = list(Result.Years).index(2035)
+    Rows = [Sensitivity.Default_Parameters.index(Name) for Name in Table.index]
+    np.testing.assert_array_equal(Table['Swing'], Result.High[Rows, y] - Result.Low[Rows, y])
+    np.testing.assert_array_equal(Table['Base'], Result.Base[y])
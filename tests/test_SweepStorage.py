@@ -0,0 +1,21 @@
+"""
+Tests of the storage of sweep results.
+Created October 2024
+"""
+
+import numpy as np
+
+import ParallelSweep
+import SweepStorage
+
+def test_Sweep_Replaces_Earlier_Results(tmp_path):
+    Directory = str(tmp_path / 'sweep')
+    ParallelSweep.Run_ParallelSweep({'LH_Demand_Lever': [1, 2, 3, 4], 'SH_Demand_Lever': [1, 2]}, Directory, ChunkSize = 3,
+                                    Workers = 1, Details = False)
+    assert SweepStorage.Read_Results(Directory)['Scenario'].nunique() == 8
+
+    Manifest = ParallelSweep.Run_ParallelSweep({'LH_Demand_Lever': [2, 3]}, Directory, ChunkSize = 3, Workers = 1, Details = False)
+    Results = SweepStorage.Read_Results(Directory)
+    assert Manifest['Scenarios'] == Results['Scenario'].nunique() == 2
+    np.testing.assert_array_equal(np.unique(Results['LH_Demand_Lever']), [2, 3])
+    assert sum(len(Batch) for Batch in SweepStorage.Iter_Results(Directory)) == len(Results)